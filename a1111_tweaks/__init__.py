@@ -0,0 +1,10 @@
+"""Shared helpers for the a1111 tweaks scripts.
+
+The WebUI puts the extension directory on ``sys.path`` while it loads the
+files in ``scripts/``, so modules here must be imported at module level.
+"""
+
+import os
+
+# Same directory scripts.basedir() returns while the extension's scripts load
+EXTENSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
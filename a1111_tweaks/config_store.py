@@ -0,0 +1,163 @@
+"""JSON config files shared by the tweak scripts.
+
+Reads are cached and only hit the disk again when the file's mtime or size
+changes. Writes go to a temp file that is renamed into place, and bursts of
+saves (several Add/Remove clicks in a row) are coalesced into one write.
+"""
+import atexit
+import copy
+import json
+import os
+import stat
+import tempfile
+import threading
+
+from a1111_tweaks import logs
+
+log = logs.get_logger("config_store")
+
+DEBOUNCE = 0.5
+
+# os.umask can only be read by setting it, which is process-wide, so do it once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path):
+    """Mode for a rewrite of ``path``: the current file's, or what open() would give a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600, which os.replace would carry over
+        os.chmod(tmp, _file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ConfigStore:
+    """One JSON file, parsed once and re-read only when it changes on disk.
+
+    All script instances using the same file share one store (see
+    ``get_store``), so the txt2img and img2img copies of a script always
+    edit the latest data instead of overwriting each other's copy.
+    """
+
+    def __init__(self, path, default, debounce=DEBOUNCE):
+        self.path = path
+        self.default = default
+        self.debounce = debounce
+        self._lock = threading.RLock()
+        self._data = None
+        self._stamp = None
+        self._dirty = False
+        self._timer = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Could not read {self.path}, using defaults: {e}")
+        return copy.deepcopy(self.default)
+
+    def _current(self):
+        # An unwritten save is newer than anything on disk
+        if self._dirty:
+            return self._data
+        stamp = self._stat()
+        if self._data is None or stamp != self._stamp:
+            self._data = self._read()
+            self._stamp = stamp
+        return self._data
+
+    def load(self):
+        """A private copy of the current data."""
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def update(self, fn):
+        """Apply ``fn`` to the latest data in place, save it, and return what ``fn`` returned."""
+        with self._lock:
+            data = copy.deepcopy(self._current())
+            result = fn(data)
+            self._schedule(data)
+            return result
+
+    def save(self, data):
+        with self._lock:
+            self._schedule(copy.deepcopy(data))
+
+    def _schedule(self, data):
+        self._data = data
+        self._dirty = True
+        if self.debounce <= 0:
+            self.flush()
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Write any pending save now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                _atomic_write(self.path, self._data)
+            except Exception as e:
+                log.warning(f"Error saving {self.path}: {e}")
+                return
+            self._dirty = False
+            self._stamp = self._stat()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path, default=None, debounce=DEBOUNCE):
+    """The shared store for ``path``, created on first use with ``default`` as its fallback data."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ConfigStore(key, {} if default is None else default, debounce)
+        return store
+
+
+@atexit.register
+def flush_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
@@ -0,0 +1,211 @@
+"""Latent-friendly dimension pairs: validation, cost estimates and generation from a megapixel budget."""
+import math
+import os
+
+from a1111_tweaks import EXTENSION_DIR
+from a1111_tweaks.config_store import get_store
+
+PRESETS_FILE = os.path.join(EXTENSION_DIR, "random_dimensions_presets.json")
+TIMINGS_FILE = os.path.join(EXTENSION_DIR, "random_dimensions_timings.json")
+DEFAULT_PAIRS = [
+    {"width": 512, "height": 512},
+    {"width": 768, "height": 512},
+    {"width": 512, "height": 768},
+]
+MULTIPLE = 64
+MIN_SIDE = 64
+MAX_SIDE = 4096
+LATENT_SCALE = 8
+BASE_PIXELS = 512 * 512
+
+# Training buckets of SDXL base 1.0, all close to one megapixel
+SDXL_BUCKETS = [
+    (1024, 1024),
+    (1152, 896), (896, 1152),
+    (1216, 832), (832, 1216),
+    (1344, 768), (768, 1344),
+    (1536, 640), (640, 1536),
+]
+
+SNAP_MODES = ["Multiples of 64", "SDXL buckets"]
+
+
+def presets_store():
+    """Saved dimension pairs, shared by Random Dimensions and the sweep planner."""
+    return get_store(PRESETS_FILE, DEFAULT_PAIRS)
+
+
+def timings_store():
+    """Seconds per image by size and steps; written at most every few seconds."""
+    return get_store(TIMINGS_FILE, {}, debounce=5.0)
+
+
+def snap(value, multiple=MULTIPLE):
+    """Nearest positive multiple of ``multiple``."""
+    return max(multiple, int(round(value / multiple)) * multiple)
+
+
+def validate_pair(width, height, max_megapixels=None, multiple=MULTIPLE):
+    """Reason ``width`` x ``height`` should not be added, or None if it is fine."""
+    if width < MIN_SIDE or height < MIN_SIDE or width > MAX_SIDE or height > MAX_SIDE:
+        return f"{width}x{height} is outside {MIN_SIDE}-{MAX_SIDE} pixels per side"
+    if width % multiple or height % multiple:
+        return (f"{width}x{height} is not a multiple of {multiple}; "
+                f"the nearest latent-friendly size is {snap(width, multiple)}x{snap(height, multiple)}")
+    if max_megapixels and width * height > max_megapixels * 1e6:
+        return f"{width}x{height} is {width * height / 1e6:.2f} MP, over the {max_megapixels:g} MP budget"
+    return None
+
+
+def pair_cost(width, height):
+    """Pixels, latent size and cost relative to 512x512 for one image."""
+    return {
+        "megapixels": width * height / 1e6,
+        "latent": (width // LATENT_SCALE, height // LATENT_SCALE),
+        "relative": width * height / BASE_PIXELS,
+    }
+
+
+def cost_text(width, height):
+    cost = pair_cost(width, height)
+    return f"{cost['megapixels']:.2f} MP, latent {cost['latent'][0]}x{cost['latent'][1]}, {cost['relative']:.1f}x"
+
+
+def aspect_ratios(min_ratio, max_ratio, count):
+    """``count`` width/height ratios spaced evenly in log space, so portrait and landscape mirror each other."""
+    if min_ratio is None or max_ratio is None or min_ratio <= 0 or max_ratio <= 0:
+        raise ValueError("aspect ratios must be positive")
+    low, high = sorted((math.log(min_ratio), math.log(max_ratio)))
+    if count <= 1 or low == high:
+        return [math.exp((low + high) / 2)]
+    return [math.exp(low + (high - low) * i / (count - 1)) for i in range(count)]
+
+
+def generate_pairs(megapixels, min_ratio, max_ratio, count, snap_mode=SNAP_MODES[0], multiple=MULTIPLE):
+    """Distinct (width, height) pairs near ``megapixels`` across an aspect-ratio range.
+
+    Sizes are snapped to multiples of ``multiple`` or, for SDXL buckets, to
+    the bucket with the closest aspect ratio inside the range.
+    """
+    if megapixels is None or megapixels <= 0:
+        raise ValueError("the megapixel budget must be positive")
+    ratios = aspect_ratios(min_ratio, max_ratio, count)
+    pairs = []
+    if snap_mode == SNAP_MODES[1]:
+        low, high = min(ratios), max(ratios)
+        candidates = [b for b in SDXL_BUCKETS if low * 0.97 <= b[0] / b[1] <= high * 1.03]
+        for ratio in ratios:
+            if candidates:
+                pairs.append(min(candidates, key=lambda b: abs(math.log(b[0] / b[1] / ratio))))
+    else:
+        pixels = megapixels * 1e6
+        for ratio in ratios:
+            width = snap(math.sqrt(pixels * ratio), multiple)
+            height = snap(width / ratio, multiple)
+            pairs.append((min(width, MAX_SIDE), min(height, MAX_SIDE)))
+    return list(dict.fromkeys(pairs))
+
+
+BUDGET_UNITS = ["Off", "Images per hour", "Seconds per job"]
+BUDGET_HANDLING = ["Bias toward cheaper sizes", "Skip sizes over budget"]
+# Running means weight the last this-many samples, so stats follow driver/model changes
+TIMING_WINDOW = 50
+
+
+def timing_key(width, height, steps):
+    return f"{width}x{height}@{steps}"
+
+
+def _parse_timing_key(key):
+    size, steps = key.split("@")
+    width, height = size.split("x")
+    return int(width), int(height), int(steps)
+
+
+class TimingStats:
+    """Observed seconds per image by (width, height, steps), kept in a config store."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def record(self, width, height, steps, seconds):
+        key = timing_key(width, height, steps)
+
+        def add(table):
+            entry = table.setdefault(key, {"n": 0, "mean": 0.0})
+            entry["n"] += 1
+            entry["mean"] += (seconds - entry["mean"]) / min(entry["n"], TIMING_WINDOW)
+
+        self.store.update(add)
+
+    def estimate(self, width, height, steps, table=None):
+        """Seconds per image, measured or scaled from other sizes by pixel-steps; None without data."""
+        table = self.store.load() if table is None else table
+        entry = table.get(timing_key(width, height, steps))
+        if entry:
+            return entry["mean"]
+        rates = sorted(e["mean"] / (w * h * s) for w, h, s, e in
+                       ((*_parse_timing_key(k), e) for k, e in table.items()) if w * h * s)
+        if not rates:
+            return None
+        return rates[len(rates) // 2] * width * height * steps
+
+    def clear(self):
+        self.store.update(lambda table: table.clear())
+
+    def text(self):
+        table = self.store.load()
+        if not table:
+            return "No timings recorded yet"
+        lines = []
+        rows = [(_parse_timing_key(key), entry) for key, entry in table.items()]
+        for (width, height, steps), entry in sorted(rows, key=lambda row: (row[0][2], row[0][0] * row[0][1])):
+            rate = f", {3600 / entry['mean']:.0f} images/hour" if entry["mean"] > 0 else ""
+            lines.append(f"{width}x{height} @ {steps} steps: {entry['mean']:.2f} s/image{rate} ({entry['n']} samples)")
+        return "\n".join(lines)
+
+
+def budget_target(unit, value, images_per_job):
+    """Seconds per image the budget allows, or None when no budget is set."""
+    if unit == BUDGET_UNITS[1] and value > 0:
+        return 3600.0 / value
+    if unit == BUDGET_UNITS[2] and value > 0:
+        return value / max(1, images_per_job)
+    return None
+
+
+def budget_weights(weights, seconds, target, handling=BUDGET_HANDLING[0]):
+    """Weights adjusted so the expected seconds per image stays within ``target``.
+
+    Skipping drops sizes slower than the target. Biasing tilts weights by
+    ``exp(-lambda * seconds)`` with the smallest lambda that meets the
+    target, which keeps the mix as close to the original as possible. If
+    nothing fits, only the cheapest size is kept.
+    """
+    live = [t for w, t in zip(weights, seconds) if w > 0]
+    cheapest = min(live)
+    only_cheapest = [w if t == cheapest else 0.0 for w, t in zip(weights, seconds)]
+    if handling == BUDGET_HANDLING[1]:
+        capped = [w if t <= target else 0.0 for w, t in zip(weights, seconds)]
+        return capped if sum(capped) > 0 else only_cheapest
+    if cheapest >= target:
+        return only_cheapest
+
+    def tilted(lam):
+        return [w * math.exp(-lam * (t - cheapest)) for w, t in zip(weights, seconds)]
+
+    def mean(ws):
+        return sum(w * t for w, t in zip(ws, seconds)) / sum(ws)
+
+    if mean(weights) <= target:
+        return list(weights)
+    low, high = 0.0, 1.0 / max(cheapest, 1e-6)
+    while mean(tilted(high)) > target:
+        high *= 2
+    for _ in range(60):
+        lam = (low + high) / 2
+        if mean(tilted(lam)) > target:
+            low = lam
+        else:
+            high = lam
+    return tilted(high)
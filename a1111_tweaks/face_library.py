@@ -0,0 +1,163 @@
+"""Index of FaceSwapLab face checkpoints with cheap safetensors validation.
+
+Only the 8-byte length prefix and JSON header of each file are read, through
+a memory map, so no tensor data is loaded. Results are cached by mtime and
+size, and the directory is only listed again when its own mtime changes.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+
+from a1111_tweaks import EXTENSION_DIR
+from a1111_tweaks.config_store import get_store
+
+CONFIG_FILE = os.path.join(EXTENSION_DIR, "random_faces_config.json")
+SUFFIX = ".safetensors"
+# Real headers are a few KB; anything this large is not a face checkpoint
+MAX_HEADER = 16 * 1024 * 1024
+PREWARM_CHUNK = 1024 * 1024
+
+
+def config_store():
+    """The saved face pool (``{"face_pool": [...]}``), shared by Random Faces and the sweep planner."""
+    return get_store(CONFIG_FILE, {"face_pool": []})
+
+
+def read_header(path):
+    """Validate a safetensors file by its header; returns (info, error) with one of them None."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 8:
+                return None, "file too small"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                (length,) = struct.unpack("<Q", mm[:8])
+                if length > MAX_HEADER or 8 + length > size:
+                    return None, f"bad header length {length}"
+                header = json.loads(mm[8:8 + length].decode("utf-8"))
+    except (OSError, ValueError) as e:
+        return None, str(e)
+    if not isinstance(header, dict):
+        return None, "header is not a JSON object"
+
+    data_size = size - 8 - length
+    metadata = header.pop("__metadata__", None) or {}
+    for name, tensor in header.items():
+        try:
+            begin, end = tensor["data_offsets"]
+            tensor["dtype"], tensor["shape"]
+            # Non-numeric offsets fail the comparison with a TypeError
+            in_file = 0 <= begin <= end <= data_size
+        except (KeyError, TypeError, ValueError):
+            return None, f"tensor {name!r} has a malformed entry"
+        if not in_file:
+            return None, f"tensor {name!r} points past the end of the file (truncated?)"
+    return {"size": size, "tensors": len(header), "metadata": metadata}, None
+
+
+class FaceLibrary:
+    """The ``*.safetensors`` files in one faces directory, validated and cached."""
+
+    def __init__(self, faces_dir):
+        self.faces_dir = faces_dir
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        # name -> (mtime_ns, size, info, error)
+        self._entries = {}
+
+    def refresh(self):
+        """Re-list the directory if it changed and re-validate new or modified files."""
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.faces_dir).st_mtime_ns
+            except OSError:
+                self._dir_mtime = None
+                self._entries = {}
+                return
+            stats = {}
+            if dir_mtime != self._dir_mtime:
+                with os.scandir(self.faces_dir) as it:
+                    for entry in it:
+                        if entry.name.endswith(SUFFIX) and entry.is_file():
+                            stats[entry.name] = entry.stat()
+            else:
+                # Same listing; files can still be rewritten in place
+                for name in self._entries:
+                    try:
+                        stats[name] = os.stat(os.path.join(self.faces_dir, name))
+                    except OSError:
+                        pass
+            entries = {}
+            for name, st in stats.items():
+                cached = self._entries.get(name)
+                if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                    entries[name] = cached
+                else:
+                    info, error = read_header(os.path.join(self.faces_dir, name))
+                    entries[name] = (st.st_mtime_ns, st.st_size, info, error)
+            self._entries = entries
+            self._dir_mtime = dir_mtime
+
+    def names(self):
+        """Sorted names of the valid face checkpoints."""
+        with self._lock:
+            return sorted(name for name, entry in self._entries.items() if entry[3] is None)
+
+    def invalid(self):
+        """{name: reason} for files that failed validation."""
+        with self._lock:
+            return {name: entry[3] for name, entry in self._entries.items() if entry[3] is not None}
+
+    def info(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry[2] if entry else None
+
+    def path(self, name):
+        return os.path.join(self.faces_dir, name)
+
+    def prewarm(self, names):
+        """Ask the kernel to pull these files into the page cache without blocking the caller."""
+        paths = [self.path(name) for name in names]
+        if hasattr(os, "posix_fadvise"):
+            for path in paths:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except OSError:
+                    continue
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                except OSError:
+                    pass
+                finally:
+                    os.close(fd)
+            return None
+        thread = threading.Thread(target=_read_through, args=(paths,), name="face-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+def _read_through(paths):
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                while f.read(PREWARM_CHUNK):
+                    pass
+        except OSError:
+            pass
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def get_library(faces_dir):
+    """The shared library for ``faces_dir``, so the txt2img and img2img scripts index it once."""
+    key = os.path.abspath(faces_dir)
+    with _libraries_lock:
+        library = _libraries.get(key)
+        if library is None:
+            library = _libraries[key] = FaceLibrary(key)
+        return library
@@ -0,0 +1,82 @@
+"""Find FaceSwapLab's face checkpoint in the WebUI's flat ``p.script_args``.
+
+Every AlwaysVisible script owns the slice ``args_from:args_to`` of the
+runner's inputs, so the position moves whenever an extension is installed,
+removed or reordered. It is looked up by the input's label once per script
+runner and cached until the UI is rebuilt. If it can't be found, nothing
+is written: guessing a position would overwrite another extension's input.
+"""
+import os
+import weakref
+
+from a1111_tweaks import logs
+
+log = logs.get_logger("faceswaplab")
+
+CHECKPOINT_LABEL = "face checkpoint"
+
+_cache = weakref.WeakKeyDictionary()
+_warned = set()
+
+
+def _is_faceswaplab(script):
+    filename = os.path.basename(getattr(script, "filename", "") or "").lower()
+    try:
+        title = str(script.title()).lower()
+    except Exception:
+        title = ""
+    return "faceswaplab" in filename or "faceswaplab" in title
+
+
+def resolve_face_index(runner):
+    """Index of the first face unit's checkpoint input in the runner's args, or None."""
+    inputs = getattr(runner, "inputs", None) or []
+    for script in getattr(runner, "alwayson_scripts", None) or []:
+        if not _is_faceswaplab(script):
+            continue
+        for index in range(script.args_from, min(script.args_to, len(inputs))):
+            label = getattr(inputs[index], "label", None)
+            if label and str(label).lower().startswith(CHECKPOINT_LABEL):
+                return index
+    return None
+
+
+def face_index(runner):
+    """Cached ``resolve_face_index``; None (warned about once per runner) if the input can't be found."""
+    try:
+        return _cache[runner]
+    except (KeyError, TypeError):
+        pass
+    index = resolve_face_index(runner)
+    if index is None:
+        if id(runner) not in _warned:
+            _warned.add(id(runner))
+            log.warning("FaceSwapLab face checkpoint input not found, faces will not be set")
+    try:
+        _cache[runner] = index
+    except TypeError:
+        pass
+    return index
+
+
+def invalidate():
+    """Forget resolved indices; called when the UI is rebuilt."""
+    _cache.clear()
+    _warned.clear()
+
+
+def set_face(p, face):
+    """Point FaceSwapLab's first face unit at ``face``; returns the index used, or None if it can't be set.
+
+    The WebUI hands scripts a tuple, so the first call in a job copies it
+    into a list (one pass over all the args); later calls in the same job
+    write into that list without copying again.
+    """
+    index = face_index(getattr(p, "scripts", None))
+    args = getattr(p, "script_args", None)
+    if index is None or args is None or index >= len(args):
+        return None
+    if not isinstance(args, list):
+        args = p.script_args = list(args)
+    args[index] = face
+    return index
@@ -0,0 +1,112 @@
+"""The gallery's image index, thumbnail pipeline and filesystem watcher.
+
+The WebUI re-imports ``scripts/gallery.py`` on every UI reload, so these
+live here as one extension-wide instance; a reload reuses the running
+watcher thread and thumbnail pool instead of starting another set.
+"""
+import os
+import threading
+
+from a1111_tweaks import EXTENSION_DIR, instrument, logs, metrics, watcher
+from a1111_tweaks.image_index import ImageIndex
+from a1111_tweaks.thumbnails import ThumbnailCache, ThumbnailPipeline
+
+log = logs.get_logger("gallery")
+
+IMAGES_PER_PAGE = 10
+BASE_DIR = os.path.expanduser("~/StabilityMatrix-linux-x64/Data/Images/Text2Img")
+INDEX_FILE = os.path.join(EXTENSION_DIR, "gallery_index.sqlite3")
+THUMBNAIL_DIR = os.path.join(EXTENSION_DIR, "gallery_thumbnails")
+THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+THUMBNAIL_SIZE = (384, 384)
+THUMBNAIL_WORKERS = 4
+# Neighbouring pages rendered in the background after each page view
+PREFETCH_PAGES = 1
+# Used when inotify is unavailable and the watcher falls back to polling
+WATCH_POLL_INTERVAL = 5
+
+
+class Gallery:
+    """Index, thumbnail cache and pipeline, and watcher for one image directory.
+
+    Image headers are parsed into the metadata table on a background
+    thread, started by the first filtered or metadata-sorted page and then
+    woken for each new image, so page queries use whatever rows are ready.
+    """
+
+    def __init__(self, base_dir, index_file, thumbnail_dir):
+        self.index = ImageIndex(base_dir, index_file)
+        self.thumbnails = ThumbnailCache(thumbnail_dir, THUMBNAIL_CACHE_BYTES, max_size=THUMBNAIL_SIZE)
+        self.pipeline = ThumbnailPipeline(self.thumbnails, workers=THUMBNAIL_WORKERS,
+                                          max_pending=2 * PREFETCH_PAGES * IMAGES_PER_PAGE)
+        self.watcher = watcher.ImageWatcher(base_dir, poll=self.index.refresh, poll_interval=WATCH_POLL_INTERVAL)
+        self._backfill_wanted = threading.Event()
+        self._backfill_thread = None
+        self._backfill_lock = threading.Lock()
+
+    def backfill_metadata(self):
+        """Queue a metadata pass on the background thread, starting it on first use."""
+        with self._backfill_lock:
+            if self._backfill_thread is None or not self._backfill_thread.is_alive():
+                self._backfill_thread = threading.Thread(target=self._run_backfill, name="gallery-metadata",
+                                                         daemon=True)
+                self._backfill_thread.start()
+        self._backfill_wanted.set()
+
+    def _run_backfill(self):
+        while True:
+            self._backfill_wanted.wait()
+            self._backfill_wanted.clear()
+            try:
+                self.index.update_metadata()
+            except Exception as e:
+                log.warning(f"Metadata backfill failed: {e}")
+
+    @instrument.timed("gallery._on_image_event")
+    def on_image_event(self, event, path):
+        """Apply watcher and on_image_saved events straight to the index."""
+        if event == watcher.CREATED:
+            if self.index.add_file(path) and self._backfill_thread is not None:
+                # Metadata is in use, so keep it current for new images too
+                self._backfill_wanted.set()
+        elif event == watcher.DELETED:
+            self.index.remove_file(path)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_gallery():
+    """The extension-wide gallery, created and subscribed to image events on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Gallery(BASE_DIR, INDEX_FILE, THUMBNAIL_DIR)
+            watcher.subscribe(_shared.on_image_event, name="gallery")
+        return _shared
+
+
+def _collect_metrics():
+    # Read only; a scrape never creates the gallery
+    gallery = _shared
+    if gallery is None:
+        return []
+    index = metrics.Family("a1111_tweaks_gallery_images", "gauge", "Images in the gallery index")
+    last_scan = metrics.Family("a1111_tweaks_gallery_last_scan_seconds", "gauge", "Duration of the last index refresh")
+    families = [index.add(gallery.index.count()), last_scan.add(gallery.index.last_scan_seconds)]
+    stats = gallery.thumbnails.stats()
+    lookups = metrics.Family("a1111_tweaks_thumbnail_lookups_total", "counter", "Thumbnail cache lookups by result")
+    families.append(lookups.add(stats["hits"], result="hit").add(stats["misses"], result="miss"))
+    for name, kind, help_text, key in (
+            ("a1111_tweaks_thumbnail_hit_ratio", "gauge", "Thumbnail cache hits / lookups since start", "hit_rate"),
+            ("a1111_tweaks_thumbnail_served_bytes_total", "counter", "Thumbnail bytes served", "bytes_served"),
+            ("a1111_tweaks_thumbnail_cache_entries", "gauge", "Thumbnails in the cache", "entries"),
+            ("a1111_tweaks_thumbnail_cache_bytes", "gauge", "Thumbnail cache size on disk", "total_bytes")):
+        families.append(metrics.Family(name, kind, help_text).add(stats[key]))
+    families.append(metrics.Family("a1111_tweaks_gallery_watching", "gauge", "1 while the filesystem watcher runs")
+                    .add(gallery.watcher.active))
+    return families
+
+
+metrics.register_collector("gallery", _collect_metrics)
@@ -0,0 +1,338 @@
+import os
+import shlex
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+from a1111_tweaks import metrics
+from a1111_tweaks.infotext import extract_fields, read_infotext
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_dir ON images (dir);
+CREATE INDEX IF NOT EXISTS images_mtime ON images (mtime_ns DESC, path);
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    prompt TEXT,
+    negative_prompt TEXT,
+    seed INTEGER,
+    steps INTEGER,
+    sampler TEXT COLLATE NOCASE,
+    model TEXT COLLATE NOCASE,
+    style TEXT COLLATE NOCASE,
+    face TEXT COLLATE NOCASE,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS metadata_seed ON metadata (seed);
+CREATE INDEX IF NOT EXISTS metadata_sampler ON metadata (sampler);
+CREATE INDEX IF NOT EXISTS metadata_model ON metadata (model);
+CREATE INDEX IF NOT EXISTS metadata_style ON metadata (style);
+CREATE INDEX IF NOT EXISTS metadata_face ON metadata (face);
+CREATE INDEX IF NOT EXISTS metadata_size ON metadata (width, height);
+"""
+
+METADATA_COLUMNS = ("prompt", "negative_prompt", "seed", "steps", "sampler", "model",
+                    "style", "face", "width", "height")
+
+# Sort name -> (ORDER BY clause, whether it needs the metadata join)
+SORT_ORDERS = {
+    "Newest": ("i.mtime_ns DESC, i.path", False),
+    "Oldest": ("i.mtime_ns ASC, i.path", False),
+    "Seed": ("m.seed, i.mtime_ns DESC", True),
+    "Largest": ("m.width * m.height DESC, i.mtime_ns DESC", True),
+    "Prompt": ("m.prompt COLLATE NOCASE, i.mtime_ns DESC", True),
+}
+
+# Images whose headers are not parsed yet, or changed since
+_STALE_METADATA = ("SELECT i.path, i.mtime_ns FROM images i LEFT JOIN metadata m ON m.path = i.path "
+                   "WHERE m.path IS NULL OR m.mtime_ns != i.mtime_ns")
+
+# Filter keys that match a metadata column exactly; anything else searches the prompts
+_EXACT_FILTERS = {
+    "seed": "m.seed = ?",
+    "steps": "m.steps = ?",
+    "sampler": "m.sampler = ?",
+    "model": "m.model = ?",
+    "style": "m.style = ?",
+    "face": "m.face = ?",
+    "width": "m.width = ?",
+    "height": "m.height = ?",
+}
+
+
+def _day_start_ns(value):
+    """Local midnight of a YYYY-MM-DD date, in nanoseconds."""
+    return int(time.mktime(time.strptime(value, "%Y-%m-%d"))) * 1_000_000_000
+
+
+def build_filter(query):
+    """Turn a filter box query into (where_sql, params, needs_metadata).
+
+    ``seed:123 style:Cinematic size:832x1216 "red hair"`` matches on the
+    indexed columns; bare words and ``negative:`` terms search the prompts.
+    ``from:2026-10-01 to:2026-10-15`` limits by file date, both days inclusive.
+    """
+    clauses, params = [], []
+    needs_metadata = False
+    try:
+        terms = shlex.split(query or "")
+    except ValueError:
+        terms = (query or "").split()
+    for term in terms:
+        key, sep, value = term.partition(":")
+        key = key.lower()
+        if sep and key in ("from", "to"):
+            try:
+                start = _day_start_ns(value)
+            except ValueError:
+                continue
+            if key == "from":
+                clauses.append("i.mtime_ns >= ?")
+                params.append(start)
+            else:
+                clauses.append("i.mtime_ns < ?")
+                params.append(start + 86400 * 1_000_000_000)
+            continue
+        needs_metadata = True
+        if sep and key in _EXACT_FILTERS:
+            clauses.append(_EXACT_FILTERS[key])
+            params.append(value)
+        elif sep and key == "size":
+            width, _, height = value.lower().partition("x")
+            clauses.append("m.width = ? AND m.height = ?")
+            params.extend([width, height])
+        elif sep and key == "negative":
+            clauses.append("m.negative_prompt LIKE ?")
+            params.append(f"%{value}%")
+        else:
+            clauses.append("m.prompt LIKE ?")
+            params.append(f"%{value if sep and key == 'prompt' else term}%")
+    where = " AND ".join(clauses)
+    return where, params, needs_metadata
+
+
+class ImageIndex:
+    """Persistent SQLite index of the images below a base directory.
+
+    Directory mtimes are recorded alongside the files, so a refresh only
+    lists directories whose entries changed since the last walk; unchanged
+    directories cost a single ``stat``.
+    """
+
+    def __init__(self, base_dir, db_path):
+        self.base_dir = os.path.abspath(base_dir)
+        self.db_path = db_path
+        self.last_refresh = 0.0
+        self.last_scan_seconds = 0.0
+        self._lock = threading.RLock()
+        # Every image row has current metadata; False means unknown
+        self._metadata_current = False
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self):
+        """Bring the index in line with the filesystem; returns the number of rescanned dirs.
+
+        The walk and ``stat`` calls run without the lock, which is only held
+        for database reads and writes, so ``add_file`` from the saving
+        thread is never stuck behind a cold walk of a large tree.
+        """
+        started = time.monotonic()
+        with self._lock:
+            rows = self._conn.execute("SELECT path, parent, mtime_ns FROM dirs").fetchall()
+        known = {path: mtime_ns for path, _, mtime_ns in rows}
+        children = {}
+        for path, parent, _ in rows:
+            children.setdefault(parent, []).append(path)
+        seen = set()
+        rescanned = 0
+        stack = [self.base_dir] if os.path.isdir(self.base_dir) else []
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(directory)
+            if known.get(directory) == mtime_ns:
+                stack.extend(children.get(directory, ()))
+                continue
+            listing = self._list_dir(directory)
+            if listing is None:
+                continue
+            subdirs, files = listing
+            # mtime_ns was read before listing, so a file added meanwhile makes the next refresh rescan
+            self._sync_dir(directory, mtime_ns, files)
+            stack.extend(subdirs)
+            rescanned += 1
+
+        gone = set(known) - seen
+        if gone:
+            with self._lock:
+                for directory in gone:
+                    self._conn.execute("DELETE FROM dirs WHERE path = ?", (directory,))
+                    self._conn.execute("DELETE FROM images WHERE dir = ?", (directory,))
+                self._conn.commit()
+
+        self.last_refresh = time.time()
+        self.last_scan_seconds = time.monotonic() - started
+        metrics.GALLERY_SCAN_SECONDS.observe(self.last_scan_seconds)
+        return rescanned
+
+    def _list_dir(self, directory):
+        """(subdirectories, {image path: (mtime_ns, size)}) of one directory, or None if it can't be read."""
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                            continue
+                        if not entry.name.lower().endswith(IMAGE_SUFFIXES):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files[entry.path] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+        return subdirs, files
+
+    def _sync_dir(self, directory, mtime_ns, files):
+        """Make one directory's image rows match a fresh listing."""
+        parent = None if directory == self.base_dir else os.path.dirname(directory)
+        with self._lock:
+            conn = self._conn
+            existing = {row[0]: (row[1], row[2]) for row in conn.execute(
+                "SELECT path, mtime_ns, size FROM images WHERE dir = ?", (directory,))}
+            upserts = [(path, directory) + current for path, current in files.items()
+                       if existing.pop(path, None) != current]
+            conn.executemany(
+                "INSERT OR REPLACE INTO images (path, dir, mtime_ns, size) VALUES (?, ?, ?, ?)", upserts)
+            if upserts:
+                self._metadata_current = False
+            conn.executemany("DELETE FROM images WHERE path = ?", ((path,) for path in existing))
+            conn.execute(
+                "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                (directory, parent, mtime_ns))
+            conn.commit()
+
+    def add_file(self, path):
+        """Record a single new or rewritten image without walking its directory."""
+        path = os.path.abspath(path)
+        if not path.startswith(self.base_dir + os.sep) or not path.lower().endswith(IMAGE_SUFFIXES):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (path, dir, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                (path, os.path.dirname(path), st.st_mtime_ns, st.st_size))
+            self._conn.commit()
+            self._metadata_current = False
+        return True
+
+    def remove_file(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM images WHERE path = ?", (os.path.abspath(path),))
+            self._conn.commit()
+
+    def metadata_pending(self):
+        """True if some image is new or changed since its headers were last parsed.
+
+        Once a check finds nothing stale, the answer is cached until an image
+        row is added or changed.
+        """
+        with self._lock:
+            if not self._metadata_current:
+                self._metadata_current = self._conn.execute(_STALE_METADATA + " LIMIT 1").fetchone() is None
+            return not self._metadata_current
+
+    def update_metadata(self, batch=500):
+        """Parse infotext for images that are new or changed since they were last indexed.
+
+        Only file headers are read, never pixel data. Returns the number of
+        images processed.
+        """
+        processed = 0
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata WHERE path NOT IN (SELECT path FROM images)")
+            self._conn.commit()
+        while True:
+            with self._lock:
+                stale = self._conn.execute(_STALE_METADATA + " LIMIT ?", (batch,)).fetchall()
+                if not stale:
+                    self._metadata_current = True
+                    return processed
+            rows = []
+            for path, mtime_ns in stale:
+                try:
+                    text = read_infotext(path)
+                except (OSError, ValueError, IndexError, struct.error, zlib.error):
+                    # A damaged file still gets an empty row, so it isn't re-read on every query
+                    text = None
+                fields = extract_fields(text) if text else {}
+                rows.append((path, mtime_ns) + tuple(fields.get(c) for c in METADATA_COLUMNS))
+            with self._lock:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO metadata (path, mtime_ns, {', '.join(METADATA_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * (len(METADATA_COLUMNS) + 2))})", rows)
+                self._conn.commit()
+            processed += len(rows)
+
+    def _select(self, columns, query, sort):
+        where, params, needs_metadata = build_filter(query)
+        order, sort_needs_metadata = SORT_ORDERS.get(sort, SORT_ORDERS["Newest"])
+        sql = f"SELECT {columns} FROM images i"
+        if needs_metadata or sort_needs_metadata:
+            sql += " JOIN metadata m ON m.path = i.path"
+        if where:
+            sql += f" WHERE {where}"
+        return sql, params, order
+
+    def needs_metadata(self, query, sort):
+        return build_filter(query)[2] or SORT_ORDERS.get(sort, SORT_ORDERS["Newest"])[1]
+
+    def count(self, query=None, sort="Newest"):
+        sql, params, _ = self._select("COUNT(*)", query, sort)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def page(self, offset, limit, query=None, sort="Newest"):
+        """Return image paths in ``sort`` order (newest first by default), starting at ``offset``."""
+        sql, params, order = self._select("i.path", query, sort)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                f"{sql} ORDER BY {order} LIMIT ? OFFSET ?", params + [limit, offset])]
+
+    def paths(self, query=None, sort="Newest", limit=None):
+        """Every matching path in one query, for batch operations."""
+        return self.page(0, -1 if limit is None else limit, query, sort)
@@ -0,0 +1,210 @@
+import re
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_EXIF_IFD_POINTER = 0x8769
+_USER_COMMENT = 0x9286
+
+# Same shape as the WebUI's own infotext parameter regex
+_RE_PARAM = re.compile(r'\s*(\w[\w \-/]+):\s*("(?:\\.|[^\\"])+"|[^,]*)(?:,|$)')
+_RE_SIZE = re.compile(r"^\s*(\d+)\s*x\s*(\d+)\s*$")
+
+
+def read_infotext(path):
+    """Return the generation parameters stored in an image file, or None.
+
+    Only the metadata headers are read: PNG text chunks up to the first
+    IDAT, JPEG segments up to start-of-scan, and the WebP EXIF chunk.
+    """
+    with open(path, "rb") as f:
+        head = f.read(12)
+        f.seek(0)
+        if head.startswith(PNG_SIGNATURE):
+            return _read_png(f)
+        if head.startswith(b"\xff\xd8"):
+            return _read_jpeg(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _read_webp(f)
+    return None
+
+
+def _read_png(f):
+    f.seek(len(PNG_SIGNATURE))
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type in (b"IDAT", b"IEND"):
+            return None
+        if chunk_type not in (b"tEXt", b"zTXt", b"iTXt"):
+            f.seek(length + 4, 1)
+            continue
+        data = f.read(length)
+        if len(data) < length:
+            return None
+        f.seek(4, 1)
+        keyword, _, body = data.partition(b"\0")
+        if keyword != b"parameters":
+            continue
+        if chunk_type == b"tEXt":
+            return body.decode("latin-1")
+        if chunk_type == b"zTXt":
+            return zlib.decompress(body[1:]).decode("latin-1")
+        if len(body) < 2:
+            return None
+        compressed = body[0] == 1
+        _, _, rest = body[2:].partition(b"\0")  # language tag
+        _, _, text = rest.partition(b"\0")  # translated keyword
+        if compressed:
+            text = zlib.decompress(text)
+        return text.decode("utf-8", "replace")
+
+
+def _read_jpeg(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        if kind == 0xD9 or kind == 0xDA:
+            return None
+        if kind == 0x01 or 0xD0 <= kind <= 0xD8:
+            continue
+        raw_length = f.read(2)
+        if len(raw_length) < 2:
+            return None
+        length = struct.unpack(">H", raw_length)[0]
+        if length < 2:
+            return None
+        if kind == 0xE1:
+            data = f.read(length - 2)
+            if data.startswith(b"Exif\0\0"):
+                return _user_comment(data[6:])
+        elif kind == 0xFE:
+            # A COM segment is where some tools put parameters for JPEGs
+            comment = f.read(length - 2).decode("utf-8", "replace").strip("\0")
+            if "Steps:" in comment:
+                return comment
+        else:
+            f.seek(length - 2, 1)
+
+
+def _read_webp(f):
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        fourcc, size = struct.unpack("<4sI", header)
+        if fourcc == b"EXIF":
+            data = f.read(size)
+            if data.startswith(b"Exif\0\0"):
+                data = data[6:]
+            return _user_comment(data)
+        f.seek(size + (size & 1), 1)
+
+
+def _user_comment(tiff):
+    """Pull the EXIF UserComment out of a TIFF-structured EXIF block."""
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+    try:
+        ifd0 = struct.unpack_from(endian + "I", tiff, 4)[0]
+        exif_ifd = _find_tag(tiff, endian, ifd0, _EXIF_IFD_POINTER)
+        if exif_ifd is None:
+            return None
+        exif_offset = struct.unpack(endian + "I", exif_ifd[2])[0]
+        entry = _find_tag(tiff, endian, exif_offset, _USER_COMMENT)
+    except struct.error:
+        return None
+    if entry is None:
+        return None
+    _, count, value = entry
+    if count <= 4:
+        raw = value[:count]
+    else:
+        offset = struct.unpack(endian + "I", value)[0]
+        raw = tiff[offset:offset + count]
+    return _decode_user_comment(raw)
+
+
+def _find_tag(tiff, endian, offset, wanted):
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    for i in range(count):
+        tag, kind, n, value = struct.unpack_from(endian + "HHI4s", tiff, offset + 2 + i * 12)
+        if tag == wanted:
+            return kind, n, value
+    return None
+
+
+def _decode_user_comment(raw):
+    prefix, body = raw[:8], raw[8:]
+    if prefix == b"UNICODE\0":
+        # piexif writes big-endian; fall back to little-endian if that looks wrong
+        encoding = "utf-16-le" if body[1:2] == b"\0" and body[:1] != b"\0" else "utf-16-be"
+        return body.decode(encoding, "replace").rstrip("\0")
+    if prefix in (b"ASCII\0\0\0", b"\0" * 8):
+        return body.decode("utf-8", "replace").rstrip("\0")
+    return raw.decode("utf-8", "replace").rstrip("\0")
+
+
+def parse_infotext(text):
+    """Split WebUI infotext into prompt, negative prompt and a dict of parameters.
+
+    Parameter lines start at the one beginning with ``Steps:``; any lines
+    after it (such as ``Random Style: ...``) are parsed as parameters too.
+    """
+    prompt, negative, params = [], [], {}
+    target = prompt
+    in_params = False
+    for line in text.strip().split("\n"):
+        stripped = line.strip()
+        if not in_params and stripped.startswith("Steps:"):
+            in_params = True
+        if in_params:
+            for key, value in _RE_PARAM.findall(stripped):
+                value = value.strip()
+                if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+                    value = value[1:-1].replace('\\"', '"')
+                params[key.strip()] = value
+            continue
+        if stripped.startswith("Negative prompt:"):
+            target = negative
+            line = stripped[len("Negative prompt:"):].strip()
+        target.append(line)
+    return "\n".join(prompt).strip(), "\n".join(negative).strip(), params
+
+
+def extract_fields(text):
+    """Map infotext to the columns kept in the gallery metadata index."""
+    prompt, negative, params = parse_infotext(text)
+    width = height = None
+    match = _RE_SIZE.match(params.get("Random Dimensions") or params.get("Size") or "")
+    if match:
+        width, height = int(match.group(1)), int(match.group(2))
+    return {
+        "prompt": prompt,
+        "negative_prompt": negative,
+        "seed": _int(params.get("Seed")),
+        "steps": _int(params.get("Steps")),
+        "sampler": params.get("Sampler"),
+        "model": params.get("Model"),
+        "style": params.get("Random Style"),
+        "face": params.get("Random Face"),
+        "width": width,
+        "height": height,
+    }
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,233 @@
+"""Timing spans for the tweak scripts' hooks and UI handlers.
+
+Each label (``script.hook`` or ``script.handler``) keeps its last
+``RING_SIZE`` durations in a fixed-size ring buffer, measured with the
+monotonic ``time.perf_counter_ns``, plus running totals. Percentiles are
+computed from the ring when asked for, so recording is a few list and
+integer stores.
+
+Labels can be switched off at run time with ``set_enabled``; a disabled
+label costs one attribute check per call. ``A1111_TWEAKS_TIMING`` sets the
+initial state: a comma-separated list of ``fnmatch`` patterns, where a
+leading ``-`` turns matching labels off (``"*,-gallery.*"``), and ``off``
+disables everything. A daemon thread, started with the first span, logs
+the summary of each label that recorded calls since the last flush to the
+``a1111_tweaks.timing`` logger every ``SUMMARY_INTERVAL`` seconds, as
+``key=value`` lines with the same fields in the record's ``timing``
+attribute for structured formatters.
+"""
+import fnmatch
+import functools
+import math
+import os
+import threading
+import time
+
+from a1111_tweaks import logs
+
+RING_SIZE = 1024
+SUMMARY_INTERVAL = 300
+ENV_VAR = "A1111_TWEAKS_TIMING"
+# Script methods the WebUI calls during a job, plus ui() when the interface is built
+HOOKS = ("ui", "setup", "before_process", "process", "before_process_batch", "process_batch",
+         "postprocess_batch", "postprocess_image", "postprocess")
+PERCENTILES = (50, 95, 99)
+
+log = logs.get_logger("timing")
+
+
+def _parse_rules(value):
+    if value is None:
+        return [("*", True)]
+    value = value.strip()
+    if value.lower() in ("", "0", "off", "false", "no"):
+        return []
+    rules = []
+    for pattern in value.split(","):
+        pattern = pattern.strip()
+        if pattern:
+            rules.append((pattern[1:], False) if pattern.startswith("-") else (pattern, True))
+    return rules
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class Span:
+    """Durations for one label: a ring of recent samples and running totals.
+
+    Recording is not locked. Labels are almost always hit from one thread at
+    a time, and a race can only overwrite one sample in the ring.
+    """
+
+    __slots__ = ("label", "enabled", "count", "errors", "total_ns", "max_ns", "_ring")
+
+    def __init__(self, label, enabled=True):
+        self.label = label
+        self.enabled = enabled
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self._ring = [0] * RING_SIZE
+
+    def record(self, ns):
+        self._ring[self.count % RING_SIZE] = ns
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def samples(self):
+        """Recent durations in nanoseconds, oldest first."""
+        if self.count <= RING_SIZE:
+            return self._ring[:self.count]
+        split = self.count % RING_SIZE
+        return self._ring[split:] + self._ring[:split]
+
+    def summary(self):
+        ordered = sorted(self.samples())
+        data = {
+            "label": self.label,
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total_ns / self.count / 1e6 if self.count else None,
+            "max_ms": self.max_ns / 1e6 if self.count else None,
+        }
+        for q in PERCENTILES:
+            value = percentile(ordered, q)
+            data[f"p{q}_ms"] = value / 1e6 if value is not None else None
+        return data
+
+    def reset(self):
+        self.count = self.errors = self.total_ns = self.max_ns = 0
+
+
+_rules = _parse_rules(os.environ.get(ENV_VAR))
+_spans = {}
+_lock = threading.Lock()
+_flusher = None
+# Call count of each label at its last logged summary
+_flushed = {}
+
+
+def _rule_state(label):
+    state = False
+    for pattern, enabled in _rules:
+        if fnmatch.fnmatchcase(label, pattern):
+            state = enabled
+    return state
+
+
+def span(label):
+    """The shared span for ``label``, created on first use."""
+    with _lock:
+        found = _spans.get(label)
+        if found is None:
+            found = _spans[label] = Span(label, _rule_state(label))
+            _start_flusher()
+        return found
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_run_flusher, name="a1111-tweaks-timing", daemon=True)
+        _flusher.start()
+
+
+def _run_flusher():
+    stop = threading.Event()
+    while not stop.wait(SUMMARY_INTERVAL):
+        try:
+            log_summaries(changed_only=True)
+        except Exception as e:
+            log.warning(f"Could not log timing summaries: {e}")
+
+
+def set_enabled(pattern, enabled=True):
+    """Turn labels matching ``pattern`` on or off, including ones registered later."""
+    with _lock:
+        _rules.append((pattern, bool(enabled)))
+        for label, found in _spans.items():
+            if fnmatch.fnmatchcase(label, pattern):
+                found.enabled = bool(enabled)
+
+
+def labels():
+    """{label: enabled} for every registered label."""
+    with _lock:
+        return {label: found.enabled for label, found in sorted(_spans.items())}
+
+
+def summaries():
+    """Summaries of every label that has recorded at least one call."""
+    with _lock:
+        spans = sorted(_spans.values(), key=lambda found: found.label)
+    return [found.summary() for found in spans if found.count]
+
+
+def reset():
+    with _lock:
+        for found in _spans.values():
+            found.reset()
+        _flushed.clear()
+
+
+def summary_line(data):
+    fields = [f"label={data['label']}", f"count={data['count']}", f"errors={data['errors']}"]
+    fields.extend(f"{key}={data[key]:.3f}" for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+                  if data[key] is not None)
+    return " ".join(fields)
+
+
+def log_summaries(changed_only=False):
+    """Log each label's summary; with ``changed_only``, skip labels with no calls since the last flush."""
+    for data in summaries():
+        if changed_only and _flushed.get(data["label"]) == data["count"]:
+            continue
+        _flushed[data["label"]] = data["count"]
+        log.info("timing %s", summary_line(data), extra={"timing": data})
+
+
+def timed(label):
+    """Decorator recording each call's duration under ``label``; exceptions are counted and re-raised."""
+    def decorate(fn):
+        found = span(label)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not found.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                found.errors += 1
+                raise
+            finally:
+                found.record(time.perf_counter_ns() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def instrument_hooks(prefix, hooks=HOOKS):
+    """Class decorator timing each of ``hooks`` the class defines itself, as ``prefix.hook``.
+
+    Inherited hooks are left alone, so the WebUI still sees which ones the
+    script overrides.
+    """
+    def decorate(cls):
+        for name in hooks:
+            method = vars(cls).get(name)
+            if callable(method):
+                setattr(cls, name, timed(f"{prefix}.{name}")(method))
+        return cls
+
+    return decorate
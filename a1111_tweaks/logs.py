@@ -0,0 +1,33 @@
+"""Loggers for the tweak scripts, all under ``a1111_tweaks``.
+
+The WebUI leaves logging unconfigured unless ``SD_WEBUI_LOG_LEVEL`` is set,
+and Python then drops INFO records. If no handler is configured when the
+extension loads, the package logger gets its own console handler at INFO,
+so job messages and timing summaries still reach the console. Configure
+logging, or set the level of ``a1111_tweaks``, to redirect or quiet them.
+"""
+import logging
+import sys
+
+ROOT = "a1111_tweaks"
+FORMAT = "[%(name)s] %(levelname)s: %(message)s"
+
+
+def _setup():
+    package = logging.getLogger(ROOT)
+    if package.handlers or logging.getLogger().handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    package.addHandler(handler)
+    package.setLevel(logging.INFO)
+    # Records stay on our handler, so logging configured later doesn't print them twice
+    package.propagate = False
+
+
+def get_logger(component):
+    """The logger for one script or module, e.g. ``a1111_tweaks.random_faces``."""
+    return logging.getLogger(f"{ROOT}.{component}")
+
+
+_setup()
@@ -0,0 +1,240 @@
+"""Counters and collectors behind the ``/a1111-tweaks`` metrics and status routes.
+
+Code on the generation and upload paths only bumps in-memory counters and
+histograms, each a dict update under its own short lock. Anything that needs
+a query, such as the queue depth or the gallery index size, is read by a
+collector when the endpoint is scraped.
+
+``mount(app)`` adds the routes to any FastAPI app, so they can be exercised
+with ``fastapi.testclient.TestClient`` outside the WebUI.
+"""
+import bisect
+import math
+import threading
+import time
+
+from a1111_tweaks import instrument
+
+ROUTE_PREFIX = "/a1111-tweaks"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_started = time.time()
+
+
+def _labels_key(labels):
+    # Label values are expected to be strings already; sorting makes keyword order irrelevant
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Family:
+    """One metric family's samples, built when the endpoint is scraped."""
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        # (sample name, labels, value)
+        self.samples = []
+
+    def add(self, value, suffix="", /, **labels):
+        self.samples.append((self.name + suffix, labels, value))
+        return self
+
+
+class Counter:
+    """Monotonic totals keyed by label values."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        family = Family(self.name, "counter", self.help)
+        for key, value in sorted(self.values().items()):
+            family.add(value, **dict(key))
+        return family
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, keyed by label values."""
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # key -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        family = Family(self.name, "histogram", self.help)
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                family.add(cumulative, "_bucket", le=_format_value(float(bound)), **labels)
+            family.add(total, "_sum", **labels)
+            family.add(cumulative, "_count", **labels)
+        return family
+
+
+_metrics = []
+_collectors = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name, help_text):
+    metric = Counter(name, help_text)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help_text, buckets)
+    with _registry_lock:
+        _metrics.append(metric)
+    return metric
+
+
+def register_collector(name, collect):
+    """Add ``collect()`` (returning Family objects) to every scrape; a later call with the same name replaces it.
+
+    Scripts are re-imported when the UI reloads, so they register by name
+    rather than appending.
+    """
+    with _registry_lock:
+        _collectors[name] = collect
+
+
+SELECTIONS = counter("a1111_tweaks_selections_total",
+                     "Images given each picked dimension, style or face, by kind, value and source (random or sweep)")
+UPLOADS = counter("a1111_tweaks_uploads_total", "Wanly upload attempts by result (ok, retryable, failed)")
+UPLOAD_BYTES = counter("a1111_tweaks_upload_bytes_total", "Request body bytes sent to the Wanly API")
+UPLOAD_SECONDS = histogram("a1111_tweaks_upload_seconds", "Wall time of each Wanly upload attempt")
+GALLERY_SCAN_SECONDS = histogram("a1111_tweaks_gallery_scan_seconds", "Wall time of each gallery index refresh")
+
+
+def _timing_family():
+    family = Family("a1111_tweaks_hook_seconds", "summary",
+                    "Recent durations of script hooks and UI handlers, by label (see A1111_TWEAKS_TIMING)")
+    for data in instrument.summaries():
+        for q in instrument.PERCENTILES:
+            family.add(data[f"p{q}_ms"] / 1e3, quantile=f"{q / 100:g}", label=data["label"])
+        family.add(data["mean_ms"] * data["count"] / 1e3, "_sum", label=data["label"])
+        family.add(data["count"], "_count", label=data["label"])
+    return family
+
+
+def collect():
+    """(families, {collector name: error}) for one scrape."""
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors.items())
+    families = [metric.collect() for metric in metrics]
+    families.append(_timing_family())
+    errors = {}
+    for name, fn in collectors:
+        try:
+            families.extend(fn())
+        except Exception as e:
+            errors[name] = str(e)
+    up = Family("a1111_tweaks_collector_up", "gauge", "1 if the collector succeeded on this scrape")
+    for name, _ in collectors:
+        up.add(0 if name in errors else 1, collector=name)
+    families.append(up)
+    families.append(Family("a1111_tweaks_uptime_seconds", "gauge", "Seconds since the extension loaded")
+                    .add(time.time() - _started))
+    return families, errors
+
+
+def render(families):
+    """Prometheus text exposition format."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {_escape(family.help)}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for name, labels, value in family.samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def status(families, errors):
+    """JSON-friendly health summary: status, uptime, collector errors and every sample."""
+    samples = {}
+    for family in families:
+        for name, labels, value in family.samples:
+            samples.setdefault(name, []).append({"labels": labels, "value": value} if labels else value)
+    flat = {name: values[0] if len(values) == 1 and not isinstance(values[0], dict) else values
+            for name, values in samples.items()}
+    return {
+        "status": "degraded" if errors else "ok",
+        "uptime_seconds": time.time() - _started,
+        "errors": errors,
+        "metrics": flat,
+    }
+
+
+def mount(app, prefix=ROUTE_PREFIX):
+    """Add ``GET {prefix}/metrics`` (Prometheus text) and ``GET {prefix}/status`` (JSON) to a FastAPI app."""
+    from fastapi.responses import JSONResponse, Response
+
+    def metrics_route():
+        families, _ = collect()
+        return Response(render(families), media_type=CONTENT_TYPE)
+
+    def status_route():
+        families, errors = collect()
+        return JSONResponse(status(families, errors))
+
+    app.add_api_route(f"{prefix}/metrics", metrics_route, methods=["GET"], include_in_schema=False)
+    app.add_api_route(f"{prefix}/status", status_route, methods=["GET"], include_in_schema=False)
+
+
+def on_app_started(demo, app):
+    mount(app)
@@ -0,0 +1,105 @@
+"""Weighted, reproducible random picks for the random_* scripts.
+
+Draws use their own ``random.Random`` streams, so they are unaffected by the
+global ``random`` state and by the WebUI's seeding of torch/numpy.
+"""
+import hashlib
+import math
+import random
+
+# Cap on shuffle-bag slots per item, so extreme weight ratios don't build huge bags
+MAX_COPIES = 100
+
+
+def derive_rng(seed, stream):
+    """An RNG determined by ``seed`` and a stream name, so each script gets its own sequence per seed."""
+    digest = hashlib.sha256(f"{stream}:{seed}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def check_weights(weights):
+    """Validated float weights; raises ValueError for empty, negative, non-finite or all-zero weights."""
+    weights = [float(w) for w in weights]
+    if not weights:
+        raise ValueError("nothing to sample from")
+    if any(w < 0 or not math.isfinite(w) for w in weights):
+        raise ValueError("weights must be finite, non-negative numbers")
+    if sum(weights) <= 0:
+        raise ValueError("at least one weight must be positive")
+    return weights
+
+
+class AliasTable:
+    """Vose's alias method: O(n) setup, then O(1) weighted draws."""
+
+    def __init__(self, weights):
+        weights = check_weights(weights)
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to rounding error and keeps prob 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, rng):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class ShuffleBag:
+    """Draws without repeats: every index comes up ``copies`` times before the bag refills.
+
+    ``copies`` defaults to one per index; weights can be rounded into copies
+    so heavier items come up more often within each round.
+    """
+
+    def __init__(self, copies):
+        self.copies = [max(0, int(c)) for c in copies]
+        if not any(self.copies):
+            raise ValueError("the bag would be empty")
+        self._bag = []
+
+    def sample(self, rng):
+        if not self._bag:
+            self._bag = [i for i, c in enumerate(self.copies) for _ in range(c)]
+            rng.shuffle(self._bag)
+        return self._bag.pop()
+
+
+class Sampler:
+    """Picks items by weight, either independently or shuffle-bag style.
+
+    ``seed`` and ``stream`` fix the sequence; without a seed the sampler uses
+    fresh system randomness.
+    """
+
+    def __init__(self, items, weights=None, no_repeat=False, seed=None, stream="default"):
+        self.items = list(items)
+        weights = check_weights([1.0] * len(self.items) if weights is None else weights)
+        if len(weights) != len(self.items):
+            raise ValueError("one weight per item is required")
+        self.rng = derive_rng(seed, stream) if seed is not None else random.Random()
+        if no_repeat:
+            # Heavier items get proportionally more slots per round, everything positive at least one
+            low = min(w for w in weights if w > 0)
+            self.picker = ShuffleBag(min(MAX_COPIES, max(1, round(w / low))) if w > 0 else 0 for w in weights)
+        else:
+            self.picker = AliasTable(weights)
+
+    def draw(self, rng=None):
+        """One item; ``rng`` overrides the sampler's own stream, e.g. one derived per image."""
+        return self.items[self.picker.sample(rng or self.rng)]
+
+    def draws(self, n):
+        return [self.draw() for _ in range(n)]
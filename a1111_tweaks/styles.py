@@ -0,0 +1,237 @@
+"""Catalog of prompt styles from the WebUI's styles CSV and SDXL styler JSON files.
+
+Files are parsed once and re-read only when their mtime or size changes.
+Each style's templates are split around ``{prompt}`` when loaded, so
+applying a style is a join rather than a search-and-replace.
+"""
+import bisect
+import csv
+import difflib
+import glob
+import json
+import os
+import threading
+
+from a1111_tweaks import EXTENSION_DIR, logs
+from a1111_tweaks.config_store import get_store
+
+log = logs.get_logger("styles")
+
+PRESETS_FILE = os.path.join(EXTENSION_DIR, "random_styles_presets.json")
+DEFAULT_POOL = ["Enhance", "Cinematic", "Photographic"]
+PLACEHOLDER = "{prompt}"
+# File name patterns used by the SDXL prompt styler extensions
+STYLER_PATTERNS = ("sdxl_styles*.json", "*/sdxl_styles*.json")
+
+
+def compile_template(template):
+    """Template parts for ``apply_template``; a template without ``{prompt}`` is appended."""
+    template = template or ""
+    return tuple(template.split(PLACEHOLDER)) if PLACEHOLDER in template else (template,)
+
+
+def apply_template(parts, prompt):
+    """Same result as the WebUI's ``modules.styles.merge_prompts``, from precompiled parts.
+
+    An appended template and the prompt are stripped and joined with ", ",
+    skipping whichever is empty; a ``{prompt}`` template is substituted as is.
+    """
+    if len(parts) == 1:
+        return ", ".join(text for text in (prompt.strip(), parts[0].strip()) if text)
+    return prompt.join(parts)
+
+
+class Style:
+    __slots__ = ("name", "prompt", "negative_prompt", "source", "_positive", "_negative")
+
+    def __init__(self, name, prompt, negative_prompt, source):
+        self.name = name
+        self.prompt = prompt or ""
+        self.negative_prompt = negative_prompt or ""
+        self.source = source
+        self._positive = compile_template(self.prompt)
+        self._negative = compile_template(self.negative_prompt)
+
+    def apply_positive(self, prompt):
+        return apply_template(self._positive, prompt)
+
+    def apply_negative(self, negative_prompt):
+        return apply_template(self._negative, negative_prompt)
+
+
+def _read_csv(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            row = {(k or "").strip().lower(): v for k, v in row.items()}
+            name = (row.get("name") or "").strip()
+            if name:
+                yield Style(name, row.get("prompt"), row.get("negative_prompt"), path)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [dict(entry, name=name) if isinstance(entry, dict) else {} for name, entry in data.items()]
+    for entry in data if isinstance(data, list) else []:
+        name = str(entry.get("name") or "").strip() if isinstance(entry, dict) else ""
+        if name:
+            yield Style(name, entry.get("prompt"), entry.get("negative_prompt"), path)
+
+
+def presets_store():
+    """The saved style pool, shared by Random Styles and the sweep planner."""
+    return get_store(PRESETS_FILE, DEFAULT_POOL)
+
+
+def pool_name(entry):
+    """Pool entries are style names, or {"name", "weight"} when weighted."""
+    return entry["name"] if isinstance(entry, dict) else entry
+
+
+def pool_weight(entry):
+    return entry.get("weight", 1) if isinstance(entry, dict) else 1
+
+
+def find_styler_files(extensions_dir):
+    """SDXL styler JSON files shipped by installed extensions."""
+    found = []
+    for pattern in STYLER_PATTERNS:
+        found.extend(glob.glob(os.path.join(extensions_dir, "*", pattern)))
+    return sorted(set(found))
+
+
+def find_style_files(styles_file, extensions_dir=None):
+    """The WebUI's styles CSV file(s) (``--styles-file``, globs allowed) followed by SDXL styler files."""
+    csv_files = styles_file or []
+    if isinstance(csv_files, str):
+        csv_files = [csv_files]
+    paths = []
+    for pattern in csv_files:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths + find_styler_files(extensions_dir or os.path.dirname(EXTENSION_DIR))
+
+
+def apply_styles(p, styles):
+    """Expand every image's prompts once, up front; batches then just slice ``all_prompts``.
+
+    ``styles`` holds one style per image, or a single style for the whole job.
+    """
+    # Prompts are expanded into all_prompts before process() runs, so p.styles would be too late
+    p.prompt = styles[0].apply_positive(p.prompt)
+    p.negative_prompt = styles[0].apply_negative(p.negative_prompt)
+    for attr, positive in (("all_prompts", True), ("all_negative_prompts", False),
+                           ("all_hr_prompts", True), ("all_hr_negative_prompts", False)):
+        prompts = getattr(p, attr, None)
+        if not prompts:
+            continue
+        per_image = styles if len(styles) == len(prompts) else [styles[0]] * len(prompts)
+        setattr(p, attr, [style.apply_positive(prompt) if positive else style.apply_negative(prompt)
+                          for style, prompt in zip(per_image, prompts)])
+    # A list gives each image's infotext its own entry
+    names = [style.name for style in styles]
+    p.extra_generation_params["Random Style"] = names[0] if len(set(names)) == 1 else names
+
+
+class StyleCatalog:
+    """Styles from a list of CSV/JSON files; earlier files win on duplicate names."""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), [Style, ...])
+        self._files = {}
+        self._styles = {}
+        self._folded = []
+
+    def refresh(self):
+        """Re-parse files that changed since the last call and rebuild the index if any did."""
+        with self._lock:
+            changed = False
+            files = {}
+            for path in self.paths:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    changed = changed or path in self._files
+                    continue
+                stamp = (st.st_mtime_ns, st.st_size)
+                cached = self._files.get(path)
+                if cached and cached[0] == stamp:
+                    files[path] = cached
+                    continue
+                try:
+                    reader = _read_json if path.lower().endswith(".json") else _read_csv
+                    files[path] = (stamp, list(reader(path)))
+                except (OSError, ValueError, csv.Error) as e:
+                    log.warning(f"Could not read styles from {path}: {e}")
+                    files[path] = (stamp, [])
+                changed = True
+            if changed or len(files) != len(self._files):
+                styles = {}
+                for path in self.paths:
+                    for style in files.get(path, (None, []))[1]:
+                        styles.setdefault(style.name, style)
+                self._styles = styles
+                self._folded = sorted((name.casefold(), name) for name in styles)
+            self._files = files
+
+    def names(self):
+        with self._lock:
+            return [name for _, name in self._folded]
+
+    def get(self, name):
+        with self._lock:
+            return self._styles.get(name)
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._styles
+
+    def search(self, query, limit=50):
+        """Names matching ``query``: prefix matches first, then substrings, then close spellings."""
+        with self._lock:
+            folded = self._folded
+        query = (query or "").strip().casefold()
+        if not query:
+            return [name for _, name in folded[:limit]]
+        results = []
+        start = bisect.bisect_left(folded, (query,))
+        for key, name in folded[start:]:
+            if not key.startswith(query) or len(results) >= limit:
+                break
+            results.append(name)
+        seen = set(results)
+        for key, name in folded:
+            if len(results) >= limit:
+                break
+            if query in key and name not in seen:
+                results.append(name)
+                seen.add(name)
+        if len(results) < limit:
+            keys = [key for key, _ in folded]
+            by_key = dict(folded)
+            for key in difflib.get_close_matches(query, keys, n=limit - len(results), cutoff=0.6):
+                if by_key[key] not in seen:
+                    results.append(by_key[key])
+        return results
+
+    def suggest(self, name):
+        """The closest known style name, for 'did you mean' messages."""
+        matches = self.search(name, limit=1)
+        return matches[0] if matches else None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def shared_catalog(paths):
+    """One catalog for every script, loaded from ``paths`` on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = StyleCatalog(paths)
+            _catalog.refresh()
+            log.info(f"Loaded {len(_catalog.names())} styles from {len(paths)} file(s)")
+        return _catalog
@@ -0,0 +1,188 @@
+"""Combinatorial sweeps over dimensions, faces and styles.
+
+A plan is either the full cartesian product, indexed lazily so a large
+sweep costs nothing until it runs, or a stratified (Latin hypercube) sample
+in which every level of every axis appears as evenly as the sample size
+allows. Combinations are ordered face first, because FaceSwapLab reads its
+checkpoint once per job. Within a face, identical sizes sit next to each
+other. Sizes run in serpentine order, so the last size of one face is the
+first size of the next.
+
+Progress is kept per plan signature, so a sweep resumes where it stopped.
+"""
+import hashlib
+import json
+import os
+from collections import Counter, namedtuple
+
+from a1111_tweaks import EXTENSION_DIR
+from a1111_tweaks.config_store import get_store
+from a1111_tweaks.sampling import derive_rng
+
+PROGRESS_FILE = os.path.join(EXTENSION_DIR, "sweep_progress.json")
+MODES = ["Full product", "Stratified sample"]
+AXES = ["Dimensions", "Faces", "Styles"]
+STREAM = "sweep"
+# Set on the processing object by the sweep script, so the random_* scripts stand down
+ATTR = "a1111_tweaks_sweep"
+
+Combination = namedtuple("Combination", ["size", "face", "style"])
+
+
+def progress_store():
+    return get_store(PROGRESS_FILE, {})
+
+
+def claimed(p):
+    """True when the sweep owns this job's dimensions, face and style."""
+    return getattr(p, ATTR, None) is not None
+
+
+def _order_key(combo):
+    d, f, s = combo
+    # Serpentine: odd faces walk the sizes backwards
+    return f, -d if f % 2 else d, s
+
+
+def _stratified(counts, size, rng, attempts=1000):
+    """``size`` distinct index triples; each axis's levels appear ``size // k`` or one more times."""
+    columns = []
+    for k in counts:
+        column = [i % k for i in range(size)]
+        rng.shuffle(column)
+        columns.append(column)
+    rows = [list(row) for row in zip(*columns)]
+    seen = Counter(tuple(row) for row in rows)
+    for r, row in enumerate(rows):
+        # Repair duplicates by swapping one axis value with another row, which keeps every level's count
+        for _ in range(attempts if seen[tuple(row)] > 1 else 0):
+            axis, other = rng.randrange(len(counts)), rows[rng.randrange(size)]
+            a, b = row[:], other[:]
+            a[axis], b[axis] = b[axis], a[axis]
+            if other is row or seen[tuple(a)] or seen[tuple(b)]:
+                continue
+            seen[tuple(row)] -= 1
+            seen[tuple(other)] -= 1
+            row[:], other[:] = a, b
+            seen[tuple(row)] += 1
+            seen[tuple(other)] += 1
+            break
+    combos = list(dict.fromkeys(tuple(row) for row in rows))
+    # Only reachable when the sample is nearly the whole product; fill the gaps at random
+    taken = set(combos)
+    while len(combos) < size:
+        combo = tuple(rng.randrange(k) for k in counts)
+        if combo not in taken:
+            taken.add(combo)
+            combos.append(combo)
+    return combos
+
+
+class SweepPlan:
+    """The combinations of one sweep, in run order.
+
+    ``sizes``, ``faces`` and ``styles`` are the levels of each axis; pass
+    ``[None]`` for an axis the sweep leaves alone. A stratified plan with
+    ``sample_size`` at or above the full product is the full product.
+    """
+
+    def __init__(self, sizes, faces, styles, mode=MODES[0], sample_size=0, seed=0):
+        self.sizes = [tuple(size) if size is not None else None for size in sizes]
+        self.faces = list(faces)
+        self.styles = list(styles)
+        if not (self.sizes and self.faces and self.styles):
+            raise ValueError("every axis needs at least one level")
+        self.product = len(self.sizes) * len(self.faces) * len(self.styles)
+        self.mode = mode
+        self.sample_size = int(sample_size)
+        self.seed = int(seed)
+        self._indices = None
+        if mode == MODES[1] and 0 < self.sample_size < self.product:
+            counts = (len(self.sizes), len(self.faces), len(self.styles))
+            sample = _stratified(counts, self.sample_size, derive_rng(self.seed, STREAM))
+            self._indices = sorted(sample, key=_order_key)
+
+    def __len__(self):
+        return len(self._indices) if self._indices is not None else self.product
+
+    def indices(self, i):
+        """(size, face, style) level indices of the ``i``-th combination."""
+        if self._indices is not None:
+            return self._indices[i]
+        if not 0 <= i < self.product:
+            raise IndexError(i)
+        f, rest = divmod(i, len(self.sizes) * len(self.styles))
+        d, s = divmod(rest, len(self.styles))
+        if f % 2:
+            d = len(self.sizes) - 1 - d
+        return d, f, s
+
+    def combination(self, i):
+        d, f, s = self.indices(i)
+        return Combination(self.sizes[d], self.faces[f], self.styles[s])
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start):
+        """Combinations from ``start`` on, produced as they are consumed."""
+        for i in range(start, len(self)):
+            yield self.combination(i)
+
+    def signature(self):
+        """Stable id of the plan, used as the key for saved progress."""
+        data = {
+            "sizes": self.sizes, "faces": self.faces, "styles": self.styles,
+            "mode": self.mode if self._indices is not None else MODES[0],
+            "sample_size": self.sample_size if self._indices is not None else 0,
+            "seed": self.seed if self._indices is not None else 0,
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def face_run_end(self, start):
+        """Index just past the run of combinations sharing the face at ``start``."""
+        face = self.indices(start)[1]
+        if self._indices is None:
+            per_face = len(self.sizes) * len(self.styles)
+            return (face + 1) * per_face
+        end = start
+        while end < len(self) and self._indices[end][1] == face:
+            end += 1
+        return end
+
+    def switches(self, start=0, stop=None):
+        """(size switches, face switches) between consecutive combinations in ``start:stop``."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        size_switches = face_switches = 0
+        previous = None
+        for i in range(start, stop):
+            d, f, _ = self.indices(i)
+            if previous is not None:
+                size_switches += d != previous[0]
+                face_switches += f != previous[1]
+            previous = (d, f)
+        return size_switches, face_switches
+
+
+class SweepProgress:
+    """Position reached in each plan, by signature, kept in a config store."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def position(self, plan):
+        entry = self.store.load().get(plan.signature())
+        return min(entry["done"], len(plan)) if entry else 0
+
+    def advance(self, plan, done):
+        """Record that every combination before ``done`` has run."""
+        key = plan.signature()
+
+        def save(table):
+            entry = table.setdefault(key, {"done": 0, "total": len(plan)})
+            entry["done"] = max(entry["done"], done)
+
+        self.store.update(save)
+
+    def reset(self, plan):
+        self.store.update(lambda table: table.pop(plan.signature(), None))
@@ -0,0 +1,200 @@
+import collections
+import concurrent.futures
+import hashlib
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+THUMBNAIL_SUFFIX = ".webp"
+
+
+class ThumbnailCache:
+    """Disk-backed cache of small WebP thumbnails with an LRU byte budget.
+
+    Entries are keyed by (path, mtime, size) of the source image, so an
+    edited or replaced file gets a fresh thumbnail and the stale one ages out.
+    """
+
+    def __init__(self, cache_dir, max_bytes, max_size=(256, 256), quality=80):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.quality = quality
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Rebuild the LRU order from the files left by a previous session."""
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(THUMBNAIL_SUFFIX):
+                    st = entry.stat()
+                    found.append((st.st_atime, entry.name[:-len(THUMBNAIL_SUFFIX)], st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _key(self, path, st):
+        raw = f"{path}\0{st.st_mtime_ns}\0{st.st_size}".encode("utf-8", "surrogateescape")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir, key + THUMBNAIL_SUFFIX)
+
+    def ensure(self, path):
+        """Make sure a thumbnail exists; returns (thumbnail_path, size, was_cached).
+
+        Does not touch the hit/miss counters, so background prefetching does
+        not skew the numbers reported for pages the user actually viewed.
+        """
+        st = os.stat(path)
+        key = self._key(path, st)
+        thumb = self._file(key)
+        with self._lock:
+            size = self._entries.get(key)
+            if size is not None and os.path.exists(thumb):
+                self._entries.move_to_end(key)
+                return thumb, size, True
+
+        size = self._render(path, thumb)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+        return thumb, size, False
+
+    def get(self, path):
+        """Return the path of a thumbnail for ``path``, creating it on a miss."""
+        thumb, size, was_cached = self.ensure(path)
+        with self._lock:
+            if was_cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.bytes_served += size
+        return thumb
+
+    def _render(self, path, thumb):
+        with Image.open(path) as img:
+            img.draft("RGB", self.max_size)
+            img.thumbnail(self.max_size)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            # Unique per render: two tabs, or a prefetch and a page view, may render the same key at once
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, format="WEBP", quality=self.quality, method=4)
+                os.replace(tmp, thumb)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+        return os.path.getsize(thumb)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_served": self.bytes_served,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+            }
+
+
+class ThumbnailPipeline:
+    """Renders a page of thumbnails concurrently and prefetches its neighbours.
+
+    Prefetch work is bounded by ``max_pending``; whenever a new page is
+    requested, queued prefetches that the page does not need are cancelled,
+    so jumping across the gallery never leaves a backlog of stale renders.
+    """
+
+    def __init__(self, cache, workers=4, max_pending=40):
+        self.cache = cache
+        self.max_pending = max_pending
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="gallery-thumbs")
+        # Re-entrant: done callbacks run inline when a future finished before registration
+        self._lock = threading.RLock()
+        self._prefetching = {}
+
+    def render_page(self, paths):
+        """Return thumbnail paths aligned with ``paths``, falling back to the original file."""
+        with self._lock:
+            # Prefetches for this page already did (or are doing) the work; keep them
+            reused = {path: self._prefetching.pop(path) for path in paths if path in self._prefetching}
+            self._cancel_prefetches()
+        futures = [None if path in reused else self._pool.submit(self.cache.get, path) for path in paths]
+        thumbs = []
+        for path, future in zip(paths, futures):
+            try:
+                if future is None:
+                    # Wait here rather than in a worker so a queued prefetch can never starve
+                    self._wait(reused[path])
+                    thumbs.append(self.cache.get(path))
+                else:
+                    thumbs.append(future.result())
+            except Exception:
+                thumbs.append(path)
+        return thumbs
+
+    @staticmethod
+    def _wait(future):
+        try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            pass
+
+    def prefetch(self, paths):
+        """Queue background renders for ``paths`` up to the pending limit."""
+        with self._lock:
+            for path in paths:
+                if len(self._prefetching) >= self.max_pending:
+                    break
+                if path in self._prefetching:
+                    continue
+                future = self._pool.submit(self.cache.ensure, path)
+                self._prefetching[path] = future
+                future.add_done_callback(lambda f, path=path: self._done(path, f))
+
+    def _done(self, path, future):
+        with self._lock:
+            if self._prefetching.get(path) is future:
+                del self._prefetching[path]
+
+    def _cancel_prefetches(self):
+        pending = list(self._prefetching.values())
+        self._prefetching.clear()
+        for future in pending:
+            future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            self._cancel_prefetches()
+        self._pool.shutdown(wait=False)
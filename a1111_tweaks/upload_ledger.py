@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from a1111_tweaks import EXTENSION_DIR
+
+LEDGER_FILE = os.path.join(EXTENSION_DIR, "wanly_uploads.sqlite3")
+HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploaded (
+    sha256 TEXT NOT NULL,
+    api_url TEXT NOT NULL,
+    remote_path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (sha256, api_url)
+);
+CREATE TABLE IF NOT EXISTS chunk_sessions (
+    sha256 TEXT NOT NULL,
+    api_url TEXT NOT NULL,
+    upload_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (sha256, api_url)
+);
+"""
+
+
+def hash_file(path):
+    """SHA-256 of a file, read in fixed-size chunks so it is never fully in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class UploadLedger:
+    """Persistent content-hash -> remote path record of finished uploads.
+
+    Entries are per server URL, so switching ``api_url`` uploads again.
+    """
+
+    def __init__(self, db_path):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def lookup(self, sha256, api_url):
+        """Remote path of an earlier upload of this content, counting the hit or miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT remote_path FROM uploaded WHERE sha256 = ? AND api_url = ?",
+                (sha256, api_url)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def record(self, sha256, api_url, remote_path, filename):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploaded (sha256, api_url, remote_path, filename, uploaded_at) "
+                "VALUES (?, ?, ?, ?, ?)", (sha256, api_url, remote_path, filename, time.time()))
+            self._conn.commit()
+
+    def forget(self, sha256, api_url):
+        with self._lock:
+            self._conn.execute("DELETE FROM uploaded WHERE sha256 = ? AND api_url = ?", (sha256, api_url))
+            self._conn.commit()
+
+    def sessions(self):
+        """Dict-like view of open chunked upload sessions keyed by (sha256, api_url)."""
+        return _ChunkSessions(self)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM uploaded").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+class _ChunkSessions:
+    def __init__(self, ledger):
+        self._ledger = ledger
+
+    def get(self, key, default=None):
+        with self._ledger._lock:
+            row = self._ledger._conn.execute(
+                "SELECT upload_id FROM chunk_sessions WHERE sha256 = ? AND api_url = ?", key).fetchone()
+        return row[0] if row else default
+
+    def __setitem__(self, key, upload_id):
+        with self._ledger._lock:
+            self._ledger._conn.execute(
+                "INSERT OR REPLACE INTO chunk_sessions (sha256, api_url, upload_id, created_at) VALUES (?, ?, ?, ?)",
+                key + (upload_id, time.time()))
+            self._ledger._conn.commit()
+
+    def pop(self, key, default=None):
+        upload_id = self.get(key, default)
+        with self._ledger._lock:
+            self._ledger._conn.execute("DELETE FROM chunk_sessions WHERE sha256 = ? AND api_url = ?", key)
+            self._ledger._conn.commit()
+        return upload_id
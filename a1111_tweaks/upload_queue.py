@@ -0,0 +1,237 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from a1111_tweaks import EXTENSION_DIR, metrics, wanly
+
+QUEUE_FILE = os.path.join(EXTENSION_DIR, "upload_queue.sqlite3")
+SPOOL_DIR = os.path.join(EXTENSION_DIR, "upload_spool")
+
+PENDING = "pending"
+UPLOADING = "uploading"
+RETRYING = "retrying"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filepath TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    spooled INTEGER NOT NULL DEFAULT 0,
+    api_url TEXT,
+    api_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_due ON uploads (status, next_attempt_at);
+"""
+
+
+class UploadQueue:
+    """Persistent upload queue drained by a small pool of worker threads.
+
+    Items live in SQLite, so anything still pending when the WebUI stops is
+    picked up again on the next start. Retryable failures are rescheduled
+    with exponential backoff and jitter; others fail immediately.
+    """
+
+    def __init__(self, db_path, spool_dir, send, workers=2, max_attempts=6,
+                 backoff_base=2.0, backoff_max=300.0):
+        self.spool_dir = spool_dir
+        self.send = send
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop = False
+        self._threads = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Anything mid-upload when the process died gets another go
+        self._conn.execute("UPDATE uploads SET status = ? WHERE status = ?", (PENDING, UPLOADING))
+        self._conn.commit()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"wanly-upload-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            self._stop = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, filename, filepath=None, image=None, api_url=None, api_key=None):
+        """Queue an upload and return its id.
+
+        In-memory images are spooled to a file first, in the configured
+        upload encoding, so the queue only ever holds paths; the spool file
+        is removed once the upload finishes.
+        """
+        spooled = 0
+        if not filepath or not os.path.isfile(filepath):
+            if image is None:
+                raise ValueError("no file on disk and no image to spool")
+            data, ext, _ = wanly.encode_image(image, wanly.encoding_settings(wanly.load_config()))
+            filename = wanly.upload_filename(filename, ext)
+            os.makedirs(self.spool_dir, exist_ok=True)
+            filepath = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{ext}")
+            with open(filepath, "wb") as f:
+                f.write(data)
+            spooled = 1
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO uploads (filepath, filename, spooled, api_url, api_key, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (filepath, filename, spooled, api_url, api_key, PENDING, now, now))
+            self._conn.commit()
+            self._wakeup.notify()
+            return cur.lastrowid
+
+    def _claim(self):
+        """Mark the oldest due item as uploading; returns (row, seconds_until_next_due)."""
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT id, filepath, filename, spooled, api_url, api_key, attempts FROM uploads "
+            "WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+            (PENDING, RETRYING, now)).fetchone()
+        if row is not None:
+            self._conn.execute("UPDATE uploads SET status = ?, updated_at = ? WHERE id = ?",
+                               (UPLOADING, now, row[0]))
+            self._conn.commit()
+            return row, None
+        due = self._conn.execute(
+            "SELECT MIN(next_attempt_at) FROM uploads WHERE status = ?", (RETRYING,)).fetchone()[0]
+        return None, (due - now if due is not None else None)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self._stop:
+                        return
+                    row, wait = self._claim()
+                    if row is not None:
+                        break
+                    self._wakeup.wait(timeout=wait if wait is not None else 30)
+            self._process(row)
+
+    def _process(self, row):
+        item_id, filepath, filename, spooled, api_url, api_key, attempts = row
+        attempts += 1
+        if not os.path.isfile(filepath):
+            ok, message, retryable = False, f"Error: file is gone: {filepath}", False
+        else:
+            try:
+                ok, message, retryable = self.send(filepath, filename, api_url, api_key)
+            except Exception as e:
+                ok, message, retryable = False, f"Error: {e}", True
+
+        now = time.time()
+        if ok:
+            status, next_at = DONE, 0
+        elif retryable and attempts < self.max_attempts:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            status, next_at = RETRYING, now + delay * random.uniform(0.5, 1.0)
+            message = f"{message} (attempt {attempts}/{self.max_attempts}, retrying in {next_at - now:.0f}s)"
+        else:
+            status, next_at = FAILED, 0
+        with self._lock:
+            self._conn.execute(
+                "UPDATE uploads SET status = ?, attempts = ?, next_attempt_at = ?, message = ?, updated_at = ? "
+                "WHERE id = ?", (status, attempts, next_at, message, now, item_id))
+            self._conn.commit()
+            self._wakeup.notify()
+        if status == DONE and spooled:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+
+    def counts(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM uploads GROUP BY status"))
+        return {status: counts.get(status, 0) for status in (PENDING, UPLOADING, RETRYING, DONE, FAILED)}
+
+    def recent(self, limit=10):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, filename, status, attempts, message FROM uploads ORDER BY id DESC LIMIT ?",
+                (limit,)).fetchall()
+
+    def retry_failed(self):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE uploads SET status = ?, attempts = 0, next_attempt_at = 0, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED))
+            self._conn.commit()
+            self._wakeup.notify_all()
+            return cur.rowcount
+
+    def clear_finished(self):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM uploads WHERE status = ?", (DONE,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def status_text(self, limit=10):
+        """Summary line plus the most recent items, for the UI status panel."""
+        counts = self.counts()
+        lines = [", ".join(f"{status}: {count}" for status, count in counts.items())]
+        for item_id, filename, status, attempts, message in self.recent(limit):
+            lines.append(f"#{item_id} {filename} [{status}, {attempts} attempt(s)] {message}".rstrip())
+        return "\n".join(lines)
+
+
+def _send(filepath, filename, api_url, api_key):
+    return wanly.upload(filename, filepath=filepath, api_url=api_url, api_key=api_key)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_queue():
+    """The extension-wide queue, created and started on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = UploadQueue(QUEUE_FILE, SPOOL_DIR, send=_send)
+            _shared.start()
+        return _shared
+
+
+def _collect_metrics():
+    # Read only; a scrape never creates or starts the queue
+    queue = _shared
+    if queue is None:
+        return []
+    counts = queue.counts()
+    items = metrics.Family("a1111_tweaks_upload_queue_items", "gauge", "Upload queue items by status")
+    for status, count in counts.items():
+        items.add(count, status=status)
+    depth = metrics.Family("a1111_tweaks_upload_queue_depth", "gauge", "Upload queue items not yet done or failed")
+    return [items, depth.add(counts[PENDING] + counts[UPLOADING] + counts[RETRYING])]
+
+
+metrics.register_collector("upload_queue", _collect_metrics)
@@ -0,0 +1,446 @@
+import concurrent.futures
+import io
+import mimetypes
+import os
+import threading
+import time
+import uuid
+
+import requests
+import requests.adapters
+
+from a1111_tweaks import EXTENSION_DIR, metrics
+from a1111_tweaks.config_store import get_store
+from a1111_tweaks.upload_ledger import LEDGER_FILE, UploadLedger, hash_bytes, hash_file
+
+CONFIG_FILE = os.path.join(EXTENSION_DIR, "upload_to_wanly_config.json")
+READ_CHUNK = 256 * 1024
+# Responses worth retrying later; other 4xx errors will fail the same way again
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class MultipartFileBody:
+    """A multipart/form-data body with one file part that is read lazily.
+
+    ``requests`` sees a sized file-like object, sends a Content-Length
+    header and streams ``read()`` output to the socket, so the file is never
+    held in memory as a whole.
+    """
+
+    def __init__(self, fileobj, size, filename, content_type, field="file"):
+        self.boundary = uuid.uuid4().hex
+        safe_name = filename.replace("\\", "_").replace('"', "_").replace("\r", "").replace("\n", "")
+        head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{safe_name}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self._fileobj = fileobj
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._length = len(head) + size + len(tail)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        out = []
+        while size > 0 and self._parts:
+            data = self._parts[0].read(min(size, READ_CHUNK))
+            if not data:
+                self._parts.pop(0)
+                continue
+            out.append(data)
+            size -= len(data)
+        return b"".join(out)
+
+    def close(self):
+        self._fileobj.close()
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def guess_content_type(filename):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def file_body(filepath, filename=None):
+    """Stream an image file exactly as it is on disk, with no decode or re-encode."""
+    filename = filename or os.path.basename(filepath)
+    f = open(filepath, "rb")
+    return MultipartFileBody(f, os.fstat(f.fileno()).st_size, filename, guess_content_type(filename))
+
+
+ENCODINGS = ("passthrough", "png", "webp-lossless", "jpeg")
+DEFAULT_ENCODING = {"encoding": "png", "png_compress_level": 1, "png_optimize": False, "jpeg_quality": 95}
+_EXIF_IFD = 0x8769
+_USER_COMMENT = 0x9286
+
+
+def encoding_settings(config):
+    """Upload encoding options from the config, with defaults filled in."""
+    settings = {key: config.get(key, default) for key, default in DEFAULT_ENCODING.items()}
+    if settings["encoding"] not in ENCODINGS:
+        settings["encoding"] = DEFAULT_ENCODING["encoding"]
+    return settings
+
+
+def _exif_with_comment(text):
+    """EXIF block carrying infotext as a UserComment, the way the WebUI writes JPEG/WebP."""
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif.get_ifd(_EXIF_IFD)[_USER_COMMENT] = b"UNICODE\0" + text.encode("utf-16-be")
+    return exif.tobytes()
+
+
+def encode_image(image, settings=None, infotext=None):
+    """Encode an in-memory PIL image for upload; returns (data, extension, content_type).
+
+    ``infotext`` defaults to the image's own ``parameters`` text and is kept
+    as a PNG text chunk or an EXIF UserComment. ``passthrough`` sends the
+    bytes of the file the image was opened from when that still exists.
+    """
+    settings = settings or DEFAULT_ENCODING
+    encoding = settings.get("encoding", "png")
+    if infotext is None:
+        infotext = image.info.get("parameters")
+
+    source = getattr(image, "filename", "")
+    if encoding == "passthrough" and source and os.path.isfile(source):
+        with open(source, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(source)[1].lower()
+        return data, ext, guess_content_type(source)
+
+    buf = io.BytesIO()
+    if encoding == "webp-lossless":
+        # method 0 is the fastest lossless effort; higher levels shrink little for photographic content
+        kwargs = {"exif": _exif_with_comment(infotext)} if infotext else {}
+        image.save(buf, format="WEBP", lossless=True, quality=0, method=0, **kwargs)
+        return buf.getvalue(), ".webp", "image/webp"
+    if encoding == "jpeg":
+        kwargs = {"exif": _exif_with_comment(infotext)} if infotext else {}
+        image.convert("RGB").save(buf, format="JPEG", quality=int(settings.get("jpeg_quality", 95)),
+                                  subsampling=0, **kwargs)
+        return buf.getvalue(), ".jpg", "image/jpeg"
+
+    from PIL.PngImagePlugin import PngInfo
+
+    pnginfo = None
+    if infotext:
+        pnginfo = PngInfo()
+        pnginfo.add_text("parameters", infotext)
+    image.save(buf, format="PNG", pnginfo=pnginfo,
+               compress_level=int(settings.get("png_compress_level", 1)),
+               optimize=bool(settings.get("png_optimize", False)))
+    return buf.getvalue(), ".png", "image/png"
+
+
+def upload_filename(filename, ext):
+    """``filename`` with its extension swapped for the one the encoder produced."""
+    root, old = os.path.splitext(filename)
+    return filename if old.lower() == ext or (old.lower(), ext) == (".jpeg", ".jpg") else root + ext
+
+
+def bytes_body(data, filename, content_type="image/png"):
+    return MultipartFileBody(io.BytesIO(data), len(data), filename, content_type)
+
+
+def config_store():
+    return get_store(CONFIG_FILE, {"api_url": "", "api_key": ""})
+
+
+def load_config():
+    """Wanly upload config; cached until the file changes on disk."""
+    return config_store().load()
+
+
+class WanlyClient:
+    """Wanly API client holding a pooled keep-alive ``requests.Session``.
+
+    Connections are reused across uploads, so only the first request to a
+    host pays for the TCP (and TLS) handshake. ``pool_size`` should be at
+    least the number of threads uploading concurrently.
+
+    With a ``ledger``, content already uploaded to the same server is
+    skipped. ``verify_url`` (e.g. ``"{api_url}/{path}"``) optionally
+    confirms with a HEAD request that the remote copy still exists.
+
+    A non-zero ``chunk_size`` enables the chunked protocol for large files:
+    ``POST /images/uploads`` opens a session, ``PUT /images/uploads/<id>``
+    sends each chunk at its offset, ``GET`` reports the acknowledged offset
+    and ``POST /images/uploads/<id>/complete`` verifies the SHA-256.
+    """
+
+    def __init__(self, pool_size=8, connect_timeout=5.0, read_timeout=60.0, ledger=None, verify_url="",
+                 chunk_size=0, chunk_threshold=8 * 1024 * 1024, chunk_retries=5):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.ledger = ledger
+        self.verify_url = verify_url
+        self.chunk_size = chunk_size
+        self.chunk_threshold = chunk_threshold
+        self.chunk_retries = chunk_retries
+        # In-progress chunked uploads; persisted with the ledger so they survive restarts
+        self._sessions = ledger.sessions() if ledger is not None else {}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _still_uploaded(self, api_url, api_key, remote_path, sha256):
+        if not self.verify_url:
+            return True
+        url = self.verify_url.format(api_url=api_url, path=remote_path, sha256=sha256)
+        try:
+            resp = self.session.head(url, headers={"X-API-Key": api_key}, timeout=self.timeout)
+        except requests.RequestException:
+            return False
+        if resp.status_code == 200:
+            return True
+        if resp.status_code in (404, 410):
+            self.ledger.forget(sha256, api_url)
+        return False
+
+    def upload(self, filename, filepath=None, image=None, api_url=None, api_key=None, force=False):
+        """Upload one image; returns (success, message, retryable).
+
+        ``api_url``/``api_key`` default to the saved config. Unless
+        ``force`` is set, content the ledger has seen is not sent again.
+        Files of at least ``chunk_threshold`` bytes use the resumable
+        chunked protocol when it is enabled.
+        """
+        started = time.monotonic()
+        result = self._upload(filename, filepath, image, api_url, api_key, force)
+        metrics.UPLOAD_SECONDS.observe(time.monotonic() - started)
+        metrics.UPLOADS.inc(result="ok" if result[0] else "retryable" if result[2] else "failed")
+        return result
+
+    def _upload(self, filename, filepath, image, api_url, api_key, force):
+        if api_url is None or api_key is None:
+            config = load_config()
+            if api_url is None:
+                api_url = config.get("api_url", "")
+            if api_key is None:
+                api_key = config.get("api_key", "")
+
+        api_url = (api_url or "").rstrip("/")
+        if not api_url:
+            return False, "Error: API URL not set.", False
+        if not api_key:
+            return False, "Error: API Key not set.", False
+
+        try:
+            content_type = None
+            if filepath and os.path.isfile(filepath):
+                data = None
+            elif image is not None:
+                data, ext, content_type = encode_image(image, encoding_settings(load_config()))
+                filename = upload_filename(filename, ext)
+            else:
+                raise ValueError("no file on disk and no image to encode")
+
+            digest = None
+            if self.ledger is not None:
+                digest = hash_file(filepath) if data is None else hash_bytes(data)
+                remote = None if force else self.ledger.lookup(digest, api_url)
+                if remote is not None and self._still_uploaded(api_url, api_key, remote, digest):
+                    return True, f"Already uploaded: {remote}", False
+
+            if data is None and self.chunk_size and os.path.getsize(filepath) >= self.chunk_threshold:
+                result = self._upload_chunked(api_url, api_key, filename, filepath, digest or hash_file(filepath))
+                if result is not None:
+                    return result
+
+            body = file_body(filepath, filename) if data is None else bytes_body(data, filename, content_type)
+            with body:
+                resp = self.session.post(
+                    f"{api_url}/images/upload",
+                    params={"filename": filename},
+                    headers={"X-API-Key": api_key, "Content-Type": body.content_type},
+                    data=body,
+                    timeout=self.timeout,
+                )
+            metrics.UPLOAD_BYTES.inc(len(body))
+            if resp.status_code != 200:
+                return _failure(resp)
+            # Decoded inside the handler: a proxy's HTML page is a failed upload, not an exception
+            path = resp.json().get("path", "")
+            if digest is not None and path:
+                self.ledger.record(digest, api_url, path, filename)
+            return True, f"Uploaded: {path}", False
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return False, f"Error: {e}", True
+        except Exception as e:
+            return False, f"Error: {e}", False
+
+    def _upload_chunked(self, api_url, api_key, filename, filepath, digest):
+        """Send ``filepath`` in fixed-size chunks, resuming from the server's acknowledged offset.
+
+        Returns None when the server does not speak the chunked protocol, so
+        the caller can fall back to a single POST. Called from inside
+        ``_upload``'s error handling, which turns request errors and response
+        bodies that aren't the expected JSON into failed results.
+        """
+        base = f"{api_url}/images/uploads"
+        headers = {"X-API-Key": api_key}
+        size = os.path.getsize(filepath)
+        upload_id = self._sessions.get((digest, api_url))
+        offset = None
+        if upload_id:
+            resp = self.session.get(f"{base}/{upload_id}", headers=headers, timeout=self.timeout)
+            if resp.status_code == 200:
+                offset = resp.json()["offset"]
+        if offset is None:
+            resp = self.session.post(base, json={"filename": filename, "size": size, "sha256": digest},
+                                     headers=headers, timeout=self.timeout)
+            if resp.status_code in (404, 405, 501):
+                return None
+            if resp.status_code != 200:
+                return _failure(resp)
+            upload_id, offset = resp.json()["upload_id"], resp.json().get("offset", 0)
+            self._sessions[(digest, api_url)] = upload_id
+
+        failures = 0
+        with open(filepath, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                try:
+                    resp = self.session.put(
+                        f"{base}/{upload_id}",
+                        params={"offset": offset},
+                        data=chunk,
+                        headers={**headers, "Content-Type": "application/octet-stream",
+                                 "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"},
+                        timeout=self.timeout,
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    resp = None
+                else:
+                    metrics.UPLOAD_BYTES.inc(len(chunk))
+                if resp is not None and resp.status_code in (200, 409):
+                    # 409 means the server holds a different offset (e.g. a lost ack); carry on from there
+                    offset = resp.json()["offset"]
+                    if resp.status_code == 200:
+                        failures = 0
+                    continue
+                if resp is not None and resp.status_code not in RETRYABLE_STATUS:
+                    return _failure(resp)
+                failures += 1
+                if failures > self.chunk_retries:
+                    # The session id is kept, so the next attempt resumes from the last acknowledged chunk
+                    return False, f"Error: upload stalled at {offset}/{size} bytes", True
+                time.sleep(min(0.25 * 2 ** failures, 5.0))
+
+        resp = self.session.post(f"{base}/{upload_id}/complete", headers=headers, timeout=self.timeout)
+        if resp.status_code == 200:
+            self._sessions.pop((digest, api_url), None)
+            path = resp.json().get("path", "")
+            if self.ledger is not None and path:
+                self.ledger.record(digest, api_url, path, filename)
+            return True, f"Uploaded: {path} ({-(-size // self.chunk_size)} chunks)", False
+        if resp.status_code == 422:
+            # Checksum mismatch: the server's copy is bad, start over on the next attempt
+            self._sessions.pop((digest, api_url), None)
+            return False, f"Error 422: checksum verification failed: {resp.text}", True
+        return _failure(resp)
+
+
+def _failure(resp):
+    return False, f"Error {resp.status_code}: {resp.text}", resp.status_code in RETRYABLE_STATUS
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared client, built from the pool/timeout settings in the config on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = load_config()
+            _client = WanlyClient(
+                pool_size=int(config.get("pool_size", 8)),
+                connect_timeout=float(config.get("connect_timeout", 5)),
+                read_timeout=float(config.get("read_timeout", 60)),
+                ledger=UploadLedger(LEDGER_FILE) if config.get("dedup", True) else None,
+                verify_url=config.get("dedup_verify_url", ""),
+                chunk_size=int(config.get("chunk_size", 0)),
+                chunk_threshold=int(config.get("chunk_threshold", 8 * 1024 * 1024)),
+            )
+        return _client
+
+
+def _collect_metrics():
+    client = _client
+    if client is None or client.ledger is None:
+        return []
+    stats = client.ledger.stats()
+    family = metrics.Family("a1111_tweaks_upload_dedup_total", "counter",
+                            "Uploads skipped as duplicates (hit) or sent as new content (miss) since start")
+    family.add(stats["hits"], result="hit").add(stats["misses"], result="miss")
+    known = metrics.Family("a1111_tweaks_upload_ledger_entries", "gauge", "Files recorded as uploaded in the ledger")
+    return [family, known.add(stats["entries"])]
+
+
+metrics.register_collector("wanly", _collect_metrics)
+
+
+def dedup_stats_text():
+    """One-line summary of the upload ledger's hit/miss counters."""
+    ledger = get_client().ledger
+    if ledger is None:
+        return "Duplicate detection off"
+    stats = ledger.stats()
+    return (f"Duplicates skipped: {stats['hits']}, new uploads: {stats['misses']}, "
+            f"known files: {stats['entries']}")
+
+
+def upload(filename, filepath=None, image=None, api_url=None, api_key=None):
+    """Upload one image through the shared pooled client; see ``WanlyClient.upload``."""
+    return get_client().upload(filename, filepath=filepath, image=image, api_url=api_url, api_key=api_key)
+
+
+def upload_batch(filepaths, max_workers=4, on_progress=None):
+    """Upload files concurrently through the shared client.
+
+    Returns ``[(filepath, success, message, retryable), ...]`` in input
+    order. ``on_progress(done, total, filepath, success)`` is called from
+    the calling thread as each upload finishes.
+    """
+    client = get_client()
+    config = load_config()
+    api_url, api_key = config.get("api_url", ""), config.get("api_key", "")
+    results = {}
+    workers = max(1, min(max_workers, client.pool_size))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wanly-batch") as pool:
+        futures = {
+            pool.submit(client.upload, os.path.basename(path), filepath=path, api_url=api_url, api_key=api_key): path
+            for path in filepaths
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = (False, f"Error: {e}", True)
+            if on_progress is not None:
+                on_progress(done, len(futures), path, results[path][0])
+    return [(path,) + results[path] for path in filepaths]
@@ -0,0 +1,218 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+from a1111_tweaks import logs
+
+log = logs.get_logger("watcher")
+
+CREATED = "created"
+DELETED = "deleted"
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+               | _IN_DELETE | _IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# name -> callback
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(callback, name=None):
+    """Register ``callback(event, path)`` for image created/deleted events.
+
+    Subscribers are keyed by ``name``, by default the callback's module and
+    qualified name, so a script re-imported on UI reload replaces its old
+    callback instead of adding a second one.
+    """
+    if name is None:
+        name = f"{callback.__module__}.{callback.__qualname__}"
+    with _subscribers_lock:
+        _subscribers[name] = callback
+
+
+def unsubscribe(callback):
+    with _subscribers_lock:
+        for name, found in list(_subscribers.items()):
+            if found == callback:
+                del _subscribers[name]
+
+
+def publish(event, path):
+    """Deliver an image event to every subscriber; one failing subscriber doesn't stop the rest."""
+    with _subscribers_lock:
+        callbacks = list(_subscribers.values())
+    for callback in callbacks:
+        try:
+            callback(event, path)
+        except Exception as e:
+            log.warning(f"Subscriber error for {path}: {e}")
+
+
+def _load_inotify():
+    if not hasattr(select, "select") or not os.path.exists("/proc/sys/fs/inotify"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ImageWatcher:
+    """Feeds image create/delete events under ``base_dir`` to ``publish``.
+
+    Uses inotify through libc when the kernel provides it and falls back to
+    calling ``poll`` (normally an incremental index refresh) every
+    ``poll_interval`` seconds otherwise, or if inotify setup fails.
+    """
+
+    def __init__(self, base_dir, poll, poll_interval=5.0, suffixes=(".png", ".jpg", ".jpeg", ".webp")):
+        self.base_dir = os.path.abspath(base_dir)
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.suffixes = suffixes
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._watches = {}
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.active:
+            return self.mode
+        self._stop.clear()
+        libc = _load_inotify()
+        if libc is not None and self._init_inotify(libc):
+            self.mode = "inotify"
+            target = self._run_inotify
+        else:
+            self.mode = "polling"
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="gallery-watcher", daemon=True)
+        self._thread.start()
+        log.info(f"Watching {self.base_dir} ({self.mode})")
+        return self.mode
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+        self._thread = None
+        self.mode = None
+
+    def _init_inotify(self, libc):
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self._libc = libc
+        self._fd = fd
+        self._watches = {}
+        try:
+            for root, _, _ in os.walk(self.base_dir):
+                self._add_watch(root)
+        except OSError as e:
+            log.warning(f"Could not watch {self.base_dir}: {e}")
+            self._watches = {}
+        if not self._watches:
+            os.close(fd)
+            self._fd = None
+            return False
+        return True
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            # Typically ENOSPC once fs.inotify.max_user_watches is exhausted
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._watches[wd] = directory
+
+    def _run_inotify(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(data)
+        except OSError as e:
+            log.warning(f"inotify failed ({e}); falling back to polling")
+            self.mode = "polling"
+            self._run_polling()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _dispatch(self, data):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped; let a full incremental refresh reconcile
+                self.poll()
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF):
+                self._watches.pop(wd, None)
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._watch_new_tree(path)
+                elif mask & (_IN_MOVED_FROM | _IN_DELETE):
+                    # Drop whatever the index still holds for the vanished tree
+                    self.poll()
+                continue
+            if not path.lower().endswith(self.suffixes):
+                continue
+            if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                publish(CREATED, path)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                publish(DELETED, path)
+
+    def _watch_new_tree(self, top):
+        """Watch a freshly created directory and report images that landed before the watch did."""
+        for root, _, files in os.walk(top):
+            self._add_watch(root)
+            for name in files:
+                if name.lower().endswith(self.suffixes):
+                    publish(CREATED, os.path.join(root, name))
+
+    def _run_polling(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.warning(f"Poll failed: {e}")
+            self._stop.wait(self.poll_interval)
@@ -0,0 +1,58 @@
+"""Chunked, resumable upload of a large file over a flaky link.
+
+The stand-in fails a share of requests with 503; stalled uploads are
+retried the way the queue would, resuming from the acknowledged offset.
+
+Usage: python benchmarks/bench_chunked_upload.py [--mb 24] [--chunk-kb 1024] [--error-rate 0.2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a1111_tweaks.upload_ledger import UploadLedger  # noqa: E402
+from a1111_tweaks.wanly import WanlyClient  # noqa: E402
+from wanly_standin import start_in_thread  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, default=24)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server, url = start_in_thread(error_rate=args.error_rate, latency=0.005)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "upscaled.png")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.mb * 1024 * 1024))
+        ledger = UploadLedger(os.path.join(tmp, "ledger.sqlite3"))
+        client = WanlyClient(ledger=ledger, chunk_size=args.chunk_kb * 1024, chunk_threshold=1024 * 1024,
+                             chunk_retries=2)
+
+        started = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            ok, message, retryable = client.upload("upscaled.png", filepath=path, api_url=url, api_key="test-key")
+            print(f"attempt {attempts}: {message}")
+            if ok or not retryable:
+                break
+            # A fresh client, as after a WebUI restart, still resumes via the ledger's session table
+            client = WanlyClient(ledger=ledger, chunk_size=args.chunk_kb * 1024, chunk_threshold=1024 * 1024,
+                                 chunk_retries=2)
+        elapsed = time.perf_counter() - started
+        chunks = -(-args.mb * 1024 // args.chunk_kb)
+        print(f"{args.mb} MB in {elapsed:.2f}s over {attempts} attempt(s); {server.stats['chunks']} chunk PUTs "
+              f"accepted for {chunks} chunks, {server.stats['errors']} injected 503s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
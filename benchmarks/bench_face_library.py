@@ -0,0 +1,74 @@
+"""Face library indexing: header-only validation vs. reading whole checkpoints.
+
+Writes synthetic safetensors face files (plus a truncated and a garbage
+one), then times a cold index, a warm refresh and a full read of every
+file, which is what loading each checkpoint to validate it would cost.
+
+Usage: python benchmarks/bench_face_library.py [--faces 200] [--kb 1024]
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks.face_library import FaceLibrary  # noqa: E402
+
+
+def write_face(path, data_bytes, truncate=0):
+    header = {
+        "__metadata__": {"name": os.path.basename(path)},
+        "embedding": {"dtype": "F32", "shape": [data_bytes // 4], "data_offsets": [0, data_bytes]},
+    }
+    raw = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        f.write(os.urandom(data_bytes - truncate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--faces", type=int, default=200)
+    parser.add_argument("--kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as faces_dir:
+        for i in range(args.faces):
+            write_face(os.path.join(faces_dir, f"face_{i:04d}.safetensors"), args.kb * 1024)
+        write_face(os.path.join(faces_dir, "truncated.safetensors"), args.kb * 1024, truncate=4096)
+        with open(os.path.join(faces_dir, "garbage.safetensors"), "wb") as f:
+            f.write(os.urandom(4096))
+
+        library = FaceLibrary(faces_dir)
+        started = time.perf_counter()
+        library.refresh()
+        cold = time.perf_counter() - started
+        print(f"cold index   {cold * 1000:8.1f} ms   valid {len(library.names())}   invalid {library.invalid()}")
+
+        started = time.perf_counter()
+        library.refresh()
+        warm = time.perf_counter() - started
+        print(f"warm refresh {warm * 1000:8.1f} ms")
+
+        write_face(os.path.join(faces_dir, "face_0000.safetensors"), args.kb * 1024, truncate=10)
+        started = time.perf_counter()
+        library.refresh()
+        print(f"one changed  {(time.perf_counter() - started) * 1000:8.1f} ms   "
+              f"face_0000 now invalid: {'face_0000.safetensors' in library.invalid()}")
+
+        started = time.perf_counter()
+        for name in os.listdir(faces_dir):
+            with open(os.path.join(faces_dir, name), "rb") as f:
+                f.read()
+        print(f"full read    {(time.perf_counter() - started) * 1000:8.1f} ms   "
+              f"({args.faces} x {args.kb} KB, page cache warm)")
+
+
+if __name__ == "__main__":
+    main()
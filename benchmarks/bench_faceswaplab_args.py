@@ -0,0 +1,97 @@
+"""FaceSwapLab face checkpoint lookup against stub script runners.
+
+Builds a runner shaped like the WebUI's ``ScriptRunner`` with two
+extensions ahead of FaceSwapLab and times the per-job cost of the cached
+lookup and single list copy against the old copy-to-list-and-back
+approach and an uncached lookup. The layout checks live in
+``tests/test_faceswaplab.py``.
+
+Usage: python benchmarks/bench_faceswaplab_args.py [--jobs 100000] [--args 400]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks import faceswaplab  # noqa: E402
+
+
+class Input:
+    def __init__(self, label):
+        self.label = label
+
+
+class Script:
+    def __init__(self, name, labels):
+        self.filename = f"/extensions/{name}/scripts/{name}.py"
+        self.name = name
+        self.labels = labels
+
+    def title(self):
+        return self.name
+
+
+class Runner:
+    def __init__(self, scripts):
+        self.alwayson_scripts = []
+        self.inputs = [None]  # slot 0 belongs to the selectable-script dropdown
+        for script in scripts:
+            script.args_from = len(self.inputs)
+            self.inputs.extend(Input(label) for label in script.labels)
+            script.args_to = len(self.inputs)
+            self.alwayson_scripts.append(script)
+
+
+class P:
+    def __init__(self, runner, args):
+        self.scripts = runner
+        self.script_args = args
+
+
+def faceswaplab_script():
+    return Script("faceswaplab", ["Enable", "Reference source face", "Face Checkpoint (precedence over reference face)",
+                                  "Target face", "Blend faces"] * 3)
+
+
+def build_runner():
+    controlnet = Script("controlnet", [f"cn{i}" for i in range(30)])
+    adetailer = Script("adetailer", [f"ad{i}" for i in range(45)])
+    return Runner([adetailer, controlnet, faceswaplab_script()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--args", type=int, default=400)
+    args = parser.parse_args()
+
+    runner = build_runner()
+    base = tuple(range(args.args))
+    p = P(runner, base)
+    faceswaplab.invalidate()
+    started = time.perf_counter()
+    for _ in range(args.jobs):
+        p.script_args = base
+        faceswaplab.set_face(p, "face.safetensors")
+    cached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.jobs):
+        args_list = list(base)
+        args_list[78] = "face.safetensors"
+        p.script_args = tuple(args_list)
+    old = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.jobs):
+        faceswaplab.resolve_face_index(runner)
+    uncached = time.perf_counter() - started
+    print(f"{args.jobs} jobs, {args.args} args: cached lookup + list copy {cached / args.jobs * 1e6:.2f} us/job, "
+          f"list/tuple copy {old / args.jobs * 1e6:.2f} us/job, uncached lookup {uncached / args.jobs * 1e6:.2f} us/job")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Cold vs. warm gallery index refresh on a synthetic image tree.
+
+Also times ``add_file`` calls made while a cold refresh runs on another
+thread, as the image-saved hook does during generation.
+
+Usage: python benchmarks/bench_image_index.py [--files 100000] [--dirs 200]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from a1111_tweaks.image_index import ImageIndex  # noqa: E402
+
+LEGACY_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
+
+
+def build_tree(root, files, dirs):
+    per_dir = max(1, files // dirs)
+    made = 0
+    for d in range(dirs):
+        directory = os.path.join(root, f"2026-{d // 28 + 1:02d}-{d % 28 + 1:02d}")
+        os.makedirs(directory, exist_ok=True)
+        for i in range(per_dir):
+            if made >= files:
+                return made
+            open(os.path.join(directory, f"{made:06d}-{i}.png"), "wb").close()
+            made += 1
+    return made
+
+
+def legacy_scan(root):
+    found = []
+    for pattern in LEGACY_PATTERNS:
+        found.extend(glob.glob(os.path.join(root, "**", pattern), recursive=True))
+    found.sort(key=os.path.getmtime, reverse=True)
+    return found
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def add_file_during_cold_refresh(root, db_path):
+    """Worst and total add_file latency while another thread walks the tree from scratch."""
+    index = ImageIndex(root, db_path)
+    walker = threading.Thread(target=index.refresh)
+    walker.start()
+    waits = []
+    n = 0
+    while walker.is_alive():
+        path = os.path.join(root, "2026-01-01", f"saved-{n}.png")
+        open(path, "wb").close()
+        started = time.perf_counter()
+        index.add_file(path)
+        waits.append(time.perf_counter() - started)
+        n += 1
+        time.sleep(0.005)
+    walker.join()
+    index.close()
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--dirs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "Text2Img")
+        made = timed(f"build tree ({args.files} files)", lambda: build_tree(root, args.files, args.dirs))
+        index = ImageIndex(root, os.path.join(tmp, "index.sqlite3"))
+
+        timed("legacy glob + mtime sort", lambda: legacy_scan(root))
+        timed("index refresh (cold)", index.refresh)
+        timed("index refresh (warm)", index.refresh)
+
+        open(os.path.join(root, "2026-01-01", "new.png"), "wb").close()
+        rescanned = timed("index refresh (1 new file)", index.refresh)
+        print(f"{'  directories rescanned':<32} {rescanned:8d}")
+
+        timed("page query (first page)", lambda: index.page(0, 10))
+        timed("page query (last page)", lambda: index.page(made - 10, 10))
+        index.close()
+
+        waits = add_file_during_cold_refresh(root, os.path.join(tmp, "concurrent.sqlite3"))
+        if waits:
+            print(f"{'add_file during cold refresh':<32} {max(waits):8.3f}s worst of {len(waits)}, "
+                  f"{sum(waits) / len(waits) * 1000:.2f} ms mean")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Header-only infotext extraction vs. a full PIL decode.
+
+Before timing, damaged files (truncated headers, a corrupt zTXt chunk) are
+checked to read as no metadata and to get an empty row in the gallery index,
+so they are not parsed again on every query.
+
+Usage: python benchmarks/bench_infotext.py [--images 50] [--size 1024x1536]
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, PngImagePlugin  # noqa: E402
+
+from a1111_tweaks.image_index import ImageIndex  # noqa: E402
+from a1111_tweaks.infotext import PNG_SIGNATURE, extract_fields, read_infotext  # noqa: E402
+
+PARAMETERS = (
+    "portrait of a woman, detailed skin, cinematic lighting\n"
+    "Negative prompt: blurry, lowres\n"
+    "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: {seed}, Size: {w}x{h}, "
+    "Model: sd_xl_base_1.0, Random Face: alice.safetensors\n"
+    "Random Style: Cinematic"
+)
+
+
+def make_images(directory, count, width, height):
+    paths = []
+    noise = Image.frombytes("RGB", (width, height), random.randbytes(width * height * 3))
+    for i in range(count):
+        info = PngImagePlugin.PngInfo()
+        info.add_text("parameters", PARAMETERS.format(seed=i, w=width, h=height))
+        path = os.path.join(directory, f"{i:05d}.png")
+        noise.save(path, pnginfo=info, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def rate(label, paths, fn):
+    started = time.perf_counter()
+    for path in paths:
+        fn(path)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(paths) / elapsed:10.1f} images/s  ({elapsed * 1000 / len(paths):.2f} ms each)")
+
+
+def full_decode(path):
+    with Image.open(path) as img:
+        img.load()
+        return img.info.get("parameters")
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I4s", len(data), kind) + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+DAMAGED = {
+    "truncated.jpg": b"\xff\xd8\xff\xe0",
+    "short_segment.jpg": b"\xff\xd8\xff\xe1\x00",
+    "truncated.png": PNG_SIGNATURE + struct.pack(">I4s", 400, b"tEXt") + b"parameters\0Steps",
+    "bad_ztxt.png": PNG_SIGNATURE + png_chunk(b"zTXt", b"parameters\0\0not zlib data"),
+    "empty_itxt.png": PNG_SIGNATURE + png_chunk(b"iTXt", b"parameters\0"),
+}
+
+
+def check_damaged(directory):
+    for name, data in DAMAGED.items():
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        try:
+            text = read_infotext(path)
+        except zlib.error:
+            # Left to the index, which stores an empty row for it
+            text = None
+        assert text is None, f"{name}: expected no metadata, got {text!r}"
+
+    index = ImageIndex(directory, os.path.join(directory, "index.db"))
+    try:
+        index.refresh()
+        assert index.update_metadata() == len(DAMAGED)
+        assert index.update_metadata() == 0, "damaged files were parsed again"
+        assert index.count("seed:1") == 0
+    finally:
+        index.close()
+    print(f"damaged files: {len(DAMAGED)} read as empty metadata, indexed once")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--size", default="1024x1536")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_damaged(tmp)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_images(tmp, args.images, width, height)
+        rate("read_infotext + parse", paths, lambda p: extract_fields(read_infotext(p)))
+        rate("Image.open().load()", paths, full_decode)
+
+
+if __name__ == "__main__":
+    main()
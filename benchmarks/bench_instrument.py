@@ -0,0 +1,71 @@
+"""Overhead of the timing instrumentation on a hook-sized function.
+
+Times a trivial function called directly, through an enabled ``timed``
+wrapper and through a disabled one, then checks the ring buffer's
+percentiles against ``statistics.quantiles`` on known samples and times a
+summary over a full ring.
+
+Usage: python benchmarks/bench_instrument.py [--calls 1000000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks import instrument  # noqa: E402
+
+
+def hook(p, enabled, *args):
+    return enabled
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(None, True, 1, 2)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args()
+
+    enabled = instrument.timed("bench.enabled")(hook)
+    disabled = instrument.timed("bench.disabled")(hook)
+    instrument.set_enabled("bench.disabled", False)
+
+    bare = per_call(hook, args.calls)
+    on = per_call(enabled, args.calls)
+    off = per_call(disabled, args.calls)
+    print(f"bare call        {bare:7.1f} ns")
+    print(f"disabled label   {off:7.1f} ns  (+{off - bare:.1f} ns)")
+    print(f"enabled label    {on:7.1f} ns  (+{on - bare:.1f} ns)")
+    print(f"ring holds {len(instrument.span('bench.enabled').samples())} of "
+          f"{instrument.span('bench.enabled').count} samples; disabled label recorded "
+          f"{instrument.span('bench.disabled').count}")
+
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 1) * 1e6 for _ in range(instrument.RING_SIZE)]
+    found = instrument.Span("bench.known")
+    for value in values:
+        found.record(int(value))
+    summary = found.summary()
+    reference = statistics.quantiles([int(v) for v in values], n=100, method="inclusive")
+    for q in instrument.PERCENTILES:
+        print(f"p{q}: ring {summary[f'p{q}_ms']:.3f} ms, statistics.quantiles {reference[q - 1] / 1e6:.3f} ms")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        found.summary()
+    print(f"summary of a full ring: {(time.perf_counter() - start) / 1000 * 1e6:.0f} us")
+    print(instrument.summary_line(instrument.span("bench.enabled").summary()))
+
+
+if __name__ == "__main__":
+    main()
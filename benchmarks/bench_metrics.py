@@ -0,0 +1,107 @@
+"""Cost of metric updates on the hot path and of rendering a scrape.
+
+Times counter increments and histogram observations, checks that totals
+stay exact with several threads incrementing at once, renders a scrape
+with realistic label cardinality and checks every line against the
+Prometheus text format. If FastAPI is installed, the routes are also hit
+through ``TestClient``.
+
+Usage: python benchmarks/bench_metrics.py [--calls 200000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks import instrument, metrics  # noqa: E402
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? '
+                         r'(-?[0-9.e+-]+|NaN|[+-]Inf)$')
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    selections = metrics.Counter("bench_selections_total", "bench")
+    latency = metrics.Histogram("bench_seconds", "bench")
+    inc = per_call(lambda: selections.inc(kind="style", value="Cinematic", source="random"), args.calls)
+    observe = per_call(lambda: latency.observe(0.42), args.calls)
+    print(f"counter inc with 3 labels  {inc:6.0f} ns")
+    print(f"histogram observe          {observe:6.0f} ns")
+
+    threads_n, each = 8, args.calls // 8
+    shared = metrics.Counter("bench_threads_total", "bench")
+
+    def hammer():
+        for _ in range(each):
+            shared.inc()
+
+    threads = [threading.Thread(target=hammer) for _ in range(threads_n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = shared.values()[()]
+    print(f"{threads_n} threads x {each}: total {total} ({'exact' if total == threads_n * each else 'LOST UPDATES'})")
+
+    # Realistic cardinality: the pools' sizes, styles and faces plus a few dozen timed labels
+    for i in range(12):
+        metrics.SELECTIONS.inc(4, kind="dimensions", value=f"{512 + 64 * i}x768", source="random")
+    for i in range(60):
+        metrics.SELECTIONS.inc(2, kind="style", value=f'Style "{i}"', source="sweep")
+    for i in range(30):
+        metrics.SELECTIONS.inc(kind="face", value=f"face{i}.safetensors", source="random")
+    for i in range(200):
+        metrics.UPLOAD_SECONDS.observe(0.01 * i)
+        metrics.UPLOADS.inc(result="ok" if i % 10 else "retryable")
+    for i in range(40):
+        timed = instrument.timed(f"bench.hook{i}")(lambda: None)
+        for _ in range(50):
+            timed()
+    metrics.register_collector("broken", lambda: 1 / 0)
+
+    start = time.perf_counter()
+    families, errors = metrics.collect()
+    text = metrics.render(families)
+    scrape = time.perf_counter() - start
+    lines = text.splitlines()
+    bad = [line for line in lines if not line.startswith("#") and not SAMPLE_LINE.match(line)]
+    print(f"scrape: {len(lines)} lines, {len(text)} bytes in {scrape * 1e3:.2f} ms, "
+          f"{len(bad)} malformed, collector errors {errors}")
+    for line in bad[:5]:
+        print("  malformed:", line)
+    status = metrics.status(families, errors)
+    print(f"status: {status['status']}, {len(json.dumps(status))} bytes of JSON")
+
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+    except ImportError:
+        print("TestClient: skipped, fastapi is not installed")
+        return
+    app = FastAPI()
+    metrics.mount(app)
+    client = TestClient(app)
+    resp = client.get(f"{metrics.ROUTE_PREFIX}/metrics")
+    print(f"TestClient /metrics: {resp.status_code} {resp.headers['content-type']}, {len(resp.text)} bytes")
+    resp = client.get(f"{metrics.ROUTE_PREFIX}/status")
+    print(f"TestClient /status: {resp.status_code}, status={resp.json()['status']}")
+
+
+if __name__ == "__main__":
+    main()
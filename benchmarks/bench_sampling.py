@@ -0,0 +1,51 @@
+"""Speed of the dimension sampling engine.
+
+Times a few million draws with the alias table and the shuffle bag against
+``random.choices`` with weights. The distribution and determinism checks
+live in ``tests/test_sampling.py``.
+
+Usage: python benchmarks/bench_sampling.py [--draws 2000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks.sampling import Sampler  # noqa: E402
+
+SIZES = [(512, 512), (768, 512), (512, 768), (1024, 576), (576, 1024), (1024, 1024), (832, 1216), (1216, 832)]
+WEIGHTS = [4, 2, 2, 1, 1, 3, 0.5, 0.5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--draws", type=int, default=2_000_000)
+    args = parser.parse_args()
+    n = args.draws
+
+    for no_repeat, label in ((False, "alias table"), (True, "shuffle bag")):
+        sampler = Sampler(SIZES, WEIGHTS, no_repeat=no_repeat, seed=1234, stream="bench")
+        started = time.perf_counter()
+        sampler.draws(n)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<12} {n} draws in {elapsed:.2f}s ({n / elapsed / 1e6:.2f} M/s)")
+
+    sampler = Sampler(SIZES, WEIGHTS, seed=1, stream="bench")
+    started = time.perf_counter()
+    sampler.draws(n)
+    alias = time.perf_counter() - started
+    rng = random.Random(1)
+    started = time.perf_counter()
+    for _ in range(n):
+        rng.choices(SIZES, weights=WEIGHTS)
+    choices = time.perf_counter() - started
+    print(f"{n} draws: alias table {alias:.2f}s ({n / alias / 1e6:.2f} M/s), "
+          f"random.choices {choices:.2f}s ({n / choices / 1e6:.2f} M/s)")
+
+
+if __name__ == "__main__":
+    main()
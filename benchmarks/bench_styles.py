@@ -0,0 +1,97 @@
+"""Style catalog: load, refresh, search and template application costs.
+
+Writes a styles CSV and an SDXL styler JSON file with many styles, then
+times a cold load, an unchanged refresh, prefix/fuzzy searches and applying
+a precompiled template against the WebUI-style ``str.replace``. Template
+application is first checked against a copy of the WebUI's ``merge_prompts``.
+
+Usage: python benchmarks/bench_styles.py [--styles 2000] [--applies 200000]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks.styles import Style, StyleCatalog  # noqa: E402
+
+PROMPT = "a lighthouse on a cliff at dusk, volumetric light, highly detailed"
+
+
+def merge_prompts(style_prompt, prompt):
+    """modules.styles.merge_prompts from the WebUI."""
+    if "{prompt}" in style_prompt:
+        res = style_prompt.replace("{prompt}", prompt)
+    else:
+        parts = filter(None, (prompt.strip(), style_prompt.strip()))
+        res = ", ".join(parts)
+    return res
+
+
+def check_merge_prompts():
+    templates = ["", "  ", "film grain", " film grain, ", "{prompt}", "{prompt}, film grain",
+                 "still of {prompt} . {prompt}"]
+    prompts = ["", "  ", PROMPT, f" {PROMPT}, "]
+    for template in templates:
+        style = Style("check", template, template, "bench")
+        for prompt in prompts:
+            expected = merge_prompts(template, prompt)
+            assert style.apply_positive(prompt) == expected, (template, prompt, style.apply_positive(prompt))
+            assert style.apply_negative(prompt) == expected
+    print(f"merge_prompts    {len(templates) * len(prompts)} template/prompt pairs match the WebUI")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--styles", type=int, default=2000)
+    parser.add_argument("--applies", type=int, default=200_000)
+    args = parser.parse_args()
+
+    check_merge_prompts()
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "styles.csv")
+        json_path = os.path.join(tmp, "sdxl_styles.json")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "prompt", "negative_prompt"])
+            for i in range(args.styles // 2):
+                writer.writerow([f"Custom Style {i}", f"{{prompt}}, custom look {i}", "lowres"])
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump([{"name": f"sai-style {i}", "prompt": f"cinematic still {{prompt}} . style {i}, film grain",
+                        "negative_prompt": "anime, cartoon"} for i in range(args.styles // 2)], f)
+
+        catalog = StyleCatalog([csv_path, json_path])
+        started = time.perf_counter()
+        catalog.refresh()
+        print(f"cold load        {(time.perf_counter() - started) * 1000:8.2f} ms   {len(catalog.names())} styles")
+        started = time.perf_counter()
+        catalog.refresh()
+        print(f"warm refresh     {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+        for query in ("sai-style 12", "custom", "sai-stlye 7"):
+            started = time.perf_counter()
+            matches = catalog.search(query, limit=5)
+            print(f"search {query!r:<14} {(time.perf_counter() - started) * 1000:6.2f} ms   {matches}")
+        print(f"typo suggestion  {catalog.suggest('Custm Style 42')!r}")
+
+        style = catalog.get("sai-style 7")
+        started = time.perf_counter()
+        for _ in range(args.applies):
+            compiled = style.apply_positive(PROMPT)
+        precompiled = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(args.applies):
+            replaced = style.prompt.replace("{prompt}", PROMPT)
+        replace = time.perf_counter() - started
+        assert compiled == replaced
+        print(f"apply x{args.applies}: precompiled {precompiled / args.applies * 1e9:.0f} ns, "
+              f"str.replace {replace / args.applies * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
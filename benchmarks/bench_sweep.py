@@ -0,0 +1,84 @@
+"""Coverage, balance and switch counts of sweep plans against independent random picks.
+
+Runs as many jobs as the full product has combinations, once with three
+independent ``random.choice`` calls per job (what the random_* scripts do)
+and once from a sweep plan, and compares how many distinct combinations each
+covers and how often the size and the face change between consecutive jobs.
+Then checks the level balance of stratified samples and times building and
+indexing a large lazy plan.
+
+Usage: python benchmarks/bench_sweep.py [--sizes 6] [--faces 8] [--styles 12]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from a1111_tweaks.sweep import MODES, SweepPlan  # noqa: E402
+
+
+def switches(combos):
+    sizes = sum(1 for a, b in zip(combos, combos[1:]) if a[0] != b[0])
+    faces = sum(1 for a, b in zip(combos, combos[1:]) if a[1] != b[1])
+    return sizes, faces
+
+
+def report(label, combos, product):
+    size_switches, face_switches = switches(combos)
+    print(f"{label:<22} {len(set(combos)):>6} / {product} distinct   "
+          f"{size_switches:>6} size switches   {face_switches:>6} face switches")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, default=6)
+    parser.add_argument("--faces", type=int, default=8)
+    parser.add_argument("--styles", type=int, default=12)
+    args = parser.parse_args()
+
+    sizes = [(512 + 64 * i, 512) for i in range(args.sizes)]
+    faces = [f"face{i}.safetensors" for i in range(args.faces)]
+    styles = [f"style {i}" for i in range(args.styles)]
+    plan = SweepPlan(sizes, faces, styles)
+    n = len(plan)
+
+    rng = random.Random(0)
+    independent = [(rng.choice(sizes), rng.choice(faces), rng.choice(styles)) for _ in range(n)]
+    report("independent choice", independent, n)
+    report("full product", [tuple(c) for c in plan], n)
+
+    sample_size = n // 4
+    sample = SweepPlan(sizes, faces, styles, MODES[1], sample_size, seed=1)
+    print()
+    report(f"stratified ({sample_size})", [tuple(c) for c in sample], n)
+    picked = [(rng.choice(sizes), rng.choice(faces), rng.choice(styles)) for _ in range(sample_size)]
+    report(f"independent ({sample_size})", picked, n)
+    for axis, label in enumerate(("size", "face", "style")):
+        for name, combos in (("stratified", list(sample)), ("independent", picked)):
+            counts = Counter(c[axis] for c in combos)
+            print(f"  {label:<5} {name:<11} per-level count {min(counts.values())}-{max(counts.values())} "
+                  f"over {len(counts)} levels")
+
+    print()
+    big = ([(64 * i, 64 * i) for i in range(1, 51)], [f"f{i}" for i in range(200)], [f"s{i}" for i in range(500)])
+    start = time.perf_counter()
+    lazy = SweepPlan(*big)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in lazy.iter_from(len(lazy) // 2):
+        pass
+    walked = time.perf_counter() - start
+    print(f"lazy plan of {len(lazy):,} combinations: built in {built * 1e6:.0f} us, "
+          f"second half walked in {walked:.2f} s ({walked / (len(lazy) - len(lazy) // 2) * 1e9:.0f} ns each)")
+    start = time.perf_counter()
+    sampled = SweepPlan(*big, mode=MODES[1], sample_size=10000, seed=1)
+    print(f"stratified sample of {len(sampled):,}: built in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""CPU time and peak RSS per upload: PIL re-encode vs. streaming the original file.
+
+Each mode runs in its own subprocess so peak RSS is not shared between them.
+
+Usage: python benchmarks/bench_upload_body.py [--uploads 5] [--size 1024x1536]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("reencode", "stream")
+
+
+def run_mode(mode, path, uploads):
+    import requests
+    from PIL import Image
+
+    from a1111_tweaks import wanly
+    from wanly_standin import start_in_thread
+
+    server, url = start_in_thread()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu = time.process_time()
+    for i in range(uploads):
+        filename = f"{i}.png"
+        if mode == "reencode":
+            # The baseline's PIL PNG save, at PIL's default compression
+            data, _, content_type = wanly.encode_image(Image.open(path), {"encoding": "png", "png_compress_level": 6})
+            body = wanly.bytes_body(data, filename, content_type)
+        else:
+            body = wanly.file_body(path, filename)
+        with body:
+            resp = requests.post(f"{url}/images/upload", params={"filename": filename},
+                                 headers={"X-API-Key": "test-key", "Content-Type": body.content_type},
+                                 data=body, timeout=60)
+        resp.raise_for_status()
+    cpu = (time.process_time() - cpu) / uploads
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss
+    server.shutdown()
+    print(json.dumps({"cpu": cpu, "rss_kb": peak, "bytes": server.stats["bytes"] / uploads}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--size", default="1024x1536")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        return run_mode(args.mode, args.path, args.uploads)
+
+    from PIL import Image
+
+    width, height = (int(v) for v in args.size.split("x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sample.png")
+        # Smooth gradient plus noise compresses roughly like a real generation
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        noise = Image.frombytes("L", (width, height), random.randbytes(width * height)).convert("RGB")
+        Image.blend(img, noise, 0.15).save(path)
+        print(f"sample: {args.size}, {os.path.getsize(path) / 1e6:.2f} MB on disk")
+        for mode in MODES:
+            out = subprocess.run([sys.executable, __file__, "--mode", mode, "--path", path,
+                                  "--uploads", str(args.uploads)], capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout)
+            print(f"{mode:<9} cpu {result['cpu'] * 1000:8.1f} ms/upload   "
+                  f"peak rss +{result['rss_kb'] / 1024:6.1f} MB   body {result['bytes'] / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
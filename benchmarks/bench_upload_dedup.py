@@ -0,0 +1,58 @@
+"""Content-hash duplicate skipping against the local stand-in server.
+
+Uploads a set of files, uploads them again (all skipped), changes one file
+(uploaded again), then wipes the server's storage so HEAD verification
+forces re-uploads.
+
+Usage: python benchmarks/bench_upload_dedup.py [--files 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a1111_tweaks.upload_ledger import UploadLedger  # noqa: E402
+from a1111_tweaks.wanly import WanlyClient  # noqa: E402
+from wanly_standin import start_in_thread  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20)
+    args = parser.parse_args()
+
+    server, url = start_in_thread()
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = UploadLedger(os.path.join(tmp, "ledger.sqlite3"))
+        client = WanlyClient(ledger=ledger, verify_url="{api_url}/{path}")
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"{i:03d}.png")
+            with open(path, "wb") as f:
+                f.write(os.urandom(200 * 1024))
+            paths.append(path)
+
+        def run(label):
+            before = server.stats["uploads"]
+            for path in paths:
+                ok, message, _ = client.upload(os.path.basename(path), filepath=path, api_url=url, api_key="test-key")
+                assert ok, message
+            print(f"{label:<26} sent {server.stats['uploads'] - before:3d}   ledger {ledger.stats()}")
+
+        run("first pass")
+        run("second pass")
+        with open(paths[0], "ab") as f:
+            f.write(b"changed")
+        run("one file changed")
+        server.stored.clear()
+        run("server storage wiped")
+        client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Encode time, body size and upload time per upload encoding strategy.
+
+Uses SDXL-sized synthetic images carrying WebUI infotext and checks that
+the infotext survives each encoding.
+
+Usage: python benchmarks/bench_upload_encoding.py [--images 3] [--size 1024x1024]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a1111_tweaks import infotext, wanly  # noqa: E402
+from wanly_standin import start_in_thread  # noqa: E402
+
+INFOTEXT = ("a lighthouse on a cliff at dusk, volumetric light\nNegative prompt: blurry\n"
+            "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 1234, Size: {w}x{h}")
+
+STRATEGIES = [
+    ("passthrough", {"encoding": "passthrough"}),
+    ("png level 6 (PIL default)", {"encoding": "png", "png_compress_level": 6}),
+    ("png level 1", {"encoding": "png", "png_compress_level": 1}),
+    ("png level 9 + optimize", {"encoding": "png", "png_compress_level": 9, "png_optimize": True}),
+    ("webp lossless", {"encoding": "webp-lossless"}),
+    ("jpeg q95", {"encoding": "jpeg", "jpeg_quality": 95}),
+]
+
+
+def sample_image(width, height, seed):
+    # Smooth gradient plus noise compresses roughly like a real generation
+    rng = random.Random(seed)
+    img = Image.linear_gradient("L").rotate(rng.randrange(360)).resize((width, height)).convert("RGB")
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height)).convert("RGB")
+    return Image.blend(img, noise, 0.15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--size", default="1024x1024")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+
+    server, url = start_in_thread()
+    client = wanly.WanlyClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        images = []
+        for i in range(args.images):
+            # Saved the way the WebUI does, then reopened so passthrough has a source file
+            path = os.path.join(tmp, f"{i:03d}.png")
+            img = sample_image(width, height, i)
+            img.info["parameters"] = INFOTEXT.format(w=width, h=height)
+            data, _, _ = wanly.encode_image(img, {"encoding": "png", "png_compress_level": 6})
+            with open(path, "wb") as f:
+                f.write(data)
+            images.append(Image.open(path))
+
+        print(f"{args.images} images at {args.size}")
+        for label, settings in STRATEGIES:
+            encode = upload = size = 0.0
+            kept = True
+            for i, img in enumerate(images):
+                started = time.perf_counter()
+                data, ext, content_type = wanly.encode_image(img, settings)
+                encode += time.perf_counter() - started
+                size += len(data)
+                out = os.path.join(tmp, f"check{ext}")
+                with open(out, "wb") as f:
+                    f.write(data)
+                kept = kept and infotext.read_infotext(out) == img.info["parameters"]
+
+                started = time.perf_counter()
+                with wanly.bytes_body(data, f"{i:03d}{ext}", content_type) as body:
+                    resp = client.session.post(f"{url}/images/upload", params={"filename": f"{i:03d}{ext}"},
+                                               headers={"X-API-Key": "test-key", "Content-Type": body.content_type},
+                                               data=body, timeout=60)
+                resp.raise_for_status()
+                upload += time.perf_counter() - started
+            n = len(images)
+            print(f"{label:<26} encode {encode / n * 1000:7.1f} ms   size {size / n / 1e6:5.2f} MB   "
+                  f"upload {upload / n * 1000:6.1f} ms   infotext {'kept' if kept else 'LOST'}")
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
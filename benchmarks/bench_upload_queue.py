@@ -0,0 +1,73 @@
+"""Drain the upload queue against a flaky local stand-in server.
+
+Injects latency and 5xx errors, restarts the queue halfway through to show
+that pending items survive, and reports throughput and retry counts.
+
+Usage: python benchmarks/bench_upload_queue.py [--items 40] [--error-rate 0.3] [--latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a1111_tweaks import upload_queue, wanly  # noqa: E402
+from wanly_standin import start_in_thread  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, url = start_in_thread(latency=args.latency, error_rate=args.error_rate)
+    client = wanly.WanlyClient(pool_size=args.workers)
+
+    def send(filepath, filename, api_url, api_key):
+        return client.upload(filename, filepath=filepath, api_url=url, api_key="test-key")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "queue.sqlite3")
+
+        def make_queue():
+            return upload_queue.UploadQueue(db, os.path.join(tmp, "spool"), send, workers=args.workers,
+                                            max_attempts=10, backoff_base=0.05, backoff_max=0.5)
+
+        queue = make_queue()
+        for i in range(args.items):
+            path = os.path.join(tmp, f"{i:04d}.png")
+            with open(path, "wb") as f:
+                f.write(os.urandom(64 * 1024))
+            queue.enqueue(os.path.basename(path), filepath=path)
+
+        started = time.perf_counter()
+        queue.start()
+        time.sleep(args.latency * args.items / args.workers / 2)
+        queue.stop()
+        print(f"after first run: {queue.counts()}")
+
+        queue = make_queue()
+        queue.start()
+        while True:
+            counts = queue.counts()
+            if counts[upload_queue.DONE] + counts[upload_queue.FAILED] == args.items:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        queue.stop()
+
+        print(f"after restart:   {counts}")
+        print(f"{args.items} items in {elapsed:.2f}s, {server.stats['errors']} injected 5xx retried, "
+              f"{server.stats['uploads']} successful uploads")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Per-upload latency with a bare requests.post vs. the pooled WanlyClient.
+
+Usage: python benchmarks/bench_wanly_pool.py [--uploads 200] [--kb 256]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from a1111_tweaks import wanly  # noqa: E402
+from wanly_standin import start_in_thread  # noqa: E402
+
+
+def bare_upload(url, path):
+    with wanly.file_body(path) as body:
+        resp = requests.post(f"{url}/images/upload", params={"filename": "x.png"},
+                             headers={"X-API-Key": "test-key", "Content-Type": body.content_type},
+                             data=body, timeout=60)
+    resp.raise_for_status()
+
+
+def measure(label, uploads, fn, server):
+    server.stats["connections"].clear()
+    samples = []
+    for _ in range(uploads):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    print(f"{label:<14} mean {statistics.mean(samples):6.2f} ms   p50 {samples[len(samples) // 2]:6.2f} ms   "
+          f"p95 {samples[int(len(samples) * 0.95)]:6.2f} ms   connections {len(server.stats['connections'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--kb", type=int, default=256)
+    args = parser.parse_args()
+
+    server, url = start_in_thread()
+    client = wanly.WanlyClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "x.png")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.kb * 1024))
+
+        def pooled():
+            ok, message, _ = client.upload("x.png", filepath=path, api_url=url, api_key="test-key")
+            assert ok, message
+
+        measure("requests.post", args.uploads, lambda: bare_upload(url, path), server)
+        measure("WanlyClient", args.uploads, pooled, server)
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Local stand-in for the Wanly image API, used by the benchmarks.
+
+Accepts ``POST /images/upload`` and discards the body after reading it;
+``HEAD /uploads/<name>`` reports whether a name was uploaded. The chunked
+protocol (``POST /images/uploads``, ``PUT``/``GET /images/uploads/<id>``,
+``POST /images/uploads/<id>/complete``) is kept in memory. Latency and
+5xx errors can be injected to exercise retry paths.
+
+Usage: python benchmarks/wanly_standin.py [--port 8001] [--latency 0.05] [--error-rate 0.2]
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # clients see a 40ms delayed-ACK stall that real servers don't have
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drain(self):
+        remaining = int(self.headers.get("Content-Length") or 0)
+        received = 0
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 256 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            received += len(chunk)
+        return received
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _gate(self):
+        """Shared latency, auth and error injection; returns False if a reply was already sent."""
+        server = self.server
+        server.stats["connections"].add(self.client_address)
+        if server.latency:
+            time.sleep(server.latency)
+        if self.headers.get("X-API-Key") != server.api_key:
+            self._reply(401, {"detail": "bad api key"})
+            return False
+        if server.rng.random() < server.error_rate:
+            server.stats["errors"] += 1
+            self._reply(503, {"detail": "injected failure"})
+            return False
+        return True
+
+    def _store(self, filename, received):
+        server = self.server
+        with server.lock:
+            server.stats["uploads"] += 1
+            server.stats["bytes"] += received
+            server.stored.add(f"uploads/{filename}")
+        self._reply(200, {"path": f"uploads/{filename}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/images/upload":
+            received = self._drain()
+            if self._gate():
+                self._store(parse_qs(url.query).get("filename", ["upload.png"])[0], received)
+        elif url.path == "/images/uploads":
+            meta = json.loads(self._body() or b"{}")
+            if self._gate():
+                upload_id = uuid.uuid4().hex
+                with self.server.lock:
+                    self.server.chunked[upload_id] = dict(meta, data=bytearray())
+                self._reply(200, {"upload_id": upload_id, "offset": 0})
+        elif url.path.startswith("/images/uploads/") and url.path.endswith("/complete"):
+            self._drain()
+            if self._gate():
+                self._complete(url.path.split("/")[3])
+        else:
+            self._drain()
+            self._reply(404, {"detail": "not found"})
+
+    def do_GET(self):
+        session = self.server.chunked.get(urlparse(self.path).path.rsplit("/", 1)[-1])
+        if not self._gate():
+            return
+        if session is None:
+            return self._reply(404, {"detail": "no such upload"})
+        self._reply(200, {"offset": len(session["data"])})
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        chunk = self._body()
+        if not self._gate():
+            return
+        session = self.server.chunked.get(url.path.rsplit("/", 1)[-1])
+        if session is None:
+            return self._reply(404, {"detail": "no such upload"})
+        offset = int(parse_qs(url.query).get("offset", ["0"])[0])
+        with self.server.lock:
+            if offset != len(session["data"]):
+                return self._reply(409, {"offset": len(session["data"])})
+            session["data"].extend(chunk)
+            self.server.stats["chunks"] += 1
+            self._reply(200, {"offset": len(session["data"])})
+
+    def _complete(self, upload_id):
+        with self.server.lock:
+            session = self.server.chunked.pop(upload_id, None)
+        if session is None:
+            return self._reply(404, {"detail": "no such upload"})
+        if hashlib.sha256(session["data"]).hexdigest() != session.get("sha256"):
+            return self._reply(422, {"detail": "sha256 mismatch"})
+        self._store(session.get("filename", "upload.png"), len(session["data"]))
+
+    def do_HEAD(self):
+        found = urlparse(self.path).path.lstrip("/") in self.server.stored
+        self.send_response(200 if found else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def make_server(port=0, latency=0.0, error_rate=0.0, api_key="test-key", seed=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.api_key = api_key
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {"uploads": 0, "bytes": 0, "errors": 0, "chunks": 0, "connections": set()}
+    server.stored = set()
+    server.chunked = {}
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a stand-in server on a free port; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--api-key", default="test-key")
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency, args.error_rate, args.api_key)
+    print(f"Wanly stand-in listening on http://127.0.0.1:{args.port} (api key {args.api_key!r})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
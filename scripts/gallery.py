@@ -1,90 +1,127 @@
-import io
-import json
 import os
+import time
 
-import requests
 import gradio as gr
 from modules import scripts
-from PIL import Image
-
-IMAGES_PER_PAGE = 10
-BASE_DIR = os.path.expanduser("~/StabilityMatrix-linux-x64/Data/Images/Text2Img")
-IMAGE_EXTENSIONS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
-
-
-def load_wanly_config():
-    """Load wanly upload config from JSON."""
-    config_file = os.path.join(scripts.basedir(), "upload_to_wanly_config.json")
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, "r") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {"api_url": "", "api_key": ""}
-
-
-def upload_image_to_wanly(image, filename):
-    """Upload a PIL Image to the wanly API."""
-    config = load_wanly_config()
-    api_url = config.get("api_url", "").rstrip("/")
-    api_key = config.get("api_key", "")
-
-    if not api_url:
-        return "Error: API URL not set."
-    if not api_key:
-        return "Error: API Key not set."
-
-    try:
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        buf.seek(0)
-        resp = requests.post(
-            f"{api_url}/images/upload",
-            params={"filename": filename},
-            headers={"X-API-Key": api_key},
-            files={"file": (filename, buf, "image/png")},
-            timeout=60,
-        )
-        if resp.status_code == 200:
-            path = resp.json().get("path", "")
-            return f"Uploaded: {path}"
-        else:
-            return f"Error {resp.status_code}: {resp.text}"
-    except Exception as e:
-        return f"Error: {e}"
-
-
-def scan_all_images():
-    """Scan Text2Img directory recursively for images, sorted newest first."""
-    if not os.path.isdir(BASE_DIR):
-        return []
-    files = []
-    for ext in IMAGE_EXTENSIONS:
-        files.extend([f for f in __import__('glob').glob(os.path.join(BASE_DIR, "**", ext), recursive=True)])
-    files.sort(key=lambda f: os.path.getmtime(f), reverse=True)
-    return files
-
-
-def load_image_page(page):
-    """Return (image_list, page_info_text) for the given page number (0-based)."""
-    all_images = scan_all_images()
-    total = len(all_images)
+
+from a1111_tweaks import instrument, wanly
+from a1111_tweaks.gallery import IMAGES_PER_PAGE, PREFETCH_PAGES, shared_gallery
+from a1111_tweaks.upload_queue import shared_queue
+from a1111_tweaks.image_index import SORT_ORDERS
+
+# Page flips reuse the index as-is unless the last walk is older than this
+INDEX_MAX_AGE = 30
+BATCH_UPLOAD_LIMIT = 1000
+BATCH_SCOPES = ["Current page", "All matching images"]
+
+# Shared across UI reloads, which re-import this file
+_gallery = shared_gallery()
+_index = _gallery.index
+_thumbnails = _gallery.thumbnails
+_pipeline = _gallery.pipeline
+_watcher = _gallery.watcher
+
+
+@instrument.timed("gallery.refresh_index")
+def refresh_index(force=False):
+    """Sync the image index with BASE_DIR; skipped while the last walk is recent."""
+    if _watcher.active:
+        # The watcher keeps the index current, so even Refresh is just a query
+        return
+    if force or time.time() - _index.last_refresh > INDEX_MAX_AGE:
+        _index.refresh()
+
+
+@instrument.timed("gallery.set_watching")
+def set_watching(enabled):
+    """Start or stop the filesystem watcher; returns a status line."""
+    if not enabled:
+        _watcher.stop()
+        return "Watcher stopped. Refresh rescans changed folders."
+    _index.refresh()
+    mode = _watcher.start()
+    return f"Watching for new images ({mode})."
+
+
+@instrument.timed("gallery.load_image_page")
+def load_image_page(page, refresh=False, query="", sort="Newest"):
+    """Return (image_list, page_info_text, page_paths) for the given page number (0-based).
+
+    ``page_paths`` are the original files behind the thumbnails, in order,
+    so a later click resolves to exactly the image that was shown.
+    """
+    refresh_index(force=refresh)
+    partial = ""
+    if _index.needs_metadata(query, sort) and _index.metadata_pending():
+        # Headers are parsed in the background; the query uses the rows already indexed
+        _gallery.backfill_metadata()
+        partial = " (still reading image metadata, Refresh for more)"
+    total = _index.count(query, sort)
     if total == 0:
-        return [], "No images found."
+        return [], ("No images found." if not query else f"No images match '{query}'.") + partial, []
     start = page * IMAGES_PER_PAGE
     end = start + IMAGES_PER_PAGE
-    page_files = all_images[start:end]
-    images = []
-    for f in page_files:
-        try:
-            images.append(Image.open(f))
-        except Exception:
-            pass
-    info = f"Showing {start + 1}-{min(end, total)} of {total} images (page {page + 1})"
-    return images, info
+    page_files = _index.page(start, IMAGES_PER_PAGE, query, sort)
+    before = _thumbnails.stats()
+    # Failed renders come back as the original path, keeping positions aligned with the index
+    images = _pipeline.render_page(page_files)
+    after = _thumbnails.stats()
+    hits = after["hits"] - before["hits"]
+    lookups = hits + after["misses"] - before["misses"]
+    served_kb = (after["bytes_served"] - before["bytes_served"]) / 1024
+    info = (f"Showing {start + 1}-{min(end, total)} of {total} images (page {page + 1}) | "
+            f"thumbnails: {hits}/{lookups} cached, {served_kb:.0f} KB served, "
+            f"overall hit rate {after['hit_rate']:.0%}{partial}")
+    prefetch_neighbours(page, query, sort)
+    return images, info, page_files
+
+
+def batch_query(query, date_from, date_to):
+    """Fold the batch date range into the filter query as from:/to: terms."""
+    terms = [query or ""]
+    if date_from and date_from.strip():
+        terms.append(f"from:{date_from.strip()}")
+    if date_to and date_to.strip():
+        terms.append(f"to:{date_to.strip()}")
+    return " ".join(t for t in terms if t)
+
 
+@instrument.timed("gallery.upload_batch")
+def upload_batch(filepaths, concurrency, progress=None):
+    """Upload files concurrently; retryable failures are handed to the queue. Returns a summary."""
+    if progress is not None:
+        progress(0, desc=f"Uploading {len(filepaths)} images")
 
+    def on_progress(done, total, path, success):
+        if progress is not None:
+            progress(done / total, desc=f"{done}/{total} {'ok' if success else 'failed'}: {os.path.basename(path)}")
+
+    results = wanly.upload_batch(filepaths, max_workers=int(concurrency), on_progress=on_progress)
+    uploaded = [r for r in results if r[1]]
+    failed = [r for r in results if not r[1]]
+    queued = 0
+    for path, _, _, retryable in failed:
+        if retryable:
+            shared_queue().enqueue(os.path.basename(path), filepath=path)
+            queued += 1
+    lines = [f"Uploaded {len(uploaded)}/{len(results)}, failed {len(failed)}"
+             + (f" ({queued} queued for retry)" if queued else "")]
+    lines.extend(f"{os.path.basename(path)}: {message}" for path, _, message, _ in failed)
+    return "\n".join(lines)
+
+
+@instrument.timed("gallery.prefetch_neighbours")
+def prefetch_neighbours(page, query="", sort="Newest"):
+    """Warm the thumbnails of the pages either side of ``page`` in the background."""
+    neighbours = []
+    for distance in range(1, PREFETCH_PAGES + 1):
+        neighbours.extend(_index.page((page + distance) * IMAGES_PER_PAGE, IMAGES_PER_PAGE, query, sort))
+        if page - distance >= 0:
+            neighbours.extend(_index.page((page - distance) * IMAGES_PER_PAGE, IMAGES_PER_PAGE, query, sort))
+    _pipeline.prefetch(neighbours)
+
+
+@instrument.instrument_hooks("gallery")
 class GalleryScript(scripts.Script):
     def title(self):
         return "Gallery"
@@ -108,7 +145,18 @@ class GalleryScript(scripts.Script):
                     value="Click Refresh to load images.",
                     interactive=False,
                 )
+                # The strip shows thumbnails; the full-resolution file loads only once an image is picked
+                preview = gr.Image(label="Selected Image", type="filepath", interactive=False, visible=False)
                 selected_index = gr.State(value=None)
+                watch = gr.Checkbox(label="Watch for new images", value=_watcher.active)
+
+                with gr.Row():
+                    query = gr.Textbox(
+                        label="Filter",
+                        placeholder='cat seed:1234 sampler:"Euler a" style:Cinematic face:name.safetensors size:832x1216',
+                        scale=4,
+                    )
+                    sort = gr.Dropdown(label="Sort by", choices=list(SORT_ORDERS), value="Newest", scale=1)
 
                 with gr.Row():
                     prev_btn = gr.Button("<< Prev", variant="secondary")
@@ -119,56 +167,103 @@ class GalleryScript(scripts.Script):
                     upload_btn = gr.Button("Upload Selected to Wanly", variant="primary")
                 upload_status = gr.Textbox(label="Upload Status", interactive=False, lines=1)
 
+                gr.Markdown("### Batch Upload")
+                with gr.Row():
+                    batch_scope = gr.Radio(label="Images", choices=BATCH_SCOPES, value=BATCH_SCOPES[0])
+                    batch_from = gr.Textbox(label="From (YYYY-MM-DD)", placeholder="optional, all matching images")
+                    batch_to = gr.Textbox(label="To (YYYY-MM-DD)", placeholder="optional, all matching images")
+                    batch_concurrency = gr.Slider(label="Concurrent uploads", minimum=1, maximum=8, step=1, value=4)
+                batch_btn = gr.Button("Upload Batch to Wanly", variant="primary")
+                batch_status = gr.Textbox(label="Batch Status", interactive=False, lines=4)
+
                 current_page = gr.State(value=0)
+                # Files shown on the current page; the filter box may have changed since it was rendered
+                page_paths = gr.State(value=[])
 
-                def go_page(page):
-                    images, info = load_image_page(page)
-                    return images, info, page
+                @instrument.timed("gallery.go_page")
+                def go_page(page, q, order):
+                    images, info, paths = load_image_page(page, query=q, sort=order)
+                    return images, info, page, paths, None, gr.update(value=None, visible=False)
 
-                def go_prev(page):
+                @instrument.timed("gallery.go_prev")
+                def go_prev(page, q, order):
                     new_page = max(0, page - 1)
-                    return go_page(new_page)
+                    return go_page(new_page, q, order)
 
-                def go_next(page):
+                @instrument.timed("gallery.go_next")
+                def go_next(page, q, order):
                     new_page = page + 1
-                    return go_page(new_page)
+                    return go_page(new_page, q, order)
+
+                @instrument.timed("gallery.do_refresh")
+                def do_refresh(q, order):
+                    images, info, paths = load_image_page(0, refresh=True, query=q, sort=order)
+                    return images, info, 0, paths, None, gr.update(value=None, visible=False)
 
-                def do_refresh():
-                    return go_page(0)
+                @instrument.timed("gallery.do_search")
+                def do_search(q, order):
+                    return go_page(0, q, order)
 
-                prev_btn.click(fn=go_prev, inputs=[current_page], outputs=[gallery, page_info, current_page])
-                next_btn.click(fn=go_next, inputs=[current_page], outputs=[gallery, page_info, current_page])
-                refresh_btn.click(fn=do_refresh, inputs=[], outputs=[gallery, page_info, current_page])
+                page_outputs = [gallery, page_info, current_page, page_paths, selected_index, preview]
+                prev_btn.click(fn=go_prev, inputs=[current_page, query, sort], outputs=page_outputs)
+                next_btn.click(fn=go_next, inputs=[current_page, query, sort], outputs=page_outputs)
+                refresh_btn.click(fn=do_refresh, inputs=[query, sort], outputs=page_outputs)
+                query.submit(fn=do_search, inputs=[query, sort], outputs=page_outputs)
+                sort.change(fn=do_search, inputs=[query, sort], outputs=page_outputs)
+                watch.change(fn=set_watching, inputs=[watch], outputs=[page_info])
 
-                def on_select(evt: gr.SelectData):
-                    return evt.index
+                @instrument.timed("gallery.on_select")
+                def on_select(paths, evt: gr.SelectData):
+                    filepath = paths[evt.index] if 0 <= evt.index < len(paths) else None
+                    if filepath is None or not os.path.exists(filepath):
+                        return evt.index, gr.update(value=None, visible=False)
+                    return evt.index, gr.update(value=filepath, visible=True)
 
                 gallery.select(
                     fn=on_select,
-                    inputs=[],
-                    outputs=[selected_index],
+                    inputs=[page_paths],
+                    outputs=[selected_index, preview],
                 )
 
-                def upload_selected(page, idx):
+                @instrument.timed("gallery.upload_selected")
+                def upload_selected(paths, idx):
                     if idx is None:
                         return "No image selected. Click an image first."
-                    all_images = scan_all_images()
-                    start = page * IMAGES_PER_PAGE
-                    real_idx = start + idx
-                    if real_idx >= len(all_images):
+                    filepath = paths[idx] if 0 <= idx < len(paths) else None
+                    if filepath is None or not os.path.exists(filepath):
                         return "Image no longer available."
-                    filepath = all_images[real_idx]
-                    try:
-                        img = Image.open(filepath)
-                        filename = os.path.basename(filepath)
-                        return upload_image_to_wanly(img, filename)
-                    except Exception as e:
-                        return f"Error: {e}"
+                    filename = os.path.basename(filepath)
+                    item_id = shared_queue().enqueue(filename, filepath=filepath)
+                    return f"Queued upload #{item_id}: {filename}"
 
                 upload_btn.click(
                     fn=upload_selected,
-                    inputs=[current_page, selected_index],
+                    inputs=[page_paths, selected_index],
                     outputs=[upload_status],
                 )
 
+                @instrument.timed("gallery.upload_batch_clicked")
+                def upload_batch_clicked(scope, paths, q, order, date_from, date_to, concurrency,
+                                         progress=gr.Progress()):
+                    if scope == "Current page":
+                        # Exactly the images on screen, not a fresh query that may have shifted
+                        filepaths = [path for path in paths if os.path.exists(path)]
+                    else:
+                        batch_q = batch_query(q, date_from, date_to)
+                        if _index.needs_metadata(batch_q, order):
+                            _index.update_metadata()
+                        # One query resolves the whole batch
+                        filepaths = _index.paths(batch_q, order, limit=BATCH_UPLOAD_LIMIT + 1)
+                    if not filepaths:
+                        return "No images match."
+                    if len(filepaths) > BATCH_UPLOAD_LIMIT:
+                        return f"More than {BATCH_UPLOAD_LIMIT} images match; narrow the filter or date range."
+                    return upload_batch(filepaths, concurrency, progress)
+
+                batch_btn.click(
+                    fn=upload_batch_clicked,
+                    inputs=[batch_scope, page_paths, query, sort, batch_from, batch_to, batch_concurrency],
+                    outputs=[batch_status],
+                )
+
         return []
\ No newline at end of file
@@ -0,0 +1,6 @@
+from modules import script_callbacks
+
+from a1111_tweaks import metrics
+
+# GET /a1111-tweaks/metrics (Prometheus text) and /a1111-tweaks/status (JSON) on the WebUI's own server
+script_callbacks.on_app_started(metrics.on_app_started)
@@ -1,15 +1,30 @@
-import random
 import gradio as gr
-import json
-import os
+import math
+import time
 from modules import scripts
 from modules.processing import process_images
 
+from a1111_tweaks import dimensions, instrument, logs, metrics, sweep
+from a1111_tweaks.sampling import Sampler
 
+log = logs.get_logger("random_dimensions")
+
+MODES = ["Per job", "Per batch", "Per batch (bucketed)"]
+
+
+@instrument.instrument_hooks("random_dimensions")
 class RandomDimensionsScript(scripts.Script):
     def __init__(self):
-        self.presets_file = os.path.join(scripts.basedir(), "random_dimensions_presets.json")
-        self.dimension_pairs = self.load_presets()
+        self.presets_file = dimensions.PRESETS_FILE
+        # Shared with the other tab's instance of this script
+        self.store = dimensions.presets_store()
+        # (width, height) per batch of the current job
+        self.schedule = []
+        # Unseeded sampler, kept between jobs so a no-repeat round can span several jobs
+        self._sampler = None
+        self._sampler_key = None
+        self.timings = dimensions.TimingStats(dimensions.timings_store())
+        self._batch_started = None
 
     def title(self):
         return "Random Dimensions"
@@ -17,40 +32,37 @@ class RandomDimensionsScript(scripts.Script):
     def show(self, is_img2img):
         return scripts.AlwaysVisible
 
-    def load_presets(self):
-        """Load saved dimension pairs from file"""
-        if os.path.exists(self.presets_file):
-            try:
-                with open(self.presets_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        # Default presets
-        return [
-            {"width": 512, "height": 512},
-            {"width": 768, "height": 512},
-            {"width": 512, "height": 768},
-        ]
-
-    def save_presets(self):
-        """Save dimension pairs to file"""
-        try:
-            with open(self.presets_file, 'w') as f:
-                json.dump(self.dimension_pairs, f, indent=2)
-        except Exception as e:
-            print(f"[Random Dimensions] Error saving presets: {e}")
+    @property
+    def dimension_pairs(self):
+        """Saved dimension pairs, re-read only when the presets file changes"""
+        return self.store.load()
 
     def get_preset_list_text(self):
         """Format dimension pairs for display"""
-        if not self.dimension_pairs:
+        dimension_pairs = self.dimension_pairs
+        if not dimension_pairs:
             return "No dimension pairs saved"
-        return "\n".join([f"{i + 1}. {pair['width']}x{pair['height']}"
-                          for i, pair in enumerate(self.dimension_pairs)])
+        return "\n".join([f"{i + 1}. {pair['width']}x{pair['height']}" + self.weight_text(pair)
+                           + f" - {dimensions.cost_text(pair['width'], pair['height'])}"
+                           for i, pair in enumerate(dimension_pairs)])
+
+    def weight_text(self, pair):
+        weight = pair.get("weight", 1)
+        return "" if weight == 1 else f" (weight {weight:g})"
 
     def ui(self, is_img2img):
         with gr.Group():
             with gr.Accordion("a1111 tweaks - Random Dimensions", open=False):
                 enabled = gr.Checkbox(label="Enable Random Dimensions", value=False)
+                mode = gr.Radio(
+                    label="Pick dimensions",
+                    choices=MODES if not is_img2img else MODES[:1],
+                    value=MODES[0],
+                    info="Bucketed runs batches that share a size back to back (txt2img only)"
+                )
+                with gr.Row():
+                    use_seed = gr.Checkbox(label="Use seed for randomization (reproducible)", value=False)
+                    no_repeat = gr.Checkbox(label="No repeats until every pair is used", value=False)
 
                 gr.Markdown("### Saved Dimension Pairs")
                 preset_display = gr.Textbox(
@@ -64,7 +76,20 @@ class RandomDimensionsScript(scripts.Script):
                 with gr.Row():
                     new_width = gr.Number(label="Width", value=512, precision=0)
                     new_height = gr.Number(label="Height", value=512, precision=0)
+                    new_weight = gr.Number(label="Weight", value=1, minimum=0)
                     add_btn = gr.Button("Add Pair", variant="primary")
+                max_megapixels = gr.Number(label="Max megapixels per pair (0 = no limit)", value=0, minimum=0)
+
+                gr.Markdown("### Generate Pairs")
+                with gr.Row():
+                    target_megapixels = gr.Number(label="Target megapixels", value=1.0, minimum=0.1)
+                    min_ratio = gr.Number(label="Min aspect (w/h)", value=0.5, minimum=0.1)
+                    max_ratio = gr.Number(label="Max aspect (w/h)", value=2.0, minimum=0.1)
+                with gr.Row():
+                    ratio_count = gr.Slider(label="Aspect ratios", minimum=1, maximum=15, step=1, value=5)
+                    snap_mode = gr.Radio(label="Snap to", choices=dimensions.SNAP_MODES,
+                                         value=dimensions.SNAP_MODES[0])
+                    generate_btn = gr.Button("Add Generated Pairs", variant="primary")
 
                 gr.Markdown("### Remove Pair")
                 with gr.Row():
@@ -78,26 +103,95 @@ class RandomDimensionsScript(scripts.Script):
 
                 clear_btn = gr.Button("Clear All Pairs", variant="stop")
 
-                def add_pair(width, height):
-                    self.dimension_pairs.append({"width": int(width), "height": int(height)})
-                    self.save_presets()
+                gr.Markdown("### Time Budget")
+                with gr.Row():
+                    budget_unit = gr.Radio(label="Budget", choices=dimensions.BUDGET_UNITS,
+                                           value=dimensions.BUDGET_UNITS[0])
+                    budget_value = gr.Number(label="Budget value", value=0, minimum=0)
+                    budget_handling = gr.Radio(label="Over budget", choices=dimensions.BUDGET_HANDLING,
+                                               value=dimensions.BUDGET_HANDLING[0])
+                timing_display = gr.Textbox(
+                    label="Measured generation time",
+                    value=self.timings.text(),
+                    interactive=False,
+                    lines=5
+                )
+                with gr.Row():
+                    timing_refresh_btn = gr.Button("Refresh Timings", variant="secondary")
+                    timing_clear_btn = gr.Button("Clear Timings", variant="secondary")
+
+                @instrument.timed("random_dimensions.add_pair")
+                def add_pair(width, height, weight, max_mp):
+                    if width is None or height is None:
+                        return f"⚠️ Enter a width and a height\n\n{self.get_preset_list_text()}"
+                    width, height = int(width), int(height)
+                    error = dimensions.validate_pair(width, height, max_mp)
+                    if error:
+                        return f"⚠️ {error}\n\n{self.get_preset_list_text()}"
+                    # A cleared Weight box arrives as None
+                    weight = 1.0 if weight is None else float(weight)
+                    if not math.isfinite(weight):
+                        return f"⚠️ Weight must be a finite number\n\n{self.get_preset_list_text()}"
+                    pair = {"width": width, "height": height}
+                    if weight != 1:
+                        pair["weight"] = max(0.0, weight)
+
+                    def add(pairs):
+                        if any((saved["width"], saved["height"]) == (width, height) for saved in pairs):
+                            return False
+                        pairs.append(pair)
+                        return True
+
+                    if not self.store.update(add):
+                        return f"⚠️ {width}x{height} is already saved\n\n{self.get_preset_list_text()}"
                     return self.get_preset_list_text()
 
+                @instrument.timed("random_dimensions.add_generated")
+                def add_generated(megapixels, low, high, count, snap_to, max_mp):
+                    try:
+                        generated = dimensions.generate_pairs(megapixels, low, high, int(count or 1), snap_to)
+                    except ValueError as e:
+                        return f"⚠️ {e}\n\n{self.get_preset_list_text()}"
+                    rejected = [f"{w}x{h}" for w, h in generated if dimensions.validate_pair(w, h, max_mp)]
+                    generated = [(w, h) for w, h in generated if f"{w}x{h}" not in rejected]
+
+                    def add(pairs):
+                        existing = {(saved["width"], saved["height"]) for saved in pairs}
+                        new = [(w, h) for w, h in generated if (w, h) not in existing]
+                        pairs.extend({"width": w, "height": h} for w, h in new)
+                        return len(new)
+
+                    added = self.store.update(add)
+                    note = f"Added {added} pair(s)"
+                    if rejected:
+                        note += f"; over the megapixel limit: {', '.join(rejected)}"
+                    return f"{note}\n\n{self.get_preset_list_text()}"
+
+                @instrument.timed("random_dimensions.remove_pair")
                 def remove_pair(index):
                     index = int(index) - 1
-                    if 0 <= index < len(self.dimension_pairs):
-                        self.dimension_pairs.pop(index)
-                        self.save_presets()
+
+                    def remove(pairs):
+                        if 0 <= index < len(pairs):
+                            pairs.pop(index)
+
+                    self.store.update(remove)
                     return self.get_preset_list_text()
 
+                @instrument.timed("random_dimensions.clear_all")
                 def clear_all():
-                    self.dimension_pairs = []
-                    self.save_presets()
+                    self.store.update(lambda pairs: pairs.clear())
                     return self.get_preset_list_text()
 
                 add_btn.click(
                     fn=add_pair,
-                    inputs=[new_width, new_height],
+                    inputs=[new_width, new_height, new_weight, max_megapixels],
+                    outputs=[preset_display]
+                )
+
+                generate_btn.click(
+                    fn=add_generated,
+                    inputs=[target_megapixels, min_ratio, max_ratio, ratio_count, snap_mode, max_megapixels],
                     outputs=[preset_display]
                 )
 
@@ -113,23 +207,125 @@ class RandomDimensionsScript(scripts.Script):
                     outputs=[preset_display]
                 )
 
-        return [enabled]
+                @instrument.timed("random_dimensions.clear_timings")
+                def clear_timings():
+                    self.timings.clear()
+                    return self.timings.text()
+
+                timing_refresh_btn.click(fn=instrument.timed("random_dimensions.timings_text")(self.timings.text), inputs=[], outputs=[timing_display])
+                timing_clear_btn.click(fn=clear_timings, inputs=[], outputs=[timing_display])
+
+        return [enabled, mode, use_seed, no_repeat, budget_unit, budget_value, budget_handling]
 
-    def process(self, p, enabled):
+    def budget(self, sizes, weights, steps, target, handling):
+        """Weights biased or capped by measured time so the job stays within its budget"""
+        table = self.timings.store.load()
+        seconds = [self.timings.estimate(w, h, steps, table) for w, h in sizes]
+        if None in seconds or sum(weights) <= 0:
+            log.warning("No timings recorded yet, ignoring the time budget for this job")
+            return weights
+        weights = dimensions.budget_weights(weights, seconds, target, handling)
+        expected = sum(w * t for w, t in zip(weights, seconds)) / sum(weights)
+        log.info(f"Budget {target:.2f} s/image, expected {expected:.2f} s/image")
+        return weights
+
+    def sampler(self, sizes, weights, seed, no_repeat):
+        if seed is not None:
+            return Sampler(sizes, weights, no_repeat, seed=seed, stream="random_dimensions")
+        key = (tuple(sizes), tuple(weights), no_repeat)
+        if key != self._sampler_key:
+            self._sampler, self._sampler_key = Sampler(sizes, weights, no_repeat), key
+        return self._sampler
+
+    def plan(self, sampler, n_iter, mode):
+        """One (width, height) per batch for the whole job"""
+        if mode == MODES[0]:
+            return [sampler.draw()] * n_iter
+        sizes = sampler.draws(n_iter)
+        if mode == MODES[2]:
+            # Same draws, regrouped so each latent shape is used in one run of batches
+            first_seen = {}
+            for size in sizes:
+                first_seen.setdefault(size, len(first_seen))
+            sizes.sort(key=first_seen.get)
+        return sizes
+
+    def apply(self, p, size):
+        p.width, p.height = size
+        p.extra_generation_params["Random Dimensions"] = f"{p.width}x{p.height}"
+        # Hires fix derives its target from the first-pass size
+        if getattr(p, 'enable_hr', False) and hasattr(p, 'calculate_target_resolution'):
+            p.calculate_target_resolution()
+
+    def process(self, p, enabled, mode=MODES[0], use_seed=False, no_repeat=False,
+                budget_unit=dimensions.BUDGET_UNITS[0], budget_value=0, budget_handling=dimensions.BUDGET_HANDLING[0]):
+        self.schedule = []
         if not enabled:
             return
+        if sweep.claimed(p):
+            log.info("A sweep is running, leaving dimensions to it")
+            return
 
-        if not self.dimension_pairs:
-            print("[Random Dimensions] No dimension pairs available!")
+        dimension_pairs = self.dimension_pairs
+        if not dimension_pairs:
+            log.warning("No dimension pairs available!")
             return
 
-        # Select a random dimension pair
-        selected_pair = random.choice(self.dimension_pairs)
-        p.width = selected_pair["width"]
-        p.height = selected_pair["height"]
+        if self.is_img2img and mode != MODES[0]:
+            # img2img encodes its init latents once, before the first batch
+            log.info("Per-batch dimensions are txt2img only, using one size for the job")
+            mode = MODES[0]
 
-        print(f"[Random Dimensions] Set dimensions to: {p.width}x{p.height}")
+        sizes = [(pair["width"], pair["height"]) for pair in dimension_pairs]
+        weights = [pair.get("weight", 1) for pair in dimension_pairs]
+        target = dimensions.budget_target(budget_unit, budget_value, p.n_iter * p.batch_size)
+        if target is not None:
+            weights = self.budget(sizes, weights, p.steps, target, budget_handling)
 
-    def postprocess(self, p, processed, enabled):
-        if enabled:
-            processed.info += f"\nRandom Dimensions: {p.width}x{p.height}"
\ No newline at end of file
+        seed = None
+        if use_seed:
+            seed = p.all_seeds[0] if getattr(p, 'all_seeds', None) else p.seed
+        try:
+            sampler = self.sampler(sizes, weights, seed, no_repeat)
+        except ValueError as e:
+            log.warning(f"Cannot pick dimensions: {e}")
+            return
+
+        self.schedule = self.plan(sampler, max(1, p.n_iter), mode)
+        for width, height in self.schedule:
+            metrics.SELECTIONS.inc(max(1, p.batch_size), kind="dimensions", value=f"{width}x{height}", source="random")
+        self.apply(p, self.schedule[0])
+
+        cost = sum(dimensions.pair_cost(w, h)["relative"] for w, h in self.schedule) * max(1, p.batch_size)
+        if mode == MODES[0]:
+            log.info(f"Set dimensions to: {p.width}x{p.height} "
+                     f"(job cost ~{cost:.1f}x 512x512 images)")
+        else:
+            log.info(f"Planned {len(self.schedule)} batches over "
+                     f"{len(set(self.schedule))} sizes, {self.shape_switches()} shape switches "
+                     f"(job cost ~{cost:.1f}x 512x512 images)")
+
+    def before_process_batch(self, p, enabled, *args, **kwargs):
+        if not enabled or not self.schedule:
+            return
+        batch_number = kwargs.get('batch_number', 0)
+        if batch_number < len(self.schedule) and (p.width, p.height) != self.schedule[batch_number]:
+            self.apply(p, self.schedule[batch_number])
+        self._batch_started = time.perf_counter()
+
+    def postprocess_batch(self, p, enabled, *args, **kwargs):
+        if not enabled or self._batch_started is None:
+            return
+        seconds = (time.perf_counter() - self._batch_started) / max(1, p.batch_size)
+        self._batch_started = None
+        self.timings.record(p.width, p.height, p.steps, seconds)
+
+    def shape_switches(self):
+        return sum(1 for a, b in zip(self.schedule, self.schedule[1:]) if a != b)
+
+    def postprocess(self, p, processed, enabled, *args):
+        # Each image's infotext already names its own size through extra_generation_params
+        if not enabled or len(set(self.schedule)) < 2:
+            return
+        sizes = ", ".join(f"{w}x{h}" for w, h in dict.fromkeys(self.schedule))
+        log.info(f"Job used {sizes} with {self.shape_switches()} shape switches")
\ No newline at end of file
@@ -1,23 +1,37 @@
 import gradio as gr
-import json
 import os
 import random as stdlib_random
 
-from modules import scripts, shared
+from modules import scripts, script_callbacks, shared
 from modules.processing import StableDiffusionProcessing
 
+from a1111_tweaks import faceswaplab
+from a1111_tweaks import face_library
+from a1111_tweaks import instrument
+from a1111_tweaks import logs
+from a1111_tweaks import metrics
+from a1111_tweaks import sweep
 
+log = logs.get_logger("random_faces")
+
+# A rebuilt UI has a new script runner with its own argument layout
+script_callbacks.on_before_ui(faceswaplab.invalidate)
+
+
+@instrument.instrument_hooks("random_faces")
 class RandomFacesScript(scripts.Script):
     # Use a separate Random instance that won't be affected by A1111's seeding
     rng = stdlib_random.Random()
 
     def __init__(self):
         super().__init__()
-        self.face_pool = []
         self.available_faces = []
         self.last_selected_face = None
-        self.config_file = os.path.join(scripts.basedir(), "random_faces_config.json")
-        self.load_config()
+        self.config_file = face_library.CONFIG_FILE
+        # Shared with the other tab's instance of this script
+        self.store = face_library.config_store()
+        # Use A1111's models path directly; the index is shared by both tabs
+        self.library = face_library.get_library(os.path.join(shared.models_path, "faceswaplab", "faces"))
         self.refresh_available_faces()
 
     def title(self):
@@ -26,35 +40,42 @@ class RandomFacesScript(scripts.Script):
     def show(self, is_img2img):
         return scripts.AlwaysVisible
 
-    def load_config(self):
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    data = json.load(f)
-                    self.face_pool = data.get('face_pool', [])
-            except:
-                self.face_pool = []
+    @property
+    def face_pool(self):
+        return self.store.load().get('face_pool', [])
+
+    def update_pool(self, fn):
+        """Apply fn to the latest saved face pool and save it"""
+        return self.store.update(lambda data: fn(data.setdefault('face_pool', [])))
 
-    def save_config(self):
-        with open(self.config_file, 'w') as f:
-            json.dump({'face_pool': self.face_pool}, f)
+    def pool_text(self):
+        face_pool = self.face_pool
+        return "\n".join([f"{i}: {face}" for i, face in enumerate(face_pool)]) if face_pool else "Empty"
 
     def refresh_available_faces(self):
-        # Use A1111's models path directly
-        faces_dir = os.path.join(shared.models_path, "faceswaplab", "faces")
-        print(f"[Random Faces] Looking for faces in: {faces_dir}")
+        faces_dir = self.library.faces_dir
+        log.info(f"Looking for faces in: {faces_dir}")
 
         if os.path.exists(faces_dir):
-            self.available_faces = ["None"] + sorted([f for f in os.listdir(faces_dir) if f.endswith('.safetensors')])
-            print(f"[Random Faces] Found {len(self.available_faces) - 1} faces")
+            # Only new or changed files have their headers read again
+            self.library.refresh()
+            self.available_faces = ["None"] + self.library.names()
+            log.info(f"Found {len(self.available_faces) - 1} faces")
+            for name, error in self.library.invalid().items():
+                log.warning(f"Skipping invalid face checkpoint {name}: {error}")
         else:
-            print(f"[Random Faces] Directory not found: {faces_dir}")
+            log.warning(f"Directory not found: {faces_dir}")
             self.available_faces = ["None"]
 
     def ui(self, is_img2img):
         with gr.Accordion("a1111 tweaks - Random Faces", open=False):
             with gr.Column():
                 enabled = gr.Checkbox(label="Enable Random Face Selection", value=False)
+                prewarm = gr.Checkbox(
+                    label="Preload the selected face file",
+                    value=True,
+                    info="Pulls the checkpoint into the OS file cache so the first swap doesn't wait on disk"
+                )
 
                 with gr.Row():
                     face_dropdown = gr.Dropdown(
@@ -73,32 +94,37 @@ class RandomFacesScript(scripts.Script):
 
                 pool_display = gr.Textbox(
                     label="Current Face Pool",
-                    value="\n".join(
-                        [f"{i}: {face}" for i, face in enumerate(self.face_pool)]) if self.face_pool else "Empty",
+                    value=self.pool_text(),
                     interactive=False,
                     lines=5
                 )
 
+                @instrument.timed("random_faces.add_face")
                 def add_face(face):
-                    if face and face != "None" and face not in self.face_pool:
-                        self.face_pool.append(face)
-                        self.save_config()
-                    return "\n".join(
-                        [f"{i}: {face}" for i, face in enumerate(self.face_pool)]) if self.face_pool else "Empty"
+                    def add(pool):
+                        if face and face != "None" and face not in pool:
+                            pool.append(face)
+
+                    self.update_pool(add)
+                    return self.pool_text()
 
+                @instrument.timed("random_faces.remove_face")
                 def remove_face(idx):
                     idx = int(idx)
-                    if 0 <= idx < len(self.face_pool):
-                        self.face_pool.pop(idx)
-                        self.save_config()
-                    return "\n".join(
-                        [f"{i}: {face}" for i, face in enumerate(self.face_pool)]) if self.face_pool else "Empty"
 
+                    def remove(pool):
+                        if 0 <= idx < len(pool):
+                            pool.pop(idx)
+
+                    self.update_pool(remove)
+                    return self.pool_text()
+
+                @instrument.timed("random_faces.clear_all")
                 def clear_all():
-                    self.face_pool = []
-                    self.save_config()
+                    self.update_pool(lambda pool: pool.clear())
                     return "Empty"
 
+                @instrument.timed("random_faces.refresh_faces")
                 def refresh_faces():
                     self.refresh_available_faces()
                     return gr.Dropdown(choices=self.available_faces)
@@ -108,21 +134,35 @@ class RandomFacesScript(scripts.Script):
                 clear_btn.click(fn=clear_all, inputs=[], outputs=[pool_display])
                 refresh_btn.click(fn=refresh_faces, inputs=[], outputs=[face_dropdown])
 
-        return [enabled]
+        return [enabled, prewarm]
 
-    def before_process(self, p, enabled):
+    def before_process(self, p, enabled, prewarm=True):
+        self.last_selected_face = None
         if not enabled:
             return
+        if sweep.claimed(p):
+            log.info("A sweep is running, leaving the face to it")
+            return
 
-        if not self.face_pool:
-            print("[Random Faces] No faces in pool!")
+        face_pool = self.face_pool
+        if not face_pool:
+            log.warning("No faces in pool!")
             return
 
-        # Filter out "None"
-        valid_faces = [f for f in self.face_pool if f != "None"]
+        # Filter out "None" and files that went missing or failed validation
+        self.library.refresh()
+        valid_faces = [f for f in face_pool if f != "None" and self.library.info(f) is not None]
+        skipped = [f for f in face_pool if f != "None" and f not in valid_faces]
+        if skipped:
+            log.warning(f"Skipping missing or invalid faces: {', '.join(skipped)}")
 
         if not valid_faces:
-            print("[Random Faces] Only 'None' in pool, skipping")
+            log.warning("No usable faces in pool, skipping")
+            return
+
+        # The checkpoint's position in script_args depends on which extensions are installed
+        if faceswaplab.face_index(getattr(p, 'scripts', None)) is None:
+            log.warning("FaceSwapLab face checkpoint not found, skipping")
             return
 
         # Use our own RNG instance - NOT affected by A1111's seed manipulation
@@ -130,23 +170,21 @@ class RandomFacesScript(scripts.Script):
 
         # Store for later retrieval
         self.last_selected_face = selected_face
-
-        # FaceSwapLab stores the face checkpoint at index 31 (after ControlNet installation)
-        FACESWAPLAB_FACE_INDEX = 31
-
-        if hasattr(p, 'script_args') and len(p.script_args) > FACESWAPLAB_FACE_INDEX:
-            args_list = list(p.script_args)
-            args_list[FACESWAPLAB_FACE_INDEX] = selected_face
-            p.script_args = tuple(args_list)
-            print(f"[Random Faces] Set face checkpoint to: {selected_face}")
+        metrics.SELECTIONS.inc(p.n_iter * p.batch_size, kind="face", value=selected_face, source="random")
+        if prewarm:
+            # Readahead runs in the kernel while the job samples
+            self.library.prewarm([selected_face])
+
+        index = faceswaplab.set_face(p, selected_face)
+        if index is not None:
+            log.info(f"Set face checkpoint to: {selected_face} (arg {index})")
         else:
-            print(
-                f"[Random Faces] Warning: Could not set face checkpoint (script_args length: {len(p.script_args) if hasattr(p, 'script_args') else 0})")
+            log.warning(f"Could not set face checkpoint (script_args length: {len(p.script_args) if hasattr(p, 'script_args') else 0})")
 
-    def process(self, p, enabled):
+    def process(self, p, enabled, *args):
         pass
 
-    def postprocess(self, p, processed, enabled):
+    def postprocess(self, p, processed, enabled, *args):
         """Add selected face info to generation parameters"""
         if enabled and self.last_selected_face:
             if hasattr(processed, 'infotexts') and processed.infotexts:
@@ -1,31 +1,33 @@
-import random
 import gradio as gr
-import json
-import os
-from modules import scripts
+import math
+from modules import scripts, shared
 
+from a1111_tweaks import instrument, logs, metrics, styles, sweep
+from a1111_tweaks.sampling import Sampler, derive_rng
+from a1111_tweaks.styles import pool_name as entry_name, pool_weight as entry_weight
 
+log = logs.get_logger("random_styles")
+
+MODES = ["Per job", "Per image"]
+STREAM = "random_styles"
+
+
+def style_catalog():
+    """One catalog for both tabs and the sweep, loaded on first use"""
+    return styles.shared_catalog(styles.find_style_files(getattr(shared.cmd_opts, 'styles_file', None)))
+
+
+@instrument.instrument_hooks("random_styles")
 class RandomStylesScript(scripts.Script):
     def __init__(self):
-        self.presets_file = os.path.join(scripts.basedir(), "random_styles_presets.json")
-        self.style_pool = self.load_presets()
-
-        # Common SDXL styles - expand this list as needed
-        self.available_styles = [
-            "3D Model", "Abstract", "Advertising", "Alien", "Analog Film", "Anime",
-            "Architectural", "Cinematic", "Collage", "Comic Book", "Craft Clay", "Cubist",
-            "Digital Art", "Disco", "Dreamscape", "Dystopian", "Enhance", "Fairy Tale",
-            "Fantasy Art", "Fighting Game", "Film Noir", "Flat Papercut", "Food Photography",
-            "GTA", "Gothic", "Graffiti", "Grunge", "HDR", "Horror", "Hyperrealism",
-            "Impressionist", "Isometric Style", "Kirigami", "Legend of Zelda", "Line Art",
-            "Long Exposure", "Lowpoly", "Minecraft", "Minimalist", "Monochrome", "Nautical",
-            "Neon Noir", "Neon Punk", "Origami", "Paper Mache", "Paper Quilling",
-            "Papercut Collage", "Papercut Shadow Box", "Photographic", "Pixel Art", "Pointillism",
-            "Pokémon", "Pop Art", "Psychedelic", "RPG Fantasy Game", "Real Estate",
-            "Retro Arcade", "Retro Game", "Rococo", "Silhouette", "Space",
-            "Stained Glass", "Steampunk", "Surrealist", "Synthwave", "Tilt-Shift",
-            "Tribal", "Typography", "Ukiyo-e", "Watercolor", "Zentangle"
-        ]
+        self.presets_file = styles.PRESETS_FILE
+        # Shared with the other tab's instance of this script
+        self.store = styles.presets_store()
+
+        self.catalog = style_catalog()
+        # Unseeded sampler, kept between jobs so a no-repeat round can span several jobs
+        self._sampler = None
+        self._sampler_key = None
 
     def title(self):
         return "Random SDXL Styles"
@@ -33,35 +35,31 @@ class RandomStylesScript(scripts.Script):
     def show(self, is_img2img):
         return scripts.AlwaysVisible
 
-    def load_presets(self):
-        """Load saved style pool from file"""
-        if os.path.exists(self.presets_file):
-            try:
-                with open(self.presets_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        # Default style pool
-        return ["Enhance", "Cinematic", "Photographic"]
-
-    def save_presets(self):
-        """Save style pool to file"""
-        try:
-            with open(self.presets_file, 'w') as f:
-                json.dump(self.style_pool, f, indent=2)
-        except Exception as e:
-            print(f"[Random Styles] Error saving presets: {e}")
+    @property
+    def style_pool(self):
+        """Saved style pool, re-read only when the presets file changes"""
+        return self.store.load()
 
     def get_style_pool_text(self):
         """Format style pool for display"""
-        if not self.style_pool:
+        style_pool = self.style_pool
+        if not style_pool:
             return "No styles in pool"
-        return "\n".join([f"{i + 1}. {style}" for i, style in enumerate(self.style_pool)])
+        lines = []
+        for i, entry in enumerate(style_pool):
+            name, weight = entry_name(entry), entry_weight(entry)
+            lines.append(f"{i + 1}. {name}" + ("" if weight == 1 else f" (weight {weight:g})")
+                         + ("" if name in self.catalog else " (not found)"))
+        return "\n".join(lines)
 
     def ui(self, is_img2img):
         with gr.Group():
             with gr.Accordion("a1111 tweaks - Random Styles", open=False):
                 enabled = gr.Checkbox(label="Enable Random Style Selection", value=False)
+                mode = gr.Radio(label="Pick a style", choices=MODES, value=MODES[0])
+                with gr.Row():
+                    use_seed = gr.Checkbox(label="Use seed for randomization (reproducible)", value=False)
+                    no_repeat = gr.Checkbox(label="No repeats until every style is used", value=False)
 
                 gr.Markdown("### Current Style Pool")
                 pool_display = gr.Textbox(
@@ -72,12 +70,17 @@ class RandomStylesScript(scripts.Script):
                 )
 
                 gr.Markdown("### Add Style to Pool")
+                available_styles = self.catalog.names()
+                with gr.Row():
+                    style_search = gr.Textbox(label="Search Styles", placeholder="Prefix or approximate name")
+                    refresh_btn = gr.Button("🔄", scale=0)
                 with gr.Row():
                     style_dropdown = gr.Dropdown(
-                        choices=self.available_styles,
+                        choices=available_styles,
                         label="Select Style",
-                        value=self.available_styles[0] if self.available_styles else None
+                        value=available_styles[0] if available_styles else None
                     )
+                    style_weight = gr.Number(label="Weight", value=1, minimum=0)
                     add_btn = gr.Button("Add to Pool", variant="primary")
 
                 gr.Markdown("### Remove Style from Pool")
@@ -92,29 +95,61 @@ class RandomStylesScript(scripts.Script):
 
                 clear_btn = gr.Button("Clear All Styles", variant="stop")
 
-                def add_style(style):
-                    if style and style not in self.style_pool:
-                        self.style_pool.append(style)
-                        self.save_presets()
-                    elif style in self.style_pool:
+                @instrument.timed("random_styles.add_style")
+                def add_style(style, weight):
+                    self.catalog.refresh()
+                    if style not in self.catalog:
+                        suggestion = self.catalog.suggest(style or "")
+                        hint = f" Did you mean '{suggestion}'?" if suggestion else ""
+                        return f"⚠️ Unknown style '{style}'.{hint}\n\n{self.get_style_pool_text()}"
+                    # A cleared Weight box arrives as None
+                    weight = 1.0 if weight is None else float(weight)
+                    if not math.isfinite(weight):
+                        return f"⚠️ Weight must be a finite number\n\n{self.get_style_pool_text()}"
+
+                    def add(pool):
+                        if any(entry_name(entry) == style for entry in pool):
+                            return False
+                        if style:
+                            pool.append(style if weight == 1 else {"name": style, "weight": max(0.0, weight)})
+                        return True
+
+                    if not self.store.update(add):
                         return f"⚠️ '{style}' is already in the pool\n\n{self.get_style_pool_text()}"
                     return self.get_style_pool_text()
 
+                @instrument.timed("random_styles.remove_style")
                 def remove_style(index):
                     index = int(index) - 1
-                    if 0 <= index < len(self.style_pool):
-                        self.style_pool.pop(index)
-                        self.save_presets()
+
+                    def remove(pool):
+                        if 0 <= index < len(pool):
+                            pool.pop(index)
+
+                    self.store.update(remove)
                     return self.get_style_pool_text()
 
+                @instrument.timed("random_styles.clear_all")
                 def clear_all():
-                    self.style_pool = []
-                    self.save_presets()
+                    self.store.update(lambda pool: pool.clear())
                     return self.get_style_pool_text()
 
+                @instrument.timed("random_styles.search_styles")
+                def search_styles(query):
+                    matches = self.catalog.search(query, limit=100)
+                    return gr.update(choices=matches, value=matches[0] if matches else None)
+
+                @instrument.timed("random_styles.refresh_styles")
+                def refresh_styles(query):
+                    self.catalog.refresh()
+                    return search_styles(query), self.get_style_pool_text()
+
+                style_search.change(fn=search_styles, inputs=[style_search], outputs=[style_dropdown])
+                refresh_btn.click(fn=refresh_styles, inputs=[style_search], outputs=[style_dropdown, pool_display])
+
                 add_btn.click(
                     fn=add_style,
-                    inputs=[style_dropdown],
+                    inputs=[style_dropdown, style_weight],
                     outputs=[pool_display]
                 )
 
@@ -130,31 +165,60 @@ class RandomStylesScript(scripts.Script):
                     outputs=[pool_display]
                 )
 
-        return [enabled]
-
-    def process(self, p, enabled):
+        return [enabled, mode, use_seed, no_repeat]
+
+    def sampler(self, names, weights, seed, no_repeat):
+        if seed is not None:
+            return Sampler(names, weights, no_repeat, seed=seed, stream=STREAM)
+        key = (tuple(names), tuple(weights), no_repeat)
+        if key != self._sampler_key:
+            self._sampler, self._sampler_key = Sampler(names, weights, no_repeat), key
+        return self._sampler
+
+    def pick_styles(self, p, entries, count, use_seed, no_repeat):
+        """One style name per image (or one for the job when count is 1)"""
+        names = [entry_name(entry) for entry in entries]
+        weights = [entry_weight(entry) for entry in entries]
+        seeds = list(getattr(p, 'all_seeds', None) or [p.seed])
+        sampler = self.sampler(names, weights, seeds[0] if use_seed else None, no_repeat)
+        if use_seed and not no_repeat:
+            # Each image's style follows from its own seed, so rerunning one image reproduces it
+            return [sampler.draw(derive_rng(seeds[i % len(seeds)], STREAM)) for i in range(count)]
+        return sampler.draws(count)
+
+    def process(self, p, enabled, mode=MODES[0], use_seed=False, no_repeat=False):
         if not enabled:
             return
-
-        if not self.style_pool:
-            print("[Random Styles] No styles in pool!")
+        if sweep.claimed(p):
+            log.info("A sweep is running, leaving styles to it")
             return
 
-        # Select a random style from the pool
-        selected_style = random.choice(self.style_pool)
-
-        # Set the style - this assumes the SDXL Styles extension uses p.styles
-        # You may need to adjust this depending on how the styles extension works
-        if hasattr(p, 'styles'):
-            if isinstance(p.styles, list):
-                # Replace existing styles
-                p.styles = [selected_style]
-            else:
-                p.styles = selected_style
+        style_pool = self.style_pool
+        if not style_pool:
+            log.warning("No styles in pool!")
+            return
 
-        print(f"[Random Styles] Selected style: {selected_style}")
+        # Unchanged files are only stat'ed
+        self.catalog.refresh()
+        known = [entry for entry in style_pool if entry_name(entry) in self.catalog]
+        if len(known) < len(style_pool):
+            missing = ", ".join(entry_name(entry) for entry in style_pool if entry_name(entry) not in self.catalog)
+            log.warning(f"Skipping styles not found in any styles file: {missing}")
+        if not known:
+            return
 
-    def postprocess(self, p, processed, enabled):
-        if enabled and hasattr(p, 'styles'):
-            style_info = p.styles if isinstance(p.styles, str) else ", ".join(p.styles)
-            processed.info += f"\nRandom Style: {style_info}"
\ No newline at end of file
+        count = len(p.all_prompts) if mode == MODES[1] and getattr(p, 'all_prompts', None) else 1
+        try:
+            picks = self.pick_styles(p, known, count, use_seed, no_repeat)
+        except ValueError as e:
+            log.warning(f"Cannot pick a style: {e}")
+            return
+        styles.apply_styles(p, [self.catalog.get(name) for name in picks])
+        images = len(getattr(p, 'all_prompts', None) or [p.prompt])
+        for name in picks:
+            metrics.SELECTIONS.inc(images // len(picks), kind="style", value=name, source="random")
+
+        if count == 1:
+            log.info(f"Selected style: {picks[0]}")
+        else:
+            log.info(f"Assigned {len(set(picks))} styles across {count} images")
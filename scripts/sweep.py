@@ -0,0 +1,190 @@
+import gradio as gr
+import os
+from modules import scripts, shared
+
+from a1111_tweaks import dimensions, face_library, faceswaplab, instrument, logs, metrics, styles, sweep
+
+log = logs.get_logger("sweep")
+
+
+@instrument.instrument_hooks("sweep")
+class SweepScript(scripts.Script):
+    def __init__(self):
+        self.progress = sweep.SweepProgress(sweep.progress_store())
+        self.library = face_library.get_library(os.path.join(shared.models_path, "faceswaplab", "faces"))
+        self.catalog = styles.shared_catalog(styles.find_style_files(getattr(shared.cmd_opts, 'styles_file', None)))
+        # (plan, first combination index) for the current job
+        self.job = None
+
+    def title(self):
+        return "a1111 tweaks - Sweep"
+
+    def show(self, is_img2img):
+        # Each batch gets its own size, which img2img can't do
+        return scripts.AlwaysVisible if not is_img2img else False
+
+    def build_plan(self, mode, sample_size, seed, axes):
+        """The plan for the saved dimension pairs, face pool and style pool; returns (plan, notes)"""
+        notes = []
+        sizes = faces = style_names = [None]
+        if "Dimensions" in axes:
+            sizes = [(pair["width"], pair["height"]) for pair in dimensions.presets_store().load()] or [None]
+            if sizes == [None]:
+                notes.append("no dimension pairs saved, keeping the job's size")
+        if "Faces" in axes:
+            self.library.refresh()
+            pool = face_library.config_store().load().get('face_pool', [])
+            faces = [face for face in pool if face != "None" and self.library.info(face) is not None] or [None]
+            if faces == [None]:
+                notes.append("no usable faces in the pool, leaving FaceSwapLab as set")
+        if "Styles" in axes:
+            self.catalog.refresh()
+            pool = [styles.pool_name(entry) for entry in styles.presets_store().load()]
+            style_names = [name for name in pool if name in self.catalog] or [None]
+            if style_names == [None]:
+                notes.append("no known styles in the pool, prompts are not styled")
+        plan = sweep.SweepPlan(sizes, faces, style_names, mode, int(sample_size or 0), int(seed or 0))
+        return plan, notes
+
+    def status_text(self, mode, sample_size, seed, axes):
+        plan, notes = self.build_plan(mode, sample_size, seed, axes)
+        done = self.progress.position(plan)
+        size_switches, face_switches = plan.switches()
+        lines = [f"{len(plan)} combinations ({len(plan.sizes)} sizes x {len(plan.faces)} faces x "
+                 f"{len(plan.styles)} styles = {plan.product}), {done} done",
+                 f"{size_switches} size switches and {face_switches} face switches over the whole sweep"]
+        if done < len(plan):
+            size, face, style = plan.combination(done)
+            lines.append(f"Next: {self.combination_text(size, face, style)}")
+        else:
+            lines.append("Sweep complete")
+        lines.extend(f"Note: {note}" for note in notes)
+        return "\n".join(lines)
+
+    def combination_text(self, size, face, style):
+        parts = [f"{size[0]}x{size[1]}" if size else None, face, style]
+        return ", ".join(part for part in parts if part) or "nothing to vary"
+
+    def ui(self, is_img2img):
+        with gr.Accordion("a1111 tweaks - Sweep", open=False):
+            enabled = gr.Checkbox(
+                label="Enable Sweep",
+                value=False,
+                info="Each batch runs the next combination; batch size sets the images per combination. "
+                     "Overrides Random Dimensions, Random Styles and Random Faces."
+            )
+            axes = gr.CheckboxGroup(label="Sweep over", choices=sweep.AXES, value=sweep.AXES)
+            with gr.Row():
+                mode = gr.Radio(label="Plan", choices=sweep.MODES, value=sweep.MODES[0])
+                sample_size = gr.Number(label="Sample size", value=20, precision=0, minimum=1)
+                seed = gr.Number(label="Sample seed", value=1, precision=0)
+            status = gr.Textbox(label="Progress", value="", interactive=False, lines=4)
+            with gr.Row():
+                refresh_btn = gr.Button("Refresh", variant="secondary")
+                reset_btn = gr.Button("Restart Sweep", variant="stop")
+
+            @instrument.timed("sweep.reset")
+            def reset(*args):
+                plan, _ = self.build_plan(*args)
+                self.progress.reset(plan)
+                return self.status_text(*args)
+
+            inputs = [mode, sample_size, seed, axes]
+            refresh_btn.click(fn=instrument.timed("sweep.status_text")(self.status_text), inputs=inputs, outputs=[status])
+            reset_btn.click(fn=reset, inputs=inputs, outputs=[status])
+
+        return [enabled, mode, sample_size, seed, axes]
+
+    def setup(self, p, enabled=False, mode=sweep.MODES[0], sample_size=0, seed=0, axes=()):
+        """Claim the job before any other script's hooks run"""
+        self.job = None
+        if not enabled:
+            return
+        plan, notes = self.build_plan(mode, sample_size, seed, axes or [])
+        for note in notes:
+            log.info(f"Note: {note}")
+        start = self.progress.position(plan)
+        if start >= len(plan):
+            log.info(f"All {len(plan)} combinations are done; restart the sweep to run it again")
+            return
+
+        # FaceSwapLab reads its face once per job, so a job stops where the face changes
+        stop = min(start + max(1, p.n_iter), plan.face_run_end(start))
+        if stop - start < p.n_iter:
+            log.info(f"Running {stop - start} of {p.n_iter} batches to finish this face; "
+                     f"generate again to continue")
+            p.n_iter = stop - start
+        self.job = (plan, start)
+        setattr(p, sweep.ATTR, plan.signature())
+        size_switches = plan.switches(start, stop)[0]
+        log.info(f"Combinations {start + 1}-{stop} of {len(plan)}, {size_switches} size switches")
+
+    def before_process(self, p, *args):
+        if not self.job:
+            return
+        plan, start = self.job
+        face = plan.combination(start).face
+        if face is None:
+            return
+        # The next job's face is known too, so it can be read ahead while this one runs
+        upcoming = [face]
+        stop = start + p.n_iter
+        if stop < len(plan) and plan.combination(stop).face is not None:
+            upcoming.append(plan.combination(stop).face)
+        self.library.prewarm(upcoming)
+        if faceswaplab.set_face(p, face) is None:
+            log.warning("Could not set the FaceSwapLab face checkpoint")
+            return
+        p.extra_generation_params["Random Face"] = face
+
+    def process(self, p, *args):
+        if not self.job:
+            return
+        plan, start = self.job
+        if plan.combination(start).size:
+            self.apply_size(p, plan.combination(start).size)
+
+        prompts = getattr(p, 'all_prompts', None) or [p.prompt]
+        batch_size = max(1, p.batch_size)
+        per_image = [plan.combination(start + min(i // batch_size, p.n_iter - 1)).style for i in range(len(prompts))]
+        if per_image[0] is not None:
+            styles.apply_styles(p, [self.catalog.get(name) for name in per_image])
+
+    def apply_size(self, p, size):
+        p.width, p.height = size
+        p.extra_generation_params["Random Dimensions"] = f"{p.width}x{p.height}"
+        # Hires fix derives its target from the first-pass size
+        if getattr(p, 'enable_hr', False) and hasattr(p, 'calculate_target_resolution'):
+            p.calculate_target_resolution()
+
+    def before_process_batch(self, p, *args, **kwargs):
+        if not self.job:
+            return
+        plan, start = self.job
+        index = start + kwargs.get('batch_number', 0)
+        size = plan.combination(index).size
+        if size and (p.width, p.height) != size:
+            self.apply_size(p, size)
+        p.extra_generation_params["Sweep"] = f"{index + 1}/{len(plan)}"
+        for kind, value in zip(("dimensions", "face", "style"), plan.combination(index)):
+            if value is not None:
+                value = f"{value[0]}x{value[1]}" if kind == "dimensions" else value
+                metrics.SELECTIONS.inc(max(1, p.batch_size), kind=kind, value=value, source="sweep")
+
+    def postprocess_batch(self, p, *args, **kwargs):
+        if not self.job:
+            return
+        if shared.state.interrupted:
+            # An interrupted batch is rerun when the sweep resumes
+            return
+        plan, start = self.job
+        # Saved after every batch, so a crash loses at most the batch in flight
+        self.progress.advance(plan, start + kwargs.get('batch_number', 0) + 1)
+
+    def postprocess(self, p, processed, *args):
+        if not self.job:
+            return
+        plan, _ = self.job
+        self.job = None
+        done = self.progress.position(plan)
+        log.info(f"{done} of {len(plan)} combinations done")
@@ -1,77 +1,92 @@
-import io
-import json
 import os
 import uuid
 
 import gradio as gr
-import requests
 from modules import scripts, script_callbacks
 
+from a1111_tweaks import instrument, logs, wanly, watcher
+from a1111_tweaks.upload_queue import shared_queue
+
+log = logs.get_logger("upload_to_wanly")
+
+AUTO_UPLOAD_SOURCES = ["txt2img", "img2img", "extras"]
+
 # Module-level storage so the on_image_saved callback can write to it
 _last_image = None
 _last_filename = None
+_last_filepath = None
+
+
+def load_wanly_config():
+    """Load wanly upload config from JSON."""
+    return wanly.load_config()
+
+
+def _auto_upload_settings(config):
+    return {
+        "enabled": bool(config.get("auto_upload", False)),
+        "skip_grids": bool(config.get("auto_upload_skip_grids", True)),
+        "sources": list(config.get("auto_upload_sources", ["txt2img", "img2img"])),
+    }
+
 
+# Read once here and refreshed by Save Settings, so the save hook never touches disk
+_auto_upload = _auto_upload_settings(load_wanly_config())
 
+
+def queue_status_text():
+    return f"{shared_queue().status_text()}\n{wanly.dedup_stats_text()}"
+
+
+def _image_source(p):
+    if p is None:
+        return "extras"
+    return "img2img" if getattr(p, "init_images", None) else "txt2img"
+
+
+def _is_grid(params):
+    name = os.path.basename(params.filename)
+    if name.startswith("grid-"):
+        return True
+    grids_dir = getattr(params.p, "outpath_grids", None)
+    samples_dir = getattr(params.p, "outpath_samples", None)
+    return bool(grids_dir) and grids_dir != samples_dir and \
+        os.path.abspath(params.filename).startswith(os.path.abspath(grids_dir) + os.sep)
+
+
+def _should_auto_upload(params):
+    if not _auto_upload["enabled"]:
+        return False
+    if _auto_upload["skip_grids"] and _is_grid(params):
+        return False
+    return _image_source(params.p) in _auto_upload["sources"]
+
+
+@instrument.timed("upload_to_wanly._on_image_saved")
 def _on_image_saved(params):
     """Called after ALL postprocessing (including FaceSwapLab) and saving."""
-    global _last_image, _last_filename
-    _last_image = params.image
+    global _last_image, _last_filename, _last_filepath
     _last_filename = os.path.basename(params.filename)
+    _last_filepath = os.path.abspath(params.filename)
+    # Only hold the PIL image when there is no file to upload from
+    _last_image = None if os.path.isfile(_last_filepath) else params.image
+    # Lets the gallery index pick up the new file without a rescan
+    watcher.publish(watcher.CREATED, _last_filepath)
 
-
-script_callbacks.on_image_saved(_on_image_saved)
+    if _should_auto_upload(params):
+        try:
+            # Only a queue insert; the network transfer happens on the queue's workers
+            shared_queue().enqueue(_last_filename, filepath=_last_filepath, image=_last_image)
+        except Exception as e:
+            log.warning(f"Auto-upload failed to queue {_last_filename}: {e}")
 
 
-def load_wanly_config():
-    """Load wanly upload config from JSON."""
-    config_file = os.path.join(scripts.basedir(), "upload_to_wanly_config.json")
-    if os.path.exists(config_file):
-        try:
-            with open(config_file, "r") as f:
-                return json.load(f)
-        except Exception:
-            pass
-    return {"api_url": "", "api_key": ""}
-
-
-def upload_image_to_wanly(image, filename, api_url=None, api_key=None):
-    """Upload a PIL Image to the wanly API."""
-    if api_url is None or api_key is None:
-        config = load_wanly_config()
-        if api_url is None:
-            api_url = config.get("api_url", "")
-        if api_key is None:
-            api_key = config.get("api_key", "")
-
-    api_url = api_url.rstrip("/")
-    if not api_url:
-        return False, "Error: API URL not set."
-    if not api_key:
-        return False, "Error: API Key not set."
-
-    try:
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        buf.seek(0)
-        resp = requests.post(
-            f"{api_url}/images/upload",
-            params={"filename": filename},
-            headers={"X-API-Key": api_key},
-            files={"file": (filename, buf, "image/png")},
-            timeout=60,
-        )
-        if resp.status_code == 200:
-            path = resp.json().get("path", "")
-            return True, f"Uploaded: {path}"
-        else:
-            return False, f"Error {resp.status_code}: {resp.text}"
-    except Exception as e:
-        return False, f"Error: {e}"
+script_callbacks.on_image_saved(_on_image_saved)
 
 
+@instrument.instrument_hooks("upload_to_wanly")
 class UploadToWanlyScript(scripts.Script):
     def __init__(self):
-        self.config_file = os.path.join(scripts.basedir(), "upload_to_wanly_config.json")
         self.config = self.load_config()
 
     def title(self):
@@ -83,13 +98,6 @@ class UploadToWanlyScript(scripts.Script):
     def load_config(self):
         return load_wanly_config()
 
-    def save_config_to_file(self):
-        try:
-            with open(self.config_file, "w") as f:
-                json.dump(self.config, f, indent=2)
-        except Exception as e:
-            print(f"[Upload to Wanly] Error saving config: {e}")
-
     def ui(self, is_img2img):
         with gr.Group():
             with gr.Accordion("a1111 tweaks - Upload to Wanly", open=False):
@@ -103,36 +111,118 @@ class UploadToWanlyScript(scripts.Script):
                     value=self.config.get("api_key", ""),
                     type="password",
                 )
+                with gr.Row():
+                    auto_upload = gr.Checkbox(
+                        label="Auto-upload every saved image",
+                        value=_auto_upload["enabled"],
+                    )
+                    skip_grids = gr.Checkbox(label="Skip grids", value=_auto_upload["skip_grids"])
+                auto_sources = gr.CheckboxGroup(
+                    label="Auto-upload images from",
+                    choices=AUTO_UPLOAD_SOURCES,
+                    value=_auto_upload["sources"],
+                )
+                encoding = wanly.encoding_settings(self.config)
+                with gr.Row():
+                    upload_encoding = gr.Dropdown(
+                        label="Encoding for in-memory images",
+                        choices=list(wanly.ENCODINGS),
+                        value=encoding["encoding"],
+                    )
+                    png_level = gr.Slider(
+                        label="PNG compress level",
+                        minimum=0,
+                        maximum=9,
+                        step=1,
+                        value=encoding["png_compress_level"],
+                    )
+                    png_optimize = gr.Checkbox(label="PNG optimize", value=encoding["png_optimize"])
+                    jpeg_quality = gr.Slider(
+                        label="JPEG quality",
+                        minimum=70,
+                        maximum=100,
+                        step=1,
+                        value=encoding["jpeg_quality"],
+                    )
                 save_btn = gr.Button("Save Settings", variant="secondary")
                 upload_btn = gr.Button("Upload Last Image", variant="primary")
                 status_box = gr.Textbox(label="Status", interactive=False, lines=2)
 
-                def save_settings(url, key):
-                    self.config["api_url"] = url.rstrip("/")
-                    self.config["api_key"] = key
-                    self.save_config_to_file()
+                gr.Markdown("### Upload Queue")
+                queue_box = gr.Textbox(
+                    label="Queue Status",
+                    value=queue_status_text(),
+                    interactive=False,
+                    lines=6,
+                )
+                with gr.Row():
+                    queue_refresh_btn = gr.Button("Refresh Queue", variant="secondary")
+                    retry_btn = gr.Button("Retry Failed", variant="secondary")
+                    clear_done_btn = gr.Button("Clear Finished", variant="secondary")
+
+                @instrument.timed("upload_to_wanly.save_settings")
+                def save_settings(url, key, auto, grids, sources, enc, level, optimize, quality):
+                    settings = {
+                        "api_url": url.rstrip("/"),
+                        "api_key": key,
+                        "auto_upload": bool(auto),
+                        "auto_upload_skip_grids": bool(grids),
+                        "auto_upload_sources": list(sources),
+                        "encoding": enc,
+                        "png_compress_level": int(level),
+                        "png_optimize": bool(optimize),
+                        "jpeg_quality": int(quality),
+                    }
+                    # Merged into the latest file so keys set elsewhere (pool, dedup, chunking) survive
+                    wanly.config_store().update(lambda config: config.update(settings))
+                    self.config = self.load_config()
+                    _auto_upload.update(_auto_upload_settings(self.config))
                     return "Settings saved."
 
+                @instrument.timed("upload_to_wanly.upload_last")
                 def upload_last(url, key):
-                    if _last_image is None:
-                        return "Error: No image available. Generate an image first."
-                    success, message = upload_image_to_wanly(
-                        _last_image,
-                        _last_filename or f"{uuid.uuid4().hex}.png",
-                        api_url=url,
-                        api_key=key,
-                    )
-                    return message
+                    if _last_image is None and _last_filepath is None:
+                        return "Error: No image available. Generate an image first.", queue_status_text()
+                    filename = _last_filename or f"{uuid.uuid4().hex}.png"
+                    try:
+                        item_id = shared_queue().enqueue(
+                            filename,
+                            filepath=_last_filepath,
+                            image=_last_image,
+                            api_url=url.rstrip("/"),
+                            api_key=key,
+                        )
+                    except Exception as e:
+                        return f"Error: {e}", queue_status_text()
+                    return f"Queued upload #{item_id}: {filename}", queue_status_text()
+
+                @instrument.timed("upload_to_wanly.refresh_queue")
+                def refresh_queue():
+                    return queue_status_text()
+
+                @instrument.timed("upload_to_wanly.retry_failed")
+                def retry_failed():
+                    shared_queue().retry_failed()
+                    return queue_status_text()
+
+                @instrument.timed("upload_to_wanly.clear_finished")
+                def clear_finished():
+                    shared_queue().clear_finished()
+                    return queue_status_text()
 
                 save_btn.click(
                     fn=save_settings,
-                    inputs=[api_url, api_key],
+                    inputs=[api_url, api_key, auto_upload, skip_grids, auto_sources,
+                            upload_encoding, png_level, png_optimize, jpeg_quality],
                     outputs=[status_box],
                 )
                 upload_btn.click(
                     fn=upload_last,
                     inputs=[api_url, api_key],
-                    outputs=[status_box],
+                    outputs=[status_box, queue_box],
                 )
+                queue_refresh_btn.click(fn=refresh_queue, inputs=[], outputs=[queue_box])
+                retry_btn.click(fn=retry_failed, inputs=[], outputs=[queue_box])
+                clear_done_btn.click(fn=clear_finished, inputs=[], outputs=[queue_box])
 
         return []
\ No newline at end of file
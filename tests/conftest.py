@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from wanly_standin import start_in_thread  # noqa: E402
+
+API_KEY = "test-key"
+
+
+class ScriptedRng:
+    """Stands in for the stand-in server's RNG: fails exactly the requests listed in ``failures``.
+
+    Requests are numbered from 0 in the order they pass the server's gate.
+    """
+
+    def __init__(self, failures=()):
+        self.failures = set(failures)
+        self.calls = 0
+
+    def random(self):
+        failed = self.calls in self.failures
+        self.calls += 1
+        return 0.0 if failed else 1.0
+
+
+@pytest.fixture
+def wanly_server():
+    """Factory starting stand-in Wanly servers, shut down after the test; returns (server, url)."""
+    servers = []
+
+    def start(failures=None, **kwargs):
+        server, url = start_in_thread(api_key=API_KEY, **kwargs)
+        if failures is not None:
+            server.error_rate = 0.5
+            server.rng = ScriptedRng(failures)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,86 @@
+"""Chunked, resumable uploads against the local stand-in server."""
+import hashlib
+import os
+
+import pytest
+
+from a1111_tweaks.upload_ledger import UploadLedger
+from a1111_tweaks.wanly import WanlyClient
+from conftest import API_KEY
+
+CHUNK = 64 * 1024
+CHUNKS = 5
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    path = tmp_path / "upscaled.png"
+    path.write_bytes(os.urandom(CHUNKS * CHUNK - 100))
+    return str(path)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UploadLedger(str(tmp_path / "ledger.sqlite3"))
+
+
+def make_client(ledger, chunk_retries=0):
+    return WanlyClient(ledger=ledger, chunk_size=CHUNK, chunk_threshold=CHUNK, chunk_retries=chunk_retries)
+
+
+def upload(client, path, url):
+    return client.upload("upscaled.png", filepath=path, api_url=url, api_key=API_KEY)
+
+
+def test_sent_in_chunks(wanly_server, large_file, ledger):
+    server, url = wanly_server()
+    ok, message, _ = upload(make_client(ledger), large_file, url)
+    assert ok, message
+    assert server.stats["chunks"] == CHUNKS
+    assert server.stats["bytes"] == os.path.getsize(large_file)
+    assert not server.chunked
+    assert ledger.sessions().get((hashlib.sha256(open(large_file, "rb").read()).hexdigest(), url)) is None
+
+
+def test_resumes_after_an_interrupted_chunk(wanly_server, large_file, ledger):
+    # Gate order: open session, chunks 0 and 1, then chunk 2 fails
+    server, url = wanly_server(failures={3})
+    ok, message, retryable = upload(make_client(ledger), large_file, url)
+    assert not ok and retryable
+    assert f"stalled at {2 * CHUNK}/" in message
+    assert server.stats["chunks"] == 2
+
+    # A fresh client, as after a restart, finds the session in the ledger and asks for the offset
+    ok, message, _ = upload(make_client(ledger), large_file, url)
+    assert ok, message
+    assert server.stats["chunks"] == CHUNKS, "acknowledged chunks were sent again"
+    assert server.stats["uploads"] == 1
+    assert server.stats["bytes"] == os.path.getsize(large_file)
+
+
+def test_retries_a_failed_chunk_within_an_attempt(wanly_server, large_file, ledger):
+    server, url = wanly_server(failures={2})
+    ok, message, _ = upload(make_client(ledger, chunk_retries=1), large_file, url)
+    assert ok, message
+    assert server.stats["errors"] == 1
+    assert server.stats["chunks"] == CHUNKS
+
+
+def test_expired_session_starts_over(wanly_server, large_file, ledger):
+    server, url = wanly_server(failures={3})
+    upload(make_client(ledger), large_file, url)
+    # The server dropped the half-finished upload
+    server.chunked.clear()
+    ok, message, _ = upload(make_client(ledger), large_file, url)
+    assert ok, message
+    assert server.stats["chunks"] == 2 + CHUNKS
+
+
+def test_small_files_use_a_single_post(wanly_server, tmp_path, ledger):
+    server, url = wanly_server()
+    path = tmp_path / "small.png"
+    path.write_bytes(os.urandom(CHUNK - 1))
+    ok, message, _ = upload(make_client(ledger), str(path), url)
+    assert ok, message
+    assert server.stats["chunks"] == 0
+    assert server.stats["uploads"] == 1
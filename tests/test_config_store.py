@@ -0,0 +1,50 @@
+"""Atomic writes and change detection of the shared JSON config stores."""
+import json
+import os
+import stat
+
+import pytest
+
+from a1111_tweaks import config_store
+
+posix_only = pytest.mark.skipif(os.name != "posix", reason="file modes are POSIX only")
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_write_is_read_back(tmp_path):
+    path = tmp_path / "config.json"
+    config_store._atomic_write(str(path), {"pairs": [1, 2]})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"pairs": [1, 2]}
+    assert [p.name for p in tmp_path.iterdir()] == ["config.json"]
+
+
+@posix_only
+def test_new_file_gets_the_umask_default(tmp_path):
+    path = tmp_path / "config.json"
+    config_store._atomic_write(str(path), {})
+    assert mode(path) == 0o666 & ~config_store._UMASK
+
+
+@posix_only
+def test_rewrite_keeps_the_existing_mode(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{}", encoding="utf-8")
+    os.chmod(path, 0o640)
+    config_store._atomic_write(str(path), {"a": 1})
+    assert mode(path) == 0o640
+
+
+def test_store_flushes_and_sees_outside_edits(tmp_path):
+    path = tmp_path / "config.json"
+    store = config_store.ConfigStore(str(path), {"items": []}, debounce=0)
+    assert store.load() == {"items": []}
+    store.update(lambda data: data["items"].append("a"))
+    store.flush()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"items": ["a"]}
+
+    path.write_text(json.dumps({"items": ["edited", "by hand"]}), encoding="utf-8")
+    os.utime(path, ns=(0, 1))
+    assert store.load() == {"items": ["edited", "by hand"]}
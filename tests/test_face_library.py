@@ -0,0 +1,53 @@
+"""Safetensors header validation of face checkpoints."""
+import json
+import struct
+
+import pytest
+
+from a1111_tweaks.face_library import read_header
+
+
+def write_face(path, header, data=b"\0" * 16):
+    raw = json.dumps(header).encode("utf-8")
+    path.write_bytes(struct.pack("<Q", len(raw)) + raw + data)
+    return str(path)
+
+
+def tensor(offsets):
+    return {"dtype": "F32", "shape": [4], "data_offsets": offsets}
+
+
+def test_valid_checkpoint(tmp_path):
+    path = write_face(tmp_path / "face.safetensors", {"__metadata__": {"name": "face"}, "embedding": tensor([0, 16])})
+    info, error = read_header(path)
+    assert error is None
+    assert info["tensors"] == 1
+    assert info["metadata"] == {"name": "face"}
+
+
+@pytest.mark.parametrize("entry, reason", [
+    (tensor(["0", "16"]), "malformed"),
+    (tensor([None, 16]), "malformed"),
+    (tensor([0]), "malformed"),
+    ({"dtype": "F32", "data_offsets": [0, 16]}, "malformed"),
+    ("not a tensor", "malformed"),
+    (tensor([0, 64]), "past the end"),
+], ids=["string offsets", "null offset", "one offset", "no shape", "not an object", "truncated"])
+def test_bad_tensor_entries_are_invalid(tmp_path, entry, reason):
+    info, error = read_header(write_face(tmp_path / "face.safetensors", {"embedding": entry}))
+    assert info is None
+    assert reason in error
+
+
+def test_bad_header_length_is_invalid(tmp_path):
+    path = tmp_path / "face.safetensors"
+    path.write_bytes(struct.pack("<Q", 1 << 40) + b"{}")
+    info, error = read_header(str(path))
+    assert info is None
+    assert "bad header length" in error
+
+
+def test_tiny_file_is_invalid(tmp_path):
+    path = tmp_path / "face.safetensors"
+    path.write_bytes(b"\0" * 4)
+    assert read_header(str(path)) == (None, "file too small")
@@ -0,0 +1,113 @@
+"""FaceSwapLab face checkpoint lookup against stub script runners."""
+import pytest
+
+from a1111_tweaks import faceswaplab
+
+
+class Input:
+    def __init__(self, label):
+        self.label = label
+
+
+class Script:
+    def __init__(self, name, labels):
+        self.filename = f"/extensions/{name}/scripts/{name}.py"
+        self.name = name
+        self.labels = labels
+
+    def title(self):
+        return self.name
+
+
+class Runner:
+    """Shaped like the WebUI's ``ScriptRunner``: each script owns ``args_from:args_to`` of ``inputs``."""
+
+    def __init__(self, scripts):
+        self.alwayson_scripts = []
+        self.inputs = [None]  # slot 0 belongs to the selectable-script dropdown
+        for script in scripts:
+            script.args_from = len(self.inputs)
+            self.inputs.extend(Input(label) for label in script.labels)
+            script.args_to = len(self.inputs)
+            self.alwayson_scripts.append(script)
+
+
+class P:
+    def __init__(self, runner, args):
+        self.scripts = runner
+        self.script_args = args
+
+
+def faceswaplab_script():
+    return Script("faceswaplab", ["Enable", "Reference source face", "Face Checkpoint (precedence over reference face)",
+                                  "Target face", "Blend faces"] * 3)
+
+
+def controlnet():
+    return Script("controlnet", [f"cn{i}" for i in range(30)])
+
+
+def adetailer():
+    return Script("adetailer", [f"ad{i}" for i in range(45)])
+
+
+LAYOUTS = [
+    ("faceswaplab only", lambda: [faceswaplab_script()], 3),
+    ("controlnet first", lambda: [controlnet(), faceswaplab_script()], 33),
+    ("adetailer + controlnet", lambda: [adetailer(), controlnet(), faceswaplab_script()], 78),
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    faceswaplab.invalidate()
+    yield
+    faceswaplab.invalidate()
+
+
+@pytest.mark.parametrize("scripts, expected", [layout[1:] for layout in LAYOUTS], ids=[layout[0] for layout in LAYOUTS])
+def test_resolves_first_checkpoint_input(scripts, expected):
+    assert faceswaplab.resolve_face_index(Runner(scripts())) == expected
+
+
+@pytest.mark.parametrize("scripts, expected", [layout[1:] for layout in LAYOUTS], ids=[layout[0] for layout in LAYOUTS])
+def test_set_face_patches_only_the_checkpoint(scripts, expected):
+    runner = Runner(scripts())
+    base = tuple(range(len(runner.inputs)))
+    p = P(runner, base)
+    assert faceswaplab.set_face(p, "face.safetensors") == expected
+    assert p.script_args[expected] == "face.safetensors"
+    assert [v for i, v in enumerate(p.script_args) if i != expected] == [v for v in base if v != expected]
+
+
+def test_set_face_copies_once_per_job():
+    p = P(Runner([controlnet(), faceswaplab_script()]), tuple(range(100)))
+    faceswaplab.set_face(p, "face.safetensors")
+    patched = p.script_args
+    faceswaplab.set_face(p, "other.safetensors")
+    assert p.script_args is patched
+    assert patched[33] == "other.safetensors"
+
+
+def test_missing_faceswaplab_writes_nothing():
+    runner = Runner([controlnet()])
+    base = tuple(range(len(runner.inputs)))
+    p = P(runner, base)
+    assert faceswaplab.resolve_face_index(runner) is None
+    assert faceswaplab.set_face(p, "face.safetensors") is None
+    assert p.script_args is base
+
+
+def test_short_args_write_nothing():
+    p = P(Runner([adetailer(), controlnet(), faceswaplab_script()]), tuple(range(10)))
+    assert faceswaplab.set_face(p, "face.safetensors") is None
+    assert p.script_args == tuple(range(10))
+
+
+def test_index_is_cached_until_invalidated():
+    runner = Runner([faceswaplab_script()])
+    assert faceswaplab.face_index(runner) == 3
+    runner.inputs[3].label = "Something else"
+    assert faceswaplab.face_index(runner) == 3
+    faceswaplab.invalidate()
+    assert faceswaplab.face_index(runner) == 8
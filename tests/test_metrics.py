@@ -0,0 +1,88 @@
+"""The Prometheus text and status JSON behind the ``/a1111-tweaks`` routes."""
+import re
+
+import pytest
+
+from a1111_tweaks import instrument, metrics
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? '
+                         r'(-?[0-9.e+-]+|NaN|[+-]Inf)$')
+FAMILIES = ("a1111_tweaks_selections_total", "a1111_tweaks_uploads_total", "a1111_tweaks_upload_bytes_total",
+            "a1111_tweaks_upload_seconds", "a1111_tweaks_gallery_scan_seconds", "a1111_tweaks_hook_seconds",
+            "a1111_tweaks_collector_up", "a1111_tweaks_uptime_seconds")
+
+
+@pytest.fixture
+def populated():
+    metrics.SELECTIONS.inc(kind="style", value='Style "quoted"\\n', source="random")
+    metrics.UPLOADS.inc(result="ok")
+    metrics.UPLOAD_SECONDS.observe(0.3)
+    instrument.timed("test.hook")(lambda: None)()
+
+
+@pytest.fixture
+def client(populated):
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    app = fastapi.FastAPI()
+    metrics.mount(app)
+    return TestClient(app)
+
+
+def families_in(text):
+    return {line.split()[2] for line in text.splitlines() if line.startswith("# TYPE ")}
+
+
+def test_render_is_well_formed(populated):
+    families, errors = metrics.collect()
+    assert errors == {}
+    text = metrics.render(families)
+    assert set(FAMILIES) <= families_in(text)
+    bad = [line for line in text.splitlines() if not line.startswith("#") and not SAMPLE_LINE.match(line)]
+    assert bad == []
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    samples = {(name, labels.get("le")): value for name, labels, value in histogram.collect().samples}
+    assert samples[("test_seconds_bucket", "0.1")] == 1
+    assert samples[("test_seconds_bucket", "1.0")] == 3
+    assert samples[("test_seconds_bucket", "+Inf")] == 4
+    assert samples[("test_seconds_count", None)] == 4
+    assert samples[("test_seconds_sum", None)] == pytest.approx(6.05)
+
+
+def test_failing_collector_degrades_status(monkeypatch):
+    monkeypatch.setitem(metrics._collectors, "broken", lambda: 1 / 0)
+    families, errors = metrics.collect()
+    assert "broken" in errors
+    assert 'a1111_tweaks_collector_up{collector="broken"} 0' in metrics.render(families)
+    assert metrics.status(families, errors)["status"] == "degraded"
+
+
+def test_metrics_route(client):
+    resp = client.get(f"{metrics.ROUTE_PREFIX}/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == metrics.CONTENT_TYPE
+    assert set(FAMILIES) <= families_in(resp.text)
+    assert 'a1111_tweaks_hook_seconds_count{label="test.hook"}' in resp.text
+
+
+def test_status_route(client):
+    resp = client.get(f"{metrics.ROUTE_PREFIX}/status")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert set(body) == {"status", "uptime_seconds", "errors", "metrics"}
+    assert body["status"] == "ok" and body["errors"] == {}
+    assert body["uptime_seconds"] >= 0
+    assert "a1111_tweaks_uploads_total" in body["metrics"]
+
+
+def test_status_route_reports_collector_errors(client, monkeypatch):
+    monkeypatch.setitem(metrics._collectors, "broken", lambda: 1 / 0)
+    body = client.get(f"{metrics.ROUTE_PREFIX}/status").json()
+    assert body["status"] == "degraded"
+    assert body["errors"] == {"broken": "division by zero"}
@@ -0,0 +1,100 @@
+"""Content-hash duplicate skipping against the local stand-in server."""
+import os
+
+import pytest
+
+from a1111_tweaks.upload_ledger import UploadLedger
+from a1111_tweaks.wanly import WanlyClient
+from conftest import API_KEY
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i:03d}.png"
+        path.write_bytes(os.urandom(20 * 1024))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UploadLedger(str(tmp_path / "ledger.sqlite3"))
+
+
+def upload_all(client, paths, url):
+    results = [client.upload(os.path.basename(path), filepath=path, api_url=url, api_key=API_KEY)
+               for path in paths]
+    assert all(ok for ok, _, _ in results), results
+    return results
+
+
+def test_second_pass_is_all_hits(wanly_server, files, ledger):
+    server, url = wanly_server()
+    client = WanlyClient(ledger=ledger)
+    upload_all(client, files, url)
+    assert server.stats["uploads"] == len(files)
+
+    results = upload_all(client, files, url)
+    assert server.stats["uploads"] == len(files)
+    assert all(message.startswith("Already uploaded:") for _, message, _ in results)
+    assert ledger.stats() == {"hits": len(files), "misses": len(files), "entries": len(files)}
+    client.close()
+
+
+def test_same_content_under_another_name_is_a_hit(wanly_server, files, ledger, tmp_path):
+    server, url = wanly_server()
+    client = WanlyClient(ledger=ledger)
+    upload_all(client, files[:1], url)
+    copy = tmp_path / "copy.png"
+    copy.write_bytes(open(files[0], "rb").read())
+    upload_all(client, [str(copy)], url)
+    assert server.stats["uploads"] == 1
+    client.close()
+
+
+def test_changed_file_is_sent_again(wanly_server, files, ledger):
+    server, url = wanly_server()
+    client = WanlyClient(ledger=ledger)
+    upload_all(client, files, url)
+    with open(files[0], "ab") as f:
+        f.write(b"changed")
+    upload_all(client, files, url)
+    assert server.stats["uploads"] == len(files) + 1
+    client.close()
+
+
+def test_entries_are_per_server(wanly_server, files, ledger):
+    first, first_url = wanly_server()
+    second, second_url = wanly_server()
+    client = WanlyClient(ledger=ledger)
+    upload_all(client, files, first_url)
+    upload_all(client, files, second_url)
+    assert first.stats["uploads"] == second.stats["uploads"] == len(files)
+    client.close()
+
+
+def test_force_skips_the_ledger(wanly_server, files, ledger):
+    server, url = wanly_server()
+    client = WanlyClient(ledger=ledger)
+    upload_all(client, files[:1], url)
+    ok, _, _ = client.upload("again.png", filepath=files[0], api_url=url, api_key=API_KEY, force=True)
+    assert ok
+    assert server.stats["uploads"] == 2
+    client.close()
+
+
+def test_verification_reuploads_when_the_remote_copy_is_gone(wanly_server, files, ledger):
+    server, url = wanly_server()
+    client = WanlyClient(ledger=ledger, verify_url="{api_url}/{path}")
+    upload_all(client, files, url)
+    upload_all(client, files, url)
+    assert server.stats["uploads"] == len(files)
+
+    server.stored.clear()
+    upload_all(client, files, url)
+    assert server.stats["uploads"] == 2 * len(files)
+    # The forgotten entries were recorded again with the new upload
+    assert ledger.stats()["entries"] == len(files)
+    client.close()
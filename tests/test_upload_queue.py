@@ -0,0 +1,126 @@
+"""The persistent upload queue's retries and backoff against the local stand-in server."""
+import os
+import time
+
+import pytest
+
+from a1111_tweaks import upload_queue
+from a1111_tweaks.wanly import WanlyClient
+from conftest import API_KEY
+
+BACKOFF = 0.1
+
+
+@pytest.fixture
+def queue_factory(tmp_path):
+    """Builds queues sending to ``url`` through a real client; records each attempt's start time."""
+    queues = []
+    client = WanlyClient()
+
+    def make(url, attempts_at=None, api_key=API_KEY, **kwargs):
+        def send(filepath, filename, api_url, _):
+            if attempts_at is not None:
+                attempts_at.append(time.monotonic())
+            return client.upload(filename, filepath=filepath, api_url=url, api_key=api_key)
+
+        kwargs = {"workers": 1, "max_attempts": 5, "backoff_base": BACKOFF, "backoff_max": 1.0, **kwargs}
+        queue = upload_queue.UploadQueue(str(tmp_path / "queue.sqlite3"), str(tmp_path / "spool"), send, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+    client.close()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "0001.png"
+    path.write_bytes(os.urandom(16 * 1024))
+    return str(path)
+
+
+def wait_finished(queue, items, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = queue.counts()
+        if counts[upload_queue.DONE] + counts[upload_queue.FAILED] == items:
+            return counts
+        time.sleep(0.02)
+    raise AssertionError(f"queue did not finish: {queue.counts()}")
+
+
+def test_retryable_failures_back_off_then_succeed(wanly_server, queue_factory, image):
+    server, url = wanly_server(failures={0, 1})
+    attempts_at = []
+    queue = queue_factory(url, attempts_at)
+    queue.enqueue("0001.png", filepath=image)
+    queue.start()
+    assert wait_finished(queue, 1)[upload_queue.DONE] == 1
+    (_, _, status, attempts, message), = queue.recent()
+    assert (status, attempts) == (upload_queue.DONE, 3)
+    assert message.startswith("Uploaded:")
+    assert server.stats["errors"] == 2 and server.stats["uploads"] == 1
+    # Exponential backoff with jitter: each delay is at least half of base * 2 ** (attempt - 1)
+    gaps = [later - earlier for earlier, later in zip(attempts_at, attempts_at[1:])]
+    assert gaps[0] >= BACKOFF * 0.5
+    assert gaps[1] >= BACKOFF * 2 * 0.5
+
+
+def test_gives_up_after_max_attempts(wanly_server, queue_factory, image):
+    server, url = wanly_server(failures=range(100))
+    queue = queue_factory(url, max_attempts=3, backoff_base=0.01)
+    queue.enqueue("0001.png", filepath=image)
+    queue.start()
+    assert wait_finished(queue, 1)[upload_queue.FAILED] == 1
+    (_, _, _, attempts, message), = queue.recent()
+    assert attempts == 3
+    assert "503" in message
+    assert server.stats["errors"] == 3
+
+
+def test_non_retryable_failure_fails_at_once(wanly_server, queue_factory, image):
+    server, url = wanly_server()
+    queue = queue_factory(url, api_key="wrong-key")
+    queue.enqueue("0001.png", filepath=image)
+    queue.start()
+    assert wait_finished(queue, 1)[upload_queue.FAILED] == 1
+    (_, _, _, attempts, message), = queue.recent()
+    assert attempts == 1
+    assert "401" in message
+
+
+def test_retry_failed_requeues(wanly_server, queue_factory, image):
+    server, url = wanly_server(failures={0})
+    queue = queue_factory(url, max_attempts=1)
+    queue.enqueue("0001.png", filepath=image)
+    queue.start()
+    assert wait_finished(queue, 1)[upload_queue.FAILED] == 1
+    assert queue.retry_failed() == 1
+    assert wait_finished(queue, 1)[upload_queue.DONE] == 1
+
+
+def test_pending_items_survive_a_restart(wanly_server, queue_factory, tmp_path):
+    server, url = wanly_server()
+    queue = queue_factory(url)
+    for i in range(3):
+        path = tmp_path / f"{i:04d}.png"
+        path.write_bytes(os.urandom(1024))
+        queue.enqueue(path.name, filepath=str(path))
+    queue.stop()
+
+    queue = queue_factory(url, workers=2)
+    queue.start()
+    assert wait_finished(queue, 3)[upload_queue.DONE] == 3
+    assert server.stats["uploads"] == 3
+
+
+def test_missing_file_fails_without_sending(wanly_server, queue_factory, image):
+    server, url = wanly_server()
+    queue = queue_factory(url)
+    queue.enqueue("0001.png", filepath=image)
+    os.remove(image)
+    queue.start()
+    assert wait_finished(queue, 1)[upload_queue.FAILED] == 1
+    assert server.stats["uploads"] == 0